@@ -1,15 +1,14 @@
 import os
 import uuid
 from typing import List, Dict, Optional
-from database import DatabaseManager
-from rag_engine import RAGEngine
-from auth import AuthHandler
+from services import services
 
 class AdminManager:
-    def __init__(self):
-        self.db_manager = DatabaseManager()
-        self.rag_engine = RAGEngine()
-        self.auth_handler = AuthHandler()
+    def __init__(self, db_manager=None, rag_engine=None, auth_handler=None):
+        """Use the given components, or the process-wide shared ones"""
+        self.db_manager = db_manager or services.db_manager
+        self.rag_engine = rag_engine or services.rag_engine
+        self.auth_handler = auth_handler or services.auth_handler
     
     def is_admin(self, user_id: int) -> bool:
         """Check if a user is an admin"""
@@ -39,7 +38,9 @@ class AdminManager:
     def update_user(self, user_id: int, username: str, is_admin: bool = False) -> bool:
         """Update user details (admin only)"""
         try:
-            return self.db_manager.update_user(user_id, username, is_admin)
+            updated = self.db_manager.update_user(user_id, username, is_admin)
+            self.auth_handler.invalidate_user(user_id)
+            return updated
         except Exception as e:
             print(f"Error updating user: {e}")
             return False
@@ -62,8 +63,10 @@ class AdminManager:
             # Delete user's chats and messages
             self.db_manager.delete_user_chats(user_id)
             
-            # Delete user account
-            return self.db_manager.delete_user(user_id)
+            # Delete user account; their tokens stop authorizing anything
+            deleted = self.db_manager.delete_user(user_id)
+            self.auth_handler.invalidate_user(user_id)
+            return deleted
         except Exception as e:
             print(f"Error deleting user: {e}")
             return False
@@ -91,13 +94,14 @@ class AdminManager:
     def delete_document(self, document_id: str) -> bool:
         """Delete a specific document (admin only)"""
         try:
-            # Get document info first
-            document = self.db_manager.get_document_by_id(document_id)
+            # Get document info first; the text itself isn't needed
+            document = self.db_manager.get_document_by_id(document_id, include_content=False)
             if not document:
                 return False
             
-            # Delete from RAG engine
-            self.rag_engine.delete_document_by_id(document_id)
+            # Delete its chunks from the vector store, unless a later upload with the same name owns them now
+            if not self.db_manager.has_newer_document(document["id"], document["user_id"], document["filename"]):
+                self.rag_engine.delete_document(document["filename"], document["user_id"])
             
             # Delete from database
             return self.db_manager.delete_document(document_id)
@@ -108,22 +112,17 @@ class AdminManager:
     def get_system_stats(self) -> Dict:
         """Get system statistics (admin only)"""
         try:
-            total_users = self.db_manager.get_user_count()
-            total_documents = self.db_manager.get_document_count()
-            total_chats = self.db_manager.get_chat_count()
-            total_messages = self.db_manager.get_message_count()
-            
-            return {
-                "total_users": total_users,
-                "total_documents": total_documents,
-                "total_chats": total_chats,
-                "total_messages": total_messages
-            }
+            counts = self.db_manager.get_table_counts()
+            recent_activity = self.db_manager.get_recent_activity()
         except Exception as e:
             print(f"Error getting system stats: {e}")
-            return {
-                "total_users": 0,
-                "total_documents": 0,
-                "total_chats": 0,
-                "total_messages": 0
-            } 
\ No newline at end of file
+            counts, recent_activity = {}, []
+        
+        stats = {}
+        for table in ("users", "documents", "chats", "messages"):
+            count = counts.get(table, 0)
+            stats[f"total_{table}"] = count
+            # The names the admin dashboard reads
+            stats[f"total{table.capitalize()}"] = count
+        stats["recentActivity"] = recent_activity
+        return stats 
\ No newline at end of file
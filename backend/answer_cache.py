@@ -0,0 +1,143 @@
+import hashlib
+import json
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+class AnswerCache:
+    """Bounded LRU cache of generated answers, matched by query similarity.
+
+    An answer is reused when a new question from the same user embeds
+    within similarity_threshold (cosine) of a cached one and retrieval
+    produced the same prompt context, identified by its passages' chunk ids
+    and text. Entries expire after ttl_seconds. Each user has a generation
+    counter that is bumped when their documents change; answers generated
+    under an older generation are dropped.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600, similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        # (user_id, context signature) -> keys of the entries sharing that context
+        self._buckets: Dict[tuple, set] = {}
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def context_signature(passages: List[Dict]) -> str:
+        """Identity of the context an answer was generated from"""
+        parts = [[passage.get("id"), passage["content"]] for passage in passages]
+        return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> List[float]:
+        norm = math.sqrt(sum(v * v for v in embedding))
+        return [v / norm for v in embedding] if norm else []
+
+    def generation(self, user_id: int) -> int:
+        """Current document generation for a user; pass it back to put()"""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def get(self, user_id: int, embedding: List[float], signature: str) -> Optional[Dict]:
+        """Return the cached entry (answer, conversation) closest to embedding for this context, or None"""
+        query = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            best_key, best_similarity = None, self.similarity_threshold
+            for key in list(self._buckets.get((user_id, signature), ())):
+                entry = self._entries[key]
+                if now - entry["created"] > self.ttl_seconds:
+                    self._remove(key)
+                    self.expirations += 1
+                    continue
+                similarity = sum(a * b for a, b in zip(query, entry["embedding"]))
+                if similarity >= best_similarity:
+                    best_key, best_similarity = key, similarity
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            entry = self._entries[best_key]
+            return {"answer": entry["answer"], "conversation": entry["conversation"]}
+
+    def put(self, user_id: int, query: str, embedding: List[float], signature: str, answer: str, generation: int,
+            conversation: Optional[List[int]] = None):
+        """Cache an answer generated for query under the given document generation.
+        
+        conversation is the Ollama context returned with the answer, so a chat
+        answered from the cache can still continue from it.
+        """
+        embedding = self._normalize(embedding)
+        if not self.enabled or not embedding or not answer:
+            return
+        key = (user_id, signature, " ".join(query.casefold().split()))
+        with self._lock:
+            if generation != self._generations.get(user_id, 0):
+                # The user's documents changed while the answer was generated
+                return
+            self._remove(key)
+            self._entries[key] = {
+                "embedding": embedding,
+                "answer": answer,
+                "conversation": array("i", conversation) if conversation else None,
+                "created": time.time()
+            }
+            self._buckets.setdefault((user_id, signature), set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int):
+        """Drop a user's answers after their documents changed"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for key in [key for key in self._entries if key[0] == user_id]:
+                self._remove(key)
+                self.invalidations += 1
+
+    def stats(self) -> Dict:
+        """Hit/miss and eviction counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "max_entries": self.max_entries
+            }
+
+    def clear(self):
+        """Drop every cached answer"""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def _remove(self, key: tuple):
+        if self._entries.pop(key, None) is None:
+            return
+        bucket = self._buckets.get(key[:2])
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[key[:2]]
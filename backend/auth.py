@@ -1,14 +1,56 @@
 from jose import jwt
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+import asyncio
 import os
+import threading
+
+from auth_context import AuthContextCache
+
+class PasswordPoolBusy(Exception):
+    """Every slot of the password hashing pool is taken; the caller should retry later"""
 
 class AuthHandler:
     def __init__(self):
         self.secret_key = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
         self.algorithm = "HS256"
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        self._pwd_context = None
         self.access_token_expire_minutes = 30
+        # bcrypt cost for new hashes; existing hashes are upgraded on the next login
+        self.bcrypt_rounds = int(os.getenv("BCRYPT_ROUNDS", "12"))
+        # Threads doing bcrypt work, and how many calls may be running or waiting for one
+        self.hash_workers = max(1, int(os.getenv("PASSWORD_HASH_WORKERS", "2")))
+        self.hash_queue_size = max(self.hash_workers, int(os.getenv("PASSWORD_HASH_QUEUE", "16")))
+        self.in_progress = 0
+        self.rejected = 0
+        self._hash_executor = None
+        self._lock = threading.Lock()
+        self.context_cache = AuthContextCache()
+    
+    @property
+    def pwd_context(self):
+        """bcrypt password context, loaded on first use"""
+        if self._pwd_context is None:
+            from passlib.context import CryptContext
+            # needs_update only checks the cost against min/max_rounds, so pin both to bcrypt_rounds
+            self._pwd_context = CryptContext(
+                schemes=["bcrypt"],
+                deprecated="auto",
+                bcrypt__rounds=self.bcrypt_rounds,
+                bcrypt__min_rounds=self.bcrypt_rounds,
+                bcrypt__max_rounds=self.bcrypt_rounds
+            )
+        return self._pwd_context
+    
+    @property
+    def hash_executor(self) -> ThreadPoolExecutor:
+        """Size-capped pool that password hashing runs on, off the event loop"""
+        if self._hash_executor is None:
+            with self._lock:
+                if self._hash_executor is None:
+                    self._hash_executor = ThreadPoolExecutor(max_workers=self.hash_workers, thread_name_prefix="bcrypt")
+        return self._hash_executor
     
     def get_password_hash(self, password: str) -> str:
         """Hash a password"""
@@ -18,10 +60,66 @@ class AuthHandler:
         """Verify a password against its hash"""
         return self.pwd_context.verify(plain_password, hashed_password)
     
+    def verify_and_update_password(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password; also return a new hash if the stored one uses an outdated cost"""
+        return self.pwd_context.verify_and_update(plain_password, hashed_password)
+    
+    async def run_password_task(self, func: Callable, *args):
+        """Run password work on the hashing pool without blocking the event loop.
+        
+        Raises PasswordPoolBusy at once, instead of queueing, when
+        hash_queue_size calls are already running or waiting.
+        """
+        executor = self.hash_executor
+        with self._lock:
+            if self.in_progress >= self.hash_queue_size:
+                self.rejected += 1
+                raise PasswordPoolBusy("Too many password operations in progress")
+            self.in_progress += 1
+        try:
+            future = executor.submit(func, *args)
+        except Exception:
+            self._release_slot()
+            raise
+        # Released when the work finishes, even if the waiting request was cancelled
+        future.add_done_callback(lambda _: self._release_slot())
+        return await asyncio.wrap_future(future)
+    
+    def _release_slot(self):
+        with self._lock:
+            self.in_progress -= 1
+    
+    async def ahash_password(self, password: str) -> str:
+        """Hash a password on the hashing pool"""
+        return await self.run_password_task(self.get_password_hash, password)
+    
+    async def averify_password(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """verify_and_update_password on the hashing pool"""
+        return await self.run_password_task(self.verify_and_update_password, plain_password, hashed_password)
+    
+    def hashing_stats(self) -> Dict:
+        """Pool size, calls in progress and calls rejected as busy"""
+        with self._lock:
+            return {
+                "workers": self.hash_workers,
+                "queue_size": self.hash_queue_size,
+                "in_progress": self.in_progress,
+                "rejected": self.rejected,
+                "bcrypt_rounds": self.bcrypt_rounds
+            }
+    
+    def shutdown(self):
+        """Stop the hashing pool's threads"""
+        if self._hash_executor is not None:
+            self._hash_executor.shutdown(wait=False, cancel_futures=True)
+            self._hash_executor = None
+    
     def create_token(self, user_id: int, username: str) -> str:
         """Create a JWT token"""
-        expire = datetime.utcnow() + timedelta(minutes=self.access_token_expire_minutes)
+        now = datetime.utcnow()
+        expire = now + timedelta(minutes=self.access_token_expire_minutes)
         to_encode = {
+            "iat": now,
             "exp": expire,
             "user_id": user_id,
             "username": username
@@ -29,6 +127,10 @@ class AuthHandler:
         encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
         return encoded_jwt
     
+    def invalidate_user(self, user_id: int):
+        """Drop the cached contexts of a user whose role or account changed"""
+        self.context_cache.invalidate_user(user_id)
+    
     def decode_token(self, token: str) -> dict:
         """Decode a JWT token"""
         try:
@@ -37,4 +139,4 @@ class AuthHandler:
         except jwt.ExpiredSignatureError:
             raise Exception("Token has expired")
         except jwt.JWTError:
-            raise Exception("Invalid token") 
\ No newline at end of file
+            raise Exception("Invalid token")
\ No newline at end of file
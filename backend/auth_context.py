@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+class AuthContextCache:
+    """Short-lived cache of the authorization context behind each bearer token.
+
+    A hit skips JWT decoding and any role lookup, so the admin dashboard's
+    parallel requests authorize without touching SQLite. Entries live for
+    ttl_seconds and never past the token's own expiry, and a miss reads the
+    user and their role from the database.
+    Changing or deleting a user drops their entries in this process at
+    once; other worker processes pick the change up when their entries
+    expire, so ttl_seconds bounds how long a demoted admin keeps access.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("AUTH_CACHE_SIZE", "4096"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("AUTH_CACHE_TTL", "60"))
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, token: str) -> Optional[Dict]:
+        """Return the cached context (user_id, username, is_admin) for token, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or now >= entry["expires"]:
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry["context"]
+
+    def generation(self, user_id: int) -> int:
+        """Current change counter for a user; pass it back to put()"""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def put(self, token: str, context: Dict, token_expires: float, generation: int):
+        """Cache a verified context until the TTL or token_expires (epoch seconds), whichever is first"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != self._generations.get(context["user_id"], 0):
+                # The user changed while the context was being verified
+                return
+            self._entries[token] = {
+                "context": context,
+                "expires": min(time.time() + self.ttl_seconds, token_expires)
+            }
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        """Forget a user's cached contexts after their role or account changed"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for token in [token for token, entry in self._entries.items() if entry["context"]["user_id"] == user_id]:
+                del self._entries[token]
+                self.invalidations += 1
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "max_entries": self.max_entries
+            }
@@ -0,0 +1,251 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+# Words, numbers and codes such as "POL-2023-0417" or "v2.1". A code is
+# indexed whole and also as its parts, so either spelling finds it.
+_TOKEN_RE = re.compile(r"[^\W_]+(?:[-_./][^\W_]+)*")
+_CODE_SEPARATORS = re.compile(r"[-_./]")
+
+_STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in is it its
+me my no not of on or our so that the their them then there these they this to
+was we what when where which who why will with you your
+""".split())
+
+# Distinct query terms scored per search
+MAX_QUERY_TERMS = 64
+# Query terms with a lower IDF (in over ~85% of the user's chunks) are skipped
+MIN_TERM_IDF = 0.15
+
+def tokenize(text: str) -> List[str]:
+    """Casefolded index terms of text, stopwords removed"""
+    terms = []
+    for token in _TOKEN_RE.findall(text.casefold()):
+        parts = _CODE_SEPARATORS.split(token)
+        if len(parts) > 1:
+            terms.append(token)
+            terms.extend(part for part in parts if part not in _STOPWORDS)
+        elif token not in _STOPWORDS:
+            terms.append(token)
+    return terms
+
+
+class BM25Index:
+    """Persistent inverted index over chunk text with per-user BM25 scoring.
+
+    Chunks are stored under the same ids and metadata as in the vector
+    store, and updated alongside it on upload and delete. Postings carry the
+    chunk length, so a query is one indexed lookup per term and the scoring
+    is done by SQLite. Document counts and lengths are kept per user by
+    triggers, since every search is scoped to one user's documents.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS bm25_chunks (
+                id INTEGER PRIMARY KEY,
+                chunk_id TEXT UNIQUE NOT NULL,
+                user_id INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                content_hash TEXT,
+                length INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_bm25_chunks_file ON bm25_chunks (user_id, filename, chunk_index);
+
+            CREATE TABLE IF NOT EXISTS bm25_postings (
+                user_id INTEGER NOT NULL,
+                term TEXT NOT NULL,
+                chunk INTEGER NOT NULL,
+                tf INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                PRIMARY KEY (user_id, term, chunk)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_bm25_postings_chunk ON bm25_postings (chunk);
+
+            CREATE TABLE IF NOT EXISTS bm25_users (
+                user_id INTEGER PRIMARY KEY,
+                chunks INTEGER NOT NULL,
+                total_length INTEGER NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS bm25_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+
+            CREATE TRIGGER IF NOT EXISTS bm25_chunks_insert AFTER INSERT ON bm25_chunks BEGIN
+                INSERT OR IGNORE INTO bm25_users (user_id, chunks, total_length) VALUES (NEW.user_id, 0, 0);
+                UPDATE bm25_users SET chunks = chunks + 1, total_length = total_length + NEW.length
+                WHERE user_id = NEW.user_id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS bm25_chunks_delete AFTER DELETE ON bm25_chunks BEGIN
+                DELETE FROM bm25_postings WHERE chunk = OLD.id;
+                UPDATE bm25_users SET chunks = chunks - 1, total_length = total_length - OLD.length
+                WHERE user_id = OLD.user_id;
+            END;
+        ''')
+        self._conn.commit()
+
+    def is_built(self) -> bool:
+        """Whether the index has been filled from the vector store's existing chunks"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM bm25_meta WHERE key = 'built'").fetchone()
+        return row is not None
+
+    def mark_built(self):
+        """Record that the index covers every chunk in the vector store"""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO bm25_meta (key, value) VALUES ('built', '1')")
+            self._conn.commit()
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict]):
+        """Index chunks, replacing any with the same ids; unchanged chunks are skipped"""
+        with self._lock:
+            stored = {}
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                stored.update(self._conn.execute(
+                    f"SELECT chunk_id, content_hash FROM bm25_chunks WHERE chunk_id IN ({placeholders})",
+                    batch
+                ).fetchall())
+
+            changed = [
+                i for i, chunk_id in enumerate(ids)
+                if stored.get(chunk_id) is None or stored[chunk_id] != metadatas[i].get("content_hash")
+            ]
+            if not changed:
+                return
+
+            self._conn.executemany(
+                "DELETE FROM bm25_chunks WHERE chunk_id = ?",
+                ((ids[i],) for i in changed if ids[i] in stored)
+            )
+            for i in changed:
+                metadata = metadatas[i]
+                terms = Counter(tokenize(documents[i]))
+                length = sum(terms.values())
+                chunk = self._conn.execute(
+                    '''INSERT INTO bm25_chunks (chunk_id, user_id, filename, chunk_index, content_hash, length, content, metadata)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                    (ids[i], metadata["user_id"], metadata["filename"], metadata["chunk_index"],
+                     metadata.get("content_hash"), length, documents[i], json.dumps(metadata))
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO bm25_postings (user_id, term, chunk, tf, length) VALUES (?, ?, ?, ?, ?)",
+                    ((metadata["user_id"], term, chunk, tf, length) for term, tf in terms.items())
+                )
+            self._conn.commit()
+
+    def search(self, query: str, user_id: int, top_k: int = 5) -> List[Dict]:
+        """Return the user's top_k chunks by BM25 score, best first"""
+        # Long pasted queries are cut to a bounded number of distinct terms
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms or top_k <= 0:
+            return []
+
+        with self._lock:
+            stats = self._conn.execute(
+                "SELECT chunks, total_length FROM bm25_users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if not stats or not stats[0]:
+                return []
+            chunk_count, total_length = stats
+            average_length = max(total_length / chunk_count, 1.0)
+
+            placeholders = ",".join("?" * len(terms))
+            document_frequency = self._conn.execute(
+                f"SELECT term, COUNT(*) FROM bm25_postings WHERE user_id = ? AND term IN ({placeholders}) GROUP BY term",
+                [user_id] + terms
+            ).fetchall()
+            if not document_frequency:
+                return []
+
+            idf = [
+                (term, math.log(1 + (chunk_count - df + 0.5) / (df + 0.5)))
+                for term, df in document_frequency
+            ]
+            # Terms found in nearly every chunk add almost nothing to any score
+            # but cost the most postings to read
+            idf = [(term, weight) for term, weight in idf if weight >= MIN_TERM_IDF] or idf
+            values = ",".join(f"(:term{n}, :idf{n})" for n in range(len(idf)))
+            rows = self._conn.execute(f'''
+                WITH query_terms (term, idf) AS (VALUES {values})
+                SELECT c.chunk_id, c.content, c.metadata, scored.score
+                FROM (
+                    SELECT p.chunk, SUM(q.idf * p.tf * (:k1 + 1) /
+                        (p.tf + :k1 * (1 - :b + :b * p.length / :average_length))) AS score
+                    FROM query_terms q
+                    JOIN bm25_postings p ON p.user_id = :user_id AND p.term = q.term
+                    GROUP BY p.chunk
+                    ORDER BY score DESC
+                    LIMIT :top_k
+                ) scored
+                JOIN bm25_chunks c ON c.id = scored.chunk
+                ORDER BY scored.score DESC
+            ''', {
+                **{f"term{n}": term for n, (term, _) in enumerate(idf)},
+                **{f"idf{n}": weight for n, (_, weight) in enumerate(idf)},
+                "k1": self.k1, "b": self.b, "average_length": average_length,
+                "user_id": user_id, "top_k": top_k
+            }).fetchall()
+
+        return [
+            {"id": chunk_id, "content": content, "metadata": json.loads(metadata), "score": score}
+            for chunk_id, content, metadata, score in rows
+        ]
+
+    def delete_file_chunks(self, filename: str, user_id: int, from_index: int = 0):
+        """Remove a user's chunks of filename whose chunk_index is at least from_index"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM bm25_chunks WHERE user_id = ? AND filename = ? AND chunk_index >= ?",
+                (user_id, filename, from_index)
+            )
+            self._conn.commit()
+
+    def delete_user(self, user_id: int):
+        """Remove all of a user's chunks"""
+        with self._lock:
+            self._conn.execute("DELETE FROM bm25_chunks WHERE user_id = ?", (user_id,))
+            self._conn.execute("DELETE FROM bm25_users WHERE user_id = ?", (user_id,))
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """Indexed chunk and term counts"""
+        with self._lock:
+            chunks, = self._conn.execute("SELECT COUNT(*) FROM bm25_chunks").fetchone()
+            postings, = self._conn.execute("SELECT COUNT(*) FROM bm25_postings").fetchone()
+        return {"chunks": chunks, "postings": postings}
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[Dict]], top_k: int, k: int = 60) -> List[Dict]:
+    """Merge ranked result lists by summing 1 / (k + rank) per chunk.
+
+    Results are matched by their "id"; each fused result keeps the first
+    list's fields and gets its fused "score".
+    """
+    fused: Dict[str, Tuple[float, Dict]] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, start=1):
+            score, first = fused.get(result["id"], (0.0, result))
+            fused[result["id"]] = (score + 1.0 / (k + rank), first)
+
+    ranked = sorted(fused.values(), key=lambda item: -item[0])[:top_k]
+    return [{**result, "score": score} for score, result in ranked]
@@ -0,0 +1,93 @@
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+class ChatContextCache:
+    """Ollama conversation contexts per chat, for follow-up turns.
+
+    /api/generate returns the conversation so far as a token array; sending
+    it back with the next turn lets Ollama reuse its KV cache and prefill
+    only the new tokens. Recent chats are kept in an LRU in memory and every
+    update is written through to the chat_contexts table, so a chat picks up
+    where it left off after a restart. A context longer than max_tokens is
+    dropped and the chat continues from a fresh context; callers derive
+    max_tokens from the generation's num_ctx (see
+    RAGEngine.conversation_token_limit) so Ollama never has to truncate it.
+    """
+
+    def __init__(self, db_manager, max_tokens: int, max_entries: Optional[int] = None):
+        self.db_manager = db_manager
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("CHAT_CONTEXT_CACHE_SIZE", "256"))
+        self.max_tokens = max_tokens
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chat_id: str, user_id: int, model: str) -> Optional[array]:
+        """Return the chat's context for model, or None to start afresh"""
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is not None and entry["user_id"] == user_id:
+                self._entries.move_to_end(chat_id)
+                if entry["model"] != model:
+                    # Contexts are token ids of one model
+                    self.misses += 1
+                    return None
+                self.hits += 1
+                return entry["context"]
+
+        stored = self.db_manager.get_chat_context(chat_id, user_id)
+        if stored is None or stored["model"] != model:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.db_hits += 1
+            self._remember(chat_id, user_id, stored["model"], stored["context"])
+        return stored["context"]
+
+    def put(self, chat_id: str, user_id: int, model: str, context: List[int]):
+        """Store the context returned by the chat's latest turn"""
+        if len(context) > self.max_tokens:
+            self.discard(chat_id, user_id)
+            return
+        context = array("i", context)
+        # Written only if the chat is the user's, so nobody can plant a context in someone else's chat
+        if not self.db_manager.save_chat_context(chat_id, user_id, model, context):
+            return
+        with self._lock:
+            self._remember(chat_id, user_id, model, context)
+
+    def discard(self, chat_id: str, user_id: int):
+        """Forget the context of one of the user's chats"""
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is not None and entry["user_id"] == user_id:
+                del self._entries[chat_id]
+        self.db_manager.delete_chat_context(chat_id, user_id)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.db_hits + self.misses
+            return {
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.db_hits) / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries
+            }
+
+    def _remember(self, chat_id: str, user_id: int, model: str, context: array):
+        if self.max_entries <= 0:
+            return
+        self._entries[chat_id] = {"user_id": user_id, "model": model, "context": context}
+        self._entries.move_to_end(chat_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,313 @@
+import os
+import re
+import zlib
+import numpy as np
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+# A sentence ends at . ! or ? (plus any closing quotes or brackets) followed by
+# whitespace, or at a blank line. Both branches start with one character class,
+# which lets the regex engine skip quickly to candidate positions.
+_BOUNDARY_RE = re.compile(r'[.!?\n](?:(?<=[.!?])[.!?]*["\'”’)\]]*\s+|(?<=\n)[ \t]*\n\s*)')
+
+# Token estimation treats runs of word characters as one token per six
+# characters and every punctuation mark as a token, much like a subword
+# tokenizer. Characters are classified by code point: 0 space, 1 word, 2 punctuation.
+_SPACE, _WORD, _PUNCT = 0, 1, 2
+# Indexed by min(code point, 128): non-ASCII counts as word characters unless listed below
+_CLASS_TABLE = np.array(
+    [_SPACE if chr(c).isspace() else _WORD if chr(c).isalnum() or chr(c) == "_" else _PUNCT for c in range(128)] + [_WORD],
+    dtype=np.uint8
+)
+_WORD_PIECE = 6
+
+def _char_classes(text: str) -> np.ndarray:
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    classes = _CLASS_TABLE[np.minimum(codes, 128)]
+    if not text.isascii():
+        # Common non-ASCII spaces and punctuation (dashes, curly quotes, ellipses)
+        classes[(codes == 0xA0) | ((codes >= 0x2000) & (codes <= 0x200B)) | (codes == 0x3000)] = _SPACE
+        classes[(codes >= 0x2010) & (codes <= 0x205E)] = _PUNCT
+    return classes
+
+def _token_starts(text: str) -> np.ndarray:
+    """Boolean mask of the characters that begin an estimated token"""
+    classes = _char_classes(text)
+    is_word = classes == _WORD
+    word_start = is_word.copy()
+    word_start[1:] &= ~is_word[:-1]
+    starts = classes == _PUNCT
+    starts |= word_start
+    # Long words count one token per _WORD_PIECE characters: find each word
+    # character's offset within its word
+    positions = np.arange(len(classes), dtype=np.int32)
+    run_start = np.where(word_start, positions, 0)
+    np.maximum.accumulate(run_start, out=run_start)
+    long_word = is_word & ((positions - run_start) >= _WORD_PIECE)
+    if long_word.any():
+        starts |= long_word & ((positions - run_start) % _WORD_PIECE == 0)
+    return starts
+
+def token_offsets(text: str) -> np.ndarray:
+    """Cumulative token counts: text[a:b] holds offsets[b] - offsets[a] tokens"""
+    offsets = np.zeros(len(text) + 1, dtype=np.int64)
+    np.cumsum(_token_starts(text), out=offsets[1:])
+    return offsets
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the number of embedding-model tokens in text"""
+    return int(np.count_nonzero(_token_starts(text)))
+
+def split_sentences(text: str, starts_paragraph: bool = True) -> List[Tuple[str, bool, int]]:
+    """Split text into (sentence, starts_paragraph, tokens) in one regex pass.
+
+    Each sentence keeps its trailing whitespace, so joining them gives back
+    the original text. A sentence starts a paragraph when the previous one
+    ended with a line break. Token counts come from one vectorized pass
+    over the whole text.
+    """
+    ends = []
+    line_breaks = []
+    for match in _BOUNDARY_RE.finditer(text):
+        ends.append(match.end())
+        line_breaks.append("\n" in match.group())
+    if len(text) > (ends[-1] if ends else 0):
+        ends.append(len(text))
+        line_breaks.append(False)
+
+    starts = [0] + ends[:-1]
+    offsets = token_offsets(text)
+    tokens = (offsets[ends] - offsets[starts]).tolist()
+    paragraph_starts = [starts_paragraph] + line_breaks[:-1]
+    return [
+        (text[start:end], paragraph_start, count)
+        for start, end, paragraph_start, count in zip(starts, ends, paragraph_starts, tokens)
+    ]
+
+
+class Chunker:
+    """Splits document text into chunks for embedding.
+
+    iter_chunks consumes text a piece (page or paragraph) at a time, as
+    produced by DocumentProcessor.iter_text; pieces are joined with newlines.
+    """
+    name = None
+
+    def chunk(self, text: str) -> List[str]:
+        """Split a whole text into chunks"""
+        return list(self.iter_chunks([text]))
+
+    def iter_chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class FixedCharChunker(Chunker):
+    """Fixed-size character windows, broken at a nearby sentence end where possible"""
+    name = "fixed-char"
+
+    def __init__(self, chunk_size: int = 1000, overlap: int = 200):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+
+    def chunk(self, text: str) -> List[str]:
+        return self._split(text.strip())
+
+    def _split(self, text: str) -> List[str]:
+        chunks = []
+        start = 0
+
+        while start < len(text):
+            end = start + self.chunk_size
+
+            # If this is not the last chunk, try to break at a sentence boundary
+            if end < len(text):
+                # Look for sentence endings
+                for i in range(end, max(start, end - 100), -1):
+                    if text[i] in '.!?':
+                        end = i + 1
+                        break
+
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+
+            start = end - self.overlap
+            if start >= len(text):
+                break
+
+        return chunks
+
+    def iter_chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        """Produces the same chunks as chunk() on the joined text, buffering about one chunk"""
+        buffer = ""
+        start = 0
+        started = False
+
+        for piece in pieces:
+            if started:
+                buffer += "\n" + piece
+            else:
+                # Leading whitespace is stripped from the document as a whole
+                buffer = (buffer + "\n" + piece if buffer else piece).lstrip()
+                started = bool(buffer)
+
+            # While more text follows the window, chunk boundaries match the whole-text case
+            # (trailing whitespace doesn't count: it is stripped if this is the last piece)
+            available = len(buffer.rstrip())
+            while start + self.chunk_size < available:
+                end = start + self.chunk_size
+                for i in range(end, max(start, end - 100), -1):
+                    if buffer[i] in '.!?':
+                        end = i + 1
+                        break
+
+                chunk = buffer[start:end].strip()
+                if chunk:
+                    yield chunk
+
+                start = end - self.overlap
+
+            # Drop text no later chunk can reach
+            buffer = buffer[start:]
+            start = 0
+
+        yield from self._split(buffer.rstrip())
+
+
+class SentencePackChunker(Chunker):
+    """Whole sentences packed up to a token budget, overlapping by whole sentences.
+
+    Sentences longer than the budget are cut at token boundaries. Sizes are
+    estimated with estimate_tokens, so chunks stay within the embedding
+    model's input limit regardless of word length.
+
+    Once a chunk is half full, it also ends after any sentence whose hash
+    is divisible by cut_divisor. These cuts depend only on the text, so
+    after an edit the chunk boundaries fall back into step with the
+    unedited version within a chunk or two, rather than shifting for the
+    rest of the document, and a revised upload reuses the stored
+    embeddings of its unchanged chunks.
+    """
+    name = "sentence-pack"
+    # Close chunks at paragraph starts once they are at least half full
+    paragraph_breaks = False
+    # About one sentence in this many ends a chunk that is at least half full; 0 turns this off
+    cut_divisor = 8
+
+    def __init__(self, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None):
+        self.max_tokens = max(1, max_tokens or int(os.getenv("CHUNK_TOKENS", "256")))
+        if overlap_tokens is None:
+            overlap_tokens = int(os.getenv("CHUNK_OVERLAP_TOKENS", "48"))
+        self.overlap_tokens = min(max(0, overlap_tokens), self.max_tokens // 2)
+        # Text without any sentence end is cut after this much when streaming
+        self.max_buffer_chars = self.max_tokens * 32
+
+    def iter_chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        window = deque()
+        size = 0
+        fresh = False
+        cut = False
+
+        for sentence, starts_paragraph, sentence_tokens in self._iter_sentences(pieces):
+            for text, tokens in self._split_long(sentence, sentence_tokens):
+                at_break = self.paragraph_breaks and starts_paragraph and size >= self.max_tokens // 2
+                if fresh and (size + tokens > self.max_tokens or at_break or cut):
+                    chunk = "".join(part for part, _ in window).strip()
+                    if chunk:
+                        yield chunk
+                    if at_break:
+                        window.clear()
+                        size = 0
+                    else:
+                        size = self._keep_overlap(window, tokens)
+                    fresh = False
+
+                window.append((text, tokens))
+                size += tokens
+                fresh = True
+                starts_paragraph = False
+                cut = self._is_cut_point(text, size)
+
+        if fresh:
+            chunk = "".join(part for part, _ in window).strip()
+            if chunk:
+                yield chunk
+
+    def _is_cut_point(self, text: str, size: int) -> bool:
+        """Whether the chunk, now size tokens, ends after this sentence regardless of what follows"""
+        if not self.cut_divisor or size < self.max_tokens // 2:
+            return False
+        return zlib.crc32(text.strip().encode("utf-8")) % self.cut_divisor == 0
+
+    def _keep_overlap(self, window: deque, next_tokens: int) -> int:
+        """Trim window to the trailing sentences that carry over into the next chunk"""
+        keep = 0
+        kept_tokens = 0
+        for _, tokens in reversed(window):
+            if kept_tokens + tokens > self.overlap_tokens or kept_tokens + tokens + next_tokens > self.max_tokens:
+                break
+            kept_tokens += tokens
+            keep += 1
+        while len(window) > keep:
+            window.popleft()
+        return kept_tokens
+
+    def _iter_sentences(self, pieces: Iterable[str]) -> Iterator[Tuple[str, bool, int]]:
+        """Sentences of the newline-joined pieces, holding back only the unfinished last one"""
+        buffer = None
+        starts_paragraph = True
+        for piece in pieces:
+            buffer = piece if buffer is None else buffer + "\n" + piece
+            sentences = split_sentences(buffer, starts_paragraph)
+            buffer, starts_paragraph, _ = sentences.pop() if sentences else ("", starts_paragraph, 0)
+            yield from sentences
+
+            if len(buffer) > self.max_buffer_chars:
+                yield buffer, starts_paragraph, estimate_tokens(buffer)
+                buffer = ""
+                starts_paragraph = False
+        if buffer:
+            yield buffer, starts_paragraph, estimate_tokens(buffer)
+
+    def _split_long(self, sentence: str, tokens: int) -> Iterator[Tuple[str, int]]:
+        """Yield (text, tokens) parts of a sentence, cutting ones over the budget"""
+        if tokens <= self.max_tokens:
+            yield sentence, tokens
+            return
+
+        # Quarter-budget parts still leave room for overlap between chunks
+        starts = np.flatnonzero(_token_starts(sentence))
+        step = max(1, self.max_tokens // 4)
+        for i in range(0, len(starts), step):
+            begin = int(starts[i]) if i else 0
+            end = int(starts[i + step]) if i + step < len(starts) else len(sentence)
+            yield sentence[begin:end], min(step, len(starts) - i)
+
+
+class ParagraphChunker(SentencePackChunker):
+    """Sentence packing that prefers to end chunks where paragraphs end.
+
+    A line break after a sentence end, or a blank line, counts as a paragraph
+    break; overlap is not carried across one.
+    """
+    name = "paragraph"
+    paragraph_breaks = True
+
+
+CHUNKERS: Dict[str, Type[Chunker]] = {
+    FixedCharChunker.name: FixedCharChunker,
+    SentencePackChunker.name: SentencePackChunker,
+    ParagraphChunker.name: ParagraphChunker,
+}
+
+def register_chunker(chunker_class: Type[Chunker]):
+    """Make a Chunker subclass available by its name"""
+    CHUNKERS[chunker_class.name] = chunker_class
+    return chunker_class
+
+def get_chunker(name: Optional[str] = None, **kwargs) -> Chunker:
+    """Build the named chunker, defaulting to the CHUNK_STRATEGY setting"""
+    name = name or os.getenv("CHUNK_STRATEGY", SentencePackChunker.name)
+    if name not in CHUNKERS:
+        raise ValueError(f"Unknown chunk strategy: {name} (available: {', '.join(sorted(CHUNKERS))})")
+    return CHUNKERS[name](**kwargs)
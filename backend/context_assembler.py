@@ -0,0 +1,125 @@
+import os
+import numpy as np
+from typing import Dict, List, Optional
+
+from chunking import estimate_tokens, split_sentences, token_offsets
+
+# Shared text shorter than this is treated as coincidence, not chunk overlap
+MIN_OVERLAP_CHARS = 16
+# Sentences shorter than this (headings, "Yes.") may repeat and are never dropped as duplicates
+MIN_DEDUP_TOKENS = 8
+
+def merge_overlapping(first: str, second: str) -> Optional[str]:
+    """Join consecutive chunks, keeping the text they share once; None if they don't overlap"""
+    if not second:
+        return first
+    # The earliest match is the longest overlap
+    pos = first.find(second[0], max(0, len(first) - len(second)))
+    while pos != -1 and len(first) - pos >= MIN_OVERLAP_CHARS:
+        if second.startswith(first[pos:]):
+            return first[:pos] + second
+        pos = first.find(second[0], pos + 1)
+    return None
+
+def _normalize(sentence: str) -> str:
+    return " ".join(sentence.casefold().split())
+
+
+class ContextAssembler:
+    """Builds a prompt's context passages from retrieved chunks within a token budget.
+
+    Chunks are taken in relevance order while they fit. Neighbouring chunks
+    of the same file are merged into one passage with their overlap kept
+    once, and sentences already present in a more relevant passage are
+    dropped, so a chunk only costs the tokens it adds. Passages are ordered
+    by their most relevant chunk.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None):
+        self.max_tokens = max(1, max_tokens or int(os.getenv("CONTEXT_TOKENS", "768")))
+
+    def assemble(self, docs: List[Dict]) -> List[Dict]:
+        """Return passages (id, filename, content, tokens), most relevant first"""
+        selected = []
+        passages = []
+        for rank, doc in enumerate(docs):
+            candidate = self._combine(selected + [(rank, doc)])
+            if sum(passage["tokens"] for passage in candidate) <= self.max_tokens:
+                selected.append((rank, doc))
+                passages = candidate
+            elif not selected:
+                # Even the best chunk is over the budget: keep its opening sentences
+                passages = [self._truncate(candidate[0], self.max_tokens)]
+                break
+        return passages
+
+    def _combine(self, ranked_docs: List[tuple]) -> List[Dict]:
+        """Merge neighbouring chunks into passages and drop repeated sentences"""
+        by_file = {}
+        for rank, doc in ranked_docs:
+            metadata = doc.get("metadata", {})
+            by_file.setdefault((metadata.get("user_id"), metadata.get("filename")), []).append((rank, doc))
+
+        passages = []
+        for (_, filename), chunks in by_file.items():
+            chunks.sort(key=lambda item: item[1].get("metadata", {}).get("chunk_index", -1))
+            current = None
+            previous_index = None
+            for rank, doc in chunks:
+                index = doc.get("metadata", {}).get("chunk_index")
+                if current is not None and index is not None and previous_index is not None:
+                    if index == previous_index:
+                        # The same chunk retrieved twice
+                        current["rank"] = min(current["rank"], rank)
+                        continue
+                    if index == previous_index + 1:
+                        merged = merge_overlapping(current["content"], doc["content"])
+                        current["content"] = merged if merged is not None else current["content"] + "\n" + doc["content"]
+                        current["ids"].append(doc.get("id"))
+                        current["rank"] = min(current["rank"], rank)
+                        previous_index = index
+                        continue
+                current = {"ids": [doc.get("id")], "filename": filename, "content": doc["content"], "rank": rank}
+                passages.append(current)
+                previous_index = index
+
+        passages.sort(key=lambda passage: passage["rank"])
+        return self._deduplicate(passages)
+
+    def _deduplicate(self, passages: List[Dict]) -> List[Dict]:
+        seen = set()
+        unique = []
+        for passage in passages:
+            kept = []
+            for sentence, _, sentence_tokens in split_sentences(passage["content"]):
+                key = _normalize(sentence)
+                if sentence_tokens >= MIN_DEDUP_TOKENS:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                kept.append(sentence)
+
+            content = "".join(kept).strip()
+            if content:
+                unique.append({
+                    "id": "+".join(str(chunk_id) for chunk_id in passage["ids"]),
+                    "filename": passage["filename"],
+                    "content": content,
+                    "tokens": estimate_tokens(content)
+                })
+        return unique
+
+    def _truncate(self, passage: Dict, max_tokens: int) -> Dict:
+        kept = []
+        tokens = 0
+        for sentence, _, sentence_tokens in split_sentences(passage["content"]):
+            if tokens + sentence_tokens > max_tokens:
+                if not kept:
+                    # One sentence longer than the budget: cut it at a token boundary
+                    offsets = token_offsets(sentence)
+                    kept.append(sentence[:int(np.searchsorted(offsets, max_tokens, side="right")) - 1])
+                break
+            kept.append(sentence)
+            tokens += sentence_tokens
+        content = "".join(kept).strip()
+        return {**passage, "content": content, "tokens": estimate_tokens(content)}
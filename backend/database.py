@@ -1,17 +1,267 @@
 import sqlite3
 import os
+import base64
+import json
+import threading
+from array import array
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Dict, Optional
 
+import document_store
+
+def _move_document_text(cursor: sqlite3.Cursor):
+    """Compress each document's inline text into document_blobs"""
+    reader = cursor.connection.cursor()
+    cursor.execute("SELECT id FROM documents WHERE content != ''")
+    for (document_id,) in cursor.fetchall():
+        reader.execute("SELECT content FROM documents WHERE id = ?", (document_id,))
+        writer = document_store.BlobWriter()
+        writer.write(reader.fetchone()[0])
+        content_hash, codec, size, data = writer.finish()
+        reader.execute(
+            "INSERT OR IGNORE INTO document_blobs (content_hash, codec, size, data) VALUES (?, ?, ?, ?)",
+            (content_hash, codec, size, data)
+        )
+        reader.execute("UPDATE documents SET content = '', content_hash = ? WHERE id = ?", (content_hash, document_id))
+    reader.close()
+
+# Schema migrations as (version, description, statements), applied in order on
+# top of the base tables. PRAGMA user_version records the last applied version,
+# so existing databases are upgraded in place by init_database(). A statement
+# may also be a function taking the cursor, for data moves SQL can't express.
+MIGRATIONS = [
+    (1, "secondary indexes for chat, message and document lookups", [
+        "CREATE INDEX IF NOT EXISTS idx_chats_user_created ON chats (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_messages_chat_timestamp ON messages (chat_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_documents_user_created ON documents (user_id, created_at)",
+    ]),
+    (2, "tie-break chat pagination on id", [
+        # messages get this for free: their index already ends in the rowid (= id)
+        "CREATE INDEX IF NOT EXISTS idx_chats_user_created_id ON chats (user_id, created_at, id)",
+        "DROP INDEX IF EXISTS idx_chats_user_created",
+    ]),
+    (3, "background ingestion jobs", [
+        '''
+        CREATE TABLE IF NOT EXISTS ingestion_jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            chunks_total INTEGER,
+            chunks_done INTEGER NOT NULL DEFAULT 0,
+            reused_chunks INTEGER NOT NULL DEFAULT 0,
+            document_id INTEGER,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_status ON ingestion_jobs (status)",
+    ]),
+    (4, "Ollama conversation context per chat", [
+        # The token array /api/generate returns, so follow-up turns only prefill new tokens
+        '''
+        CREATE TABLE IF NOT EXISTS chat_contexts (
+            chat_id TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            context BLOB NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (chat_id) REFERENCES chats (id)
+        )
+        ''',
+    ]),
+    (5, "trigger-maintained row counts and recent activity for admin stats", [
+        # COUNT(*) scans the whole table; these counters make stats one constant-time read
+        '''
+        CREATE TABLE IF NOT EXISTS table_counts (
+            name TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        )
+        ''',
+        "INSERT OR REPLACE INTO table_counts (name, count) SELECT 'users', COUNT(*) FROM users",
+        "INSERT OR REPLACE INTO table_counts (name, count) SELECT 'documents', COUNT(*) FROM documents",
+        "INSERT OR REPLACE INTO table_counts (name, count) SELECT 'chats', COUNT(*) FROM chats",
+        "INSERT OR REPLACE INTO table_counts (name, count) SELECT 'messages', COUNT(*) FROM messages",
+        "CREATE TRIGGER IF NOT EXISTS users_count_insert AFTER INSERT ON users BEGIN "
+        "UPDATE table_counts SET count = count + 1 WHERE name = 'users'; END",
+        "CREATE TRIGGER IF NOT EXISTS users_count_delete AFTER DELETE ON users BEGIN "
+        "UPDATE table_counts SET count = count - 1 WHERE name = 'users'; END",
+        "CREATE TRIGGER IF NOT EXISTS documents_count_insert AFTER INSERT ON documents BEGIN "
+        "UPDATE table_counts SET count = count + 1 WHERE name = 'documents'; END",
+        "CREATE TRIGGER IF NOT EXISTS documents_count_delete AFTER DELETE ON documents BEGIN "
+        "UPDATE table_counts SET count = count - 1 WHERE name = 'documents'; END",
+        "CREATE TRIGGER IF NOT EXISTS chats_count_insert AFTER INSERT ON chats BEGIN "
+        "UPDATE table_counts SET count = count + 1 WHERE name = 'chats'; END",
+        "CREATE TRIGGER IF NOT EXISTS chats_count_delete AFTER DELETE ON chats BEGIN "
+        "UPDATE table_counts SET count = count - 1 WHERE name = 'chats'; END",
+        "CREATE TRIGGER IF NOT EXISTS messages_count_insert AFTER INSERT ON messages BEGIN "
+        "UPDATE table_counts SET count = count + 1 WHERE name = 'messages'; END",
+        "CREATE TRIGGER IF NOT EXISTS messages_count_delete AFTER DELETE ON messages BEGIN "
+        "UPDATE table_counts SET count = count - 1 WHERE name = 'messages'; END",
+        # Ring buffer of the latest 50 new users, documents and chats, seeded from existing rows
+        '''
+        CREATE TABLE IF NOT EXISTS recent_activity (
+            id INTEGER PRIMARY KEY,
+            type TEXT NOT NULL,
+            description TEXT NOT NULL,
+            username TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        INSERT INTO recent_activity (type, description, username, timestamp)
+        SELECT * FROM (
+            SELECT 'user', 'New user registered', username, created_at FROM users
+            UNION ALL
+            SELECT 'document', 'Uploaded ' || d.filename, u.username, d.created_at
+            FROM documents d LEFT JOIN users u ON u.id = d.user_id
+            UNION ALL
+            SELECT 'chat', 'Started chat: ' || c.title, u.username, c.created_at
+            FROM chats c LEFT JOIN users u ON u.id = c.user_id
+            ORDER BY 4 DESC
+            LIMIT 50
+        ) ORDER BY 4
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS users_activity AFTER INSERT ON users BEGIN
+            INSERT INTO recent_activity (type, description, username) VALUES ('user', 'New user registered', NEW.username);
+            DELETE FROM recent_activity WHERE id <= (SELECT MAX(id) FROM recent_activity) - 50;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS chats_activity AFTER INSERT ON chats BEGIN
+            INSERT INTO recent_activity (type, description, username)
+            VALUES ('chat', 'Started chat: ' || NEW.title, (SELECT username FROM users WHERE id = NEW.user_id));
+            DELETE FROM recent_activity WHERE id <= (SELECT MAX(id) FROM recent_activity) - 50;
+        END
+        ''',
+    ]),
+    (6, "document text compressed into a separate blob table", [
+        # Rows listed by the documents page stay small; the text is read only by get_document_by_id
+        '''
+        CREATE TABLE IF NOT EXISTS document_blobs (
+            content_hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+        ''',
+        "ALTER TABLE documents ADD COLUMN content_hash TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents (content_hash)",
+        _move_document_text,
+        # Uploads are logged in recent_activity (see migration 5) when their text is stored, which
+        # happens once ingestion succeeds; ingestion inserts the row as soon as a job starts
+        '''
+        CREATE TRIGGER IF NOT EXISTS documents_activity AFTER UPDATE OF content_hash ON documents
+        WHEN OLD.content_hash IS NULL AND NEW.content_hash IS NOT NULL BEGIN
+            INSERT INTO recent_activity (type, description, username)
+            VALUES ('document', 'Uploaded ' || NEW.filename, (SELECT username FROM users WHERE id = NEW.user_id));
+            DELETE FROM recent_activity WHERE id <= (SELECT MAX(id) FROM recent_activity) - 50;
+        END
+        ''',
+    ]),
+    (7, "hash of each upload's bytes, for duplicate uploads", [
+        "ALTER TABLE ingestion_jobs ADD COLUMN source_hash TEXT",
+        # A duplicate is checked against the latest job for the same filename
+        "CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_user_filename ON ingestion_jobs (user_id, filename, created_at)",
+    ]),
+]
+
+def encode_cursor(sort_value, row_id) -> str:
+    """Encode a (sort value, id) keyset position as an opaque pagination cursor"""
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return sort_value, row_id
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
 class DatabaseManager:
-    def __init__(self):
-        self.db_path = "rag_chatbot.db"
+    def __init__(self, db_path: str = "rag_chatbot.db"):
+        self.db_path = db_path
+        self.busy_timeout = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+        # Page cache per connection in KiB (negative cache_size means KiB)
+        self.cache_size_kib = int(os.getenv("SQLITE_CACHE_SIZE_KIB", "16384"))
+        self._local = threading.local()
     
-    def init_database(self):
-        """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
+    def _get_connection(self) -> sqlite3.Connection:
+        """Return this thread's persistent connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # cached_statements keeps prepared statements alive across calls
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA cache_size=-{self.cache_size_kib}")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            self._local.conn = conn
+        return conn
+    
+    @contextmanager
+    def _cursor(self):
+        """Yield a cursor on the thread's connection, committing on success and rolling back on error"""
+        conn = self._get_connection()
         cursor = conn.cursor()
-        
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
+    def init_database(self):
+        """Initialize the database with required tables and apply pending migrations"""
+        with self._cursor() as cursor:
+            self._create_tables(cursor)
+        self._apply_migrations()
+    
+    def get_schema_version(self) -> int:
+        """Get the last applied migration version"""
+        with self._cursor() as cursor:
+            cursor.execute("PRAGMA user_version")
+            return cursor.fetchone()[0]
+    
+    def _apply_migrations(self):
+        """Apply every migration newer than the database's schema version"""
+        for version, description, statements in MIGRATIONS:
+            if self.get_schema_version() >= version:
+                continue
+            
+            with self._cursor() as cursor:
+                # Take the write lock before re-checking so two workers can't both migrate
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute("PRAGMA user_version")
+                if cursor.fetchone()[0] >= version:
+                    continue
+                
+                for statement in statements:
+                    if callable(statement):
+                        statement(cursor)
+                    else:
+                        cursor.execute(statement)
+                cursor.execute(f"PRAGMA user_version = {int(version)}")
+            
+            print(f"Applied database migration {version}: {description}")
+    
+    def _create_tables(self, cursor: sqlite3.Cursor):
+        """Create the base tables if they do not exist yet"""
         # Users table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -57,39 +307,29 @@ class DatabaseManager:
                 FOREIGN KEY (user_id) REFERENCES users (id)
             )
         ''')
-        
-        conn.commit()
-        conn.close()
     
     def user_exists(self, username: str) -> bool:
         """Check if a user exists"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
-        result = cursor.fetchone()
-        conn.close()
+        with self._cursor() as cursor:
+            cursor.execute("SELECT id FROM users WHERE username = ?", (username,))
+            result = cursor.fetchone()
         return result is not None
     
     def create_user(self, username: str, hashed_password: str, is_admin: bool = False) -> int:
         """Create a new user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO users (username, password, is_admin) VALUES (?, ?, ?)",
-            (username, hashed_password, is_admin)
-        )
-        user_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self._cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO users (username, password, is_admin) VALUES (?, ?, ?)",
+                (username, hashed_password, is_admin)
+            )
+            user_id = cursor.lastrowid
         return user_id
     
     def get_user_by_username(self, username: str) -> Optional[Dict]:
         """Get user by username"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, password, is_admin FROM users WHERE username = ?", (username,))
-        result = cursor.fetchone()
-        conn.close()
+        with self._cursor() as cursor:
+            cursor.execute("SELECT id, username, password, is_admin FROM users WHERE username = ?", (username,))
+            result = cursor.fetchone()
         
         if result:
             return {"id": result[0], "username": result[1], "password": result[2], "is_admin": bool(result[3])}
@@ -97,120 +337,312 @@ class DatabaseManager:
     
     def create_chat(self, chat_id: str, user_id: int, title: str):
         """Create a new chat"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO chats (id, user_id, title) VALUES (?, ?, ?)",
-            (chat_id, user_id, title)
-        )
-        conn.commit()
-        conn.close()
+        with self._cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO chats (id, user_id, title) VALUES (?, ?, ?)",
+                (chat_id, user_id, title)
+            )
+    
+    def create_chat_if_new(self, chat_id: str, user_id: int, title: str) -> bool:
+        """Create a chat under an id chosen by the client; False if the id is already taken"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "INSERT OR IGNORE INTO chats (id, user_id, title) VALUES (?, ?, ?)",
+                (chat_id, user_id, title)
+            )
+            return cursor.rowcount > 0
+    
+    def user_owns_chat(self, chat_id: str, user_id: int) -> bool:
+        """Whether chat_id exists and belongs to user_id"""
+        with self._cursor() as cursor:
+            cursor.execute("SELECT 1 FROM chats WHERE id = ? AND user_id = ?", (chat_id, user_id))
+            return cursor.fetchone() is not None
     
     def save_message(self, chat_id: str, role: str, content: str):
         """Save a message to the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO messages (chat_id, role, content) VALUES (?, ?, ?)",
-            (chat_id, role, content)
-        )
-        conn.commit()
-        conn.close()
+        with self._cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO messages (chat_id, role, content) VALUES (?, ?, ?)",
+                (chat_id, role, content)
+            )
     
-    def get_user_chats(self, user_id: int) -> List[Dict]:
-        """Get all chats for a user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, title, created_at FROM chats WHERE user_id = ? ORDER BY created_at DESC",
-            (user_id,)
-        )
-        results = cursor.fetchall()
-        conn.close()
+    def get_user_chats(self, user_id: int, limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict]:
+        """Get a user's chats, newest first.
+        
+        With limit/before this returns one keyset page: the `limit` chats
+        ordered after the `before` cursor (see encode_cursor).
+        """
+        query = "SELECT id, title, created_at FROM chats WHERE user_id = ?"
+        params = [user_id]
+        if before:
+            created_at, chat_id = decode_cursor(before)
+            query += " AND (created_at, id) < (?, ?)"
+            params += [created_at, chat_id]
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit if limit is not None else -1)
+        
+        with self._cursor() as cursor:
+            cursor.execute(query, params)
+            results = cursor.fetchall()
         
         return [
             {"id": row[0], "title": row[1], "created_at": row[2]}
             for row in results
         ]
     
-    def get_chat_messages(self, chat_id: str, user_id: int) -> List[Dict]:
-        """Get all messages for a specific chat"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT m.role, m.content, m.timestamp 
+    def get_chat_messages(self, chat_id: str, user_id: int, limit: Optional[int] = None, before: Optional[str] = None) -> List[Dict]:
+        """Get messages for a specific chat in chronological order.
+        
+        With limit/before this returns the `limit` most recent messages older
+        than the `before` cursor, still oldest first.
+        """
+        query = '''
+            SELECT m.id, m.role, m.content, m.timestamp 
             FROM messages m 
             JOIN chats c ON m.chat_id = c.id 
             WHERE c.id = ? AND c.user_id = ? 
-            ORDER BY m.timestamp
-        ''', (chat_id, user_id))
-        results = cursor.fetchall()
-        conn.close()
+        '''
+        params = [chat_id, user_id]
+        if before:
+            timestamp, message_id = decode_cursor(before)
+            query += " AND (m.timestamp, m.id) < (?, ?)"
+            params += [timestamp, message_id]
+        query += " ORDER BY m.timestamp DESC, m.id DESC LIMIT ?"
+        params.append(limit if limit is not None else -1)
+        
+        with self._cursor() as cursor:
+            cursor.execute(query, params)
+            results = cursor.fetchall()
         
         return [
-            {"role": row[0], "content": row[1], "timestamp": row[2]}
-            for row in results
+            {"id": row[0], "role": row[1], "content": row[2], "timestamp": row[3]}
+            for row in reversed(results)
         ]
     
+    def get_chat_context(self, chat_id: str, user_id: int) -> Optional[Dict]:
+        """Get the stored Ollama context of one of the user's chats"""
+        with self._cursor() as cursor:
+            cursor.execute('''
+                SELECT x.model, x.context
+                FROM chat_contexts x
+                JOIN chats c ON x.chat_id = c.id
+                WHERE x.chat_id = ? AND c.user_id = ?
+            ''', (chat_id, user_id))
+            row = cursor.fetchone()
+        
+        if row:
+            return {"model": row[0], "context": array("i", row[1])}
+        return None
+    
+    def save_chat_context(self, chat_id: str, user_id: int, model: str, context: List[int]) -> bool:
+        """Store the latest Ollama context of one of the user's chats, replacing the previous one"""
+        with self._cursor() as cursor:
+            cursor.execute('''
+                INSERT OR REPLACE INTO chat_contexts (chat_id, model, context, updated_at)
+                SELECT id, ?, ?, CURRENT_TIMESTAMP FROM chats WHERE id = ? AND user_id = ?
+            ''', (model, array("i", context).tobytes(), chat_id, user_id))
+            return cursor.rowcount > 0
+    
+    def delete_chat_context(self, chat_id: str, user_id: int):
+        """Forget the Ollama context of one of the user's chats"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM chat_contexts WHERE chat_id IN (SELECT id FROM chats WHERE id = ? AND user_id = ?)",
+                (chat_id, user_id)
+            )
+    
     def delete_chat(self, chat_id: str, user_id: int):
         """Delete a chat and its messages"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._cursor() as cursor:
+            # Delete messages and conversation context first
+            cursor.execute('''
+                DELETE FROM messages 
+                WHERE chat_id IN (
+                    SELECT id FROM chats WHERE id = ? AND user_id = ?
+                )
+            ''', (chat_id, user_id))
+            cursor.execute('''
+                DELETE FROM chat_contexts 
+                WHERE chat_id IN (
+                    SELECT id FROM chats WHERE id = ? AND user_id = ?
+                )
+            ''', (chat_id, user_id))
         
-        # Delete messages first
-        cursor.execute('''
-            DELETE FROM messages 
-            WHERE chat_id IN (
-                SELECT id FROM chats WHERE id = ? AND user_id = ?
+            # Delete chat
+            cursor.execute(
+                "DELETE FROM chats WHERE id = ? AND user_id = ?",
+                (chat_id, user_id)
             )
-        ''', (chat_id, user_id))
-        
-        # Delete chat
-        cursor.execute(
-            "DELETE FROM chats WHERE id = ? AND user_id = ?",
-            (chat_id, user_id)
-        )
-        
-        conn.commit()
-        conn.close()
     
     def save_document(self, user_id: int, filename: str, content: str) -> int:
-        """Save a document to the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Save a document to the database, its text compressed into the blob store"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO documents (user_id, filename, content) VALUES (?, ?, '')",
+                (user_id, filename)
+            )
+            doc_id = cursor.lastrowid
+            if content:
+                self._store_document_blob(cursor, doc_id, *document_store.compress(content))
+        return doc_id
+    
+    def save_document_content(self, document_id: int, content_hash: str, codec: str, size: int, data: bytes):
+        """Attach compressed text from a document_store.BlobWriter to a document"""
+        with self._cursor() as cursor:
+            self._store_document_blob(cursor, document_id, content_hash, codec, size, data)
+    
+    def _store_document_blob(self, cursor: sqlite3.Cursor, document_id: int, content_hash: str, codec: str, size: int, data: bytes):
+        # Identical uploads share one blob
         cursor.execute(
-            "INSERT INTO documents (user_id, filename, content) VALUES (?, ?, ?)",
-            (user_id, filename, content)
+            "INSERT OR IGNORE INTO document_blobs (content_hash, codec, size, data) VALUES (?, ?, ?, ?)",
+            (content_hash, codec, size, data)
         )
-        doc_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return doc_id
+        cursor.execute("UPDATE documents SET content_hash = ? WHERE id = ?", (content_hash, document_id))
     
     def get_user_documents(self, user_id: int) -> List[Dict]:
         """Get all documents for a user"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, filename, created_at FROM documents WHERE user_id = ? ORDER BY created_at DESC",
-            (user_id,)
-        )
-        results = cursor.fetchall()
-        conn.close()
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT id, filename, created_at FROM documents WHERE user_id = ? ORDER BY created_at DESC",
+                (user_id,)
+            )
+            results = cursor.fetchall()
         
         return [
             {"id": row[0], "filename": row[1], "created_at": row[2]}
             for row in results
         ]
     
+    # Ingestion jobs
+    def create_ingestion_job(self, job_id: str, user_id: int, filename: str, file_path: str, source_hash: Optional[str] = None):
+        """Record a queued ingestion job"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO ingestion_jobs (id, user_id, filename, file_path, source_hash) VALUES (?, ?, ?, ?, ?)",
+                (job_id, user_id, filename, file_path, source_hash)
+            )
+
+    def update_ingestion_job(self, job_id: str, **fields):
+        """Update the status/progress columns of an ingestion job"""
+        allowed = ("status", "chunks_total", "chunks_done", "reused_chunks", "document_id", "error")
+        columns = [column for column in allowed if column in fields]
+        if not columns:
+            return
+
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        with self._cursor() as cursor:
+            cursor.execute(
+                f"UPDATE ingestion_jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                [fields[column] for column in columns] + [job_id]
+            )
+
+    def claim_next_ingestion_job(self, user_id: int, filename: str, lease_seconds: float) -> Optional[str]:
+        """Mark the next job for a document as running and return its id, or None if it isn't ours to run.
+
+        Jobs for the same user and filename run one at a time in submission
+        order, across every process sharing the database: only the oldest
+        unfinished job for the document can be claimed, and not while
+        another process is running it. A running job whose updated_at is
+        older than lease_seconds was abandoned by a stopped process and is
+        claimed again.
+        """
+        with self._cursor() as cursor:
+            # Take the write lock before reading, so two processes can't claim the same job
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute('''
+                SELECT id, status, updated_at < datetime('now', ?) FROM ingestion_jobs
+                WHERE user_id = ? AND filename = ? AND status NOT IN ('done', 'failed')
+                ORDER BY created_at, rowid
+                LIMIT 1
+            ''', (f"-{int(lease_seconds)} seconds", user_id, filename))
+            result = cursor.fetchone()
+            if not result or (result[1] != 'queued' and not result[2]):
+                return None
+            cursor.execute(
+                "UPDATE ingestion_jobs SET status = 'extracting', chunks_done = 0, updated_at = CURRENT_TIMESTAMP "
+                "WHERE id = ?",
+                (result[0],)
+            )
+            return result[0]
+
+    def has_unfinished_ingestion_jobs(self, user_id: int, filename: str) -> bool:
+        """Whether any job for the user's filename is still queued or running"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM ingestion_jobs WHERE user_id = ? AND filename = ? AND status NOT IN ('done', 'failed') LIMIT 1",
+                (user_id, filename)
+            )
+            return cursor.fetchone() is not None
+
+    def touch_ingestion_jobs(self, job_ids: List[str]):
+        """Renew the lease of running jobs (see claim_ingestion_job)"""
+        with self._cursor() as cursor:
+            cursor.executemany(
+                "UPDATE ingestion_jobs SET updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                [(job_id,) for job_id in job_ids]
+            )
+
+    def get_ingestion_job(self, job_id: str, user_id: Optional[int] = None) -> Optional[Dict]:
+        """Get an ingestion job, optionally only if it belongs to user_id"""
+        query = '''
+            SELECT id, user_id, filename, file_path, status, chunks_total, chunks_done,
+                   reused_chunks, document_id, error, created_at, updated_at
+            FROM ingestion_jobs WHERE id = ?
+        '''
+        params = [job_id]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+
+        with self._cursor() as cursor:
+            cursor.execute(query, params)
+            result = cursor.fetchone()
+
+        if result:
+            return {
+                "id": result[0], "user_id": result[1], "filename": result[2], "file_path": result[3],
+                "status": result[4], "chunks_total": result[5], "chunks_done": result[6],
+                "reused_chunks": result[7], "document_id": result[8], "error": result[9],
+                "created_at": result[10], "updated_at": result[11]
+            }
+        return None
+
+    def find_ingestion_job_by_source(self, user_id: int, filename: str, source_hash: str) -> Optional[Dict]:
+        """Get the user's latest ingest of filename if it was of these exact bytes and is running or still has its document"""
+        with self._cursor() as cursor:
+            # Only the latest ingest of a name counts: a later upload replaced the chunks of earlier ones
+            cursor.execute('''
+                SELECT j.id, j.source_hash, j.status, d.id FROM ingestion_jobs j
+                LEFT JOIN documents d ON d.id = j.document_id
+                WHERE j.user_id = ? AND j.filename = ? AND j.status != 'failed'
+                ORDER BY j.created_at DESC, j.rowid DESC
+                LIMIT 1
+            ''', (user_id, filename))
+            result = cursor.fetchone()
+        if not result or result[1] != source_hash or (result[2] == 'done' and result[3] is None):
+            return None
+        return self.get_ingestion_job(result[0])
+
+    def get_unfinished_ingestion_jobs(self) -> List[Dict]:
+        """Get jobs that were still queued or running"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT id, status, file_path, user_id, filename FROM ingestion_jobs "
+                "WHERE status NOT IN ('done', 'failed') ORDER BY created_at, rowid"
+            )
+            results = cursor.fetchall()
+
+        return [
+            {"id": row[0], "status": row[1], "file_path": row[2], "user_id": row[3], "filename": row[4]}
+            for row in results
+        ]
+
     # Admin methods
     def get_user_by_id(self, user_id: int) -> Optional[Dict]:
         """Get user by ID"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, is_admin, created_at FROM users WHERE id = ?", (user_id,))
-        result = cursor.fetchone()
-        conn.close()
+        with self._cursor() as cursor:
+            cursor.execute("SELECT id, username, is_admin, created_at FROM users WHERE id = ?", (user_id,))
+            result = cursor.fetchone()
         
         if result:
             return {"id": result[0], "username": result[1], "is_admin": bool(result[2]), "created_at": result[3]}
@@ -218,11 +650,9 @@ class DatabaseManager:
     
     def get_all_users(self) -> List[Dict]:
         """Get all users"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, is_admin, created_at FROM users ORDER BY created_at DESC")
-        results = cursor.fetchall()
-        conn.close()
+        with self._cursor() as cursor:
+            cursor.execute("SELECT id, username, is_admin, created_at FROM users ORDER BY created_at DESC")
+            results = cursor.fetchall()
         
         return [
             {"id": row[0], "username": row[1], "is_admin": bool(row[2]), "created_at": row[3]}
@@ -232,14 +662,11 @@ class DatabaseManager:
     def update_user(self, user_id: int, username: str, is_admin: bool = False) -> bool:
         """Update user details"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE users SET username = ?, is_admin = ? WHERE id = ?",
-                (username, is_admin, user_id)
-            )
-            conn.commit()
-            conn.close()
+            with self._cursor() as cursor:
+                cursor.execute(
+                    "UPDATE users SET username = ?, is_admin = ? WHERE id = ?",
+                    (username, is_admin, user_id)
+                )
             return True
         except Exception as e:
             print(f"Error updating user: {e}")
@@ -248,14 +675,11 @@ class DatabaseManager:
     def update_user_password(self, user_id: int, hashed_password: str) -> bool:
         """Update user password"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE users SET password = ? WHERE id = ?",
-                (hashed_password, user_id)
-            )
-            conn.commit()
-            conn.close()
+            with self._cursor() as cursor:
+                cursor.execute(
+                    "UPDATE users SET password = ? WHERE id = ?",
+                    (hashed_password, user_id)
+                )
             return True
         except Exception as e:
             print(f"Error updating password: {e}")
@@ -264,11 +688,8 @@ class DatabaseManager:
     def delete_user(self, user_id: int) -> bool:
         """Delete user"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
-            conn.commit()
-            conn.close()
+            with self._cursor() as cursor:
+                cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
             return True
         except Exception as e:
             print(f"Error deleting user: {e}")
@@ -277,22 +698,24 @@ class DatabaseManager:
     def delete_user_chats(self, user_id: int) -> bool:
         """Delete all chats and messages for a user"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self._cursor() as cursor:
+                # Delete messages and conversation contexts first
+                cursor.execute('''
+                    DELETE FROM messages 
+                    WHERE chat_id IN (
+                        SELECT id FROM chats WHERE user_id = ?
+                    )
+                ''', (user_id,))
+                cursor.execute('''
+                    DELETE FROM chat_contexts 
+                    WHERE chat_id IN (
+                        SELECT id FROM chats WHERE user_id = ?
+                    )
+                ''', (user_id,))
             
-            # Delete messages first
-            cursor.execute('''
-                DELETE FROM messages 
-                WHERE chat_id IN (
-                    SELECT id FROM chats WHERE user_id = ?
-                )
-            ''', (user_id,))
+                # Delete chats
+                cursor.execute("DELETE FROM chats WHERE user_id = ?", (user_id,))
             
-            # Delete chats
-            cursor.execute("DELETE FROM chats WHERE user_id = ?", (user_id,))
-            
-            conn.commit()
-            conn.close()
             return True
         except Exception as e:
             print(f"Error deleting user chats: {e}")
@@ -300,84 +723,144 @@ class DatabaseManager:
     
     def get_all_documents(self) -> List[Dict]:
         """Get all documents from all users"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT d.id, d.filename, d.created_at, u.username 
-            FROM documents d 
-            JOIN users u ON d.user_id = u.id 
-            ORDER BY d.created_at DESC
-        ''')
-        results = cursor.fetchall()
-        conn.close()
+        with self._cursor() as cursor:
+            cursor.execute('''
+                SELECT d.id, d.filename, d.created_at, u.username 
+                FROM documents d 
+                JOIN users u ON d.user_id = u.id 
+                ORDER BY d.created_at DESC
+            ''')
+            results = cursor.fetchall()
         
         return [
             {"id": row[0], "filename": row[1], "created_at": row[2], "username": row[3]}
             for row in results
         ]
     
-    def get_document_by_id(self, document_id: int) -> Optional[Dict]:
-        """Get document by ID"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT d.id, d.filename, d.content, d.created_at, u.username 
-            FROM documents d 
-            JOIN users u ON d.user_id = u.id 
-            WHERE d.id = ?
-        ''', (document_id,))
-        result = cursor.fetchone()
-        conn.close()
+    def get_document_by_id(self, document_id: int, include_content: bool = True) -> Optional[Dict]:
+        """Get document by ID; its text is only read and decompressed if include_content"""
+        with self._cursor() as cursor:
+            cursor.execute('''
+                SELECT d.id, d.filename, d.content_hash, d.created_at, u.username, d.user_id 
+                FROM documents d 
+                JOIN users u ON d.user_id = u.id 
+                WHERE d.id = ?
+            ''', (document_id,))
+            result = cursor.fetchone()
+            
+            content = None
+            if result and include_content:
+                content = ""
+                if result[2]:
+                    cursor.execute("SELECT codec, data FROM document_blobs WHERE content_hash = ?", (result[2],))
+                    blob = cursor.fetchone()
+                    if blob:
+                        content = document_store.decompress(blob[1], blob[0]).strip()
         
         if result:
-            return {"id": result[0], "filename": result[1], "content": result[2], "created_at": result[3], "username": result[4]}
+            document = {"id": result[0], "filename": result[1], "created_at": result[3], "username": result[4], "user_id": result[5]}
+            if include_content:
+                document["content"] = content
+            return document
         return None
     
     def delete_document(self, document_id: int) -> bool:
-        """Delete a document"""
+        """Delete a document, and its text blob once no other document shares it"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM documents WHERE id = ?", (document_id,))
-            conn.commit()
-            conn.close()
+            with self._cursor() as cursor:
+                self._delete_documents(cursor, "id = ?", (document_id,))
             return True
         except Exception as e:
             print(f"Error deleting document: {e}")
             return False
     
+    def has_newer_document(self, document_id: int, user_id: int, filename: str) -> bool:
+        """Whether a later upload of filename by the user replaced this document's chunks"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM documents WHERE user_id = ? AND filename = ? AND id > ? LIMIT 1",
+                (user_id, filename, document_id)
+            )
+            return cursor.fetchone() is not None
+    
+    def get_superseded_documents(self) -> List[Dict]:
+        """Documents whose chunks were replaced by a later upload with the same name"""
+        with self._cursor() as cursor:
+            cursor.execute('''
+                SELECT d.id, d.user_id, d.filename, d.created_at FROM documents d
+                WHERE EXISTS (
+                    SELECT 1 FROM documents newer
+                    WHERE newer.user_id = d.user_id AND newer.filename = d.filename AND newer.id > d.id
+                )
+                ORDER BY d.user_id, d.filename, d.id
+            ''')
+            results = cursor.fetchall()
+        
+        return [
+            {"id": row[0], "user_id": row[1], "filename": row[2], "created_at": row[3]}
+            for row in results
+        ]
+    
+    def delete_replaced_documents(self, user_id: int, filename: str, document_id: int):
+        """Delete a user's earlier documents with this filename once document_id has replaced their chunks"""
+        with self._cursor() as cursor:
+            # Rows are inserted as jobs start, and jobs for one filename run in submission order
+            self._delete_documents(cursor, "user_id = ? AND filename = ? AND id < ?", (user_id, filename, document_id))
+    
+    def _delete_documents(self, cursor: sqlite3.Cursor, where: str, params: tuple):
+        cursor.execute(f"SELECT DISTINCT content_hash FROM documents WHERE {where}", params)
+        hashes = [row[0] for row in cursor.fetchall() if row[0]]
+        cursor.execute(f"DELETE FROM documents WHERE {where}", params)
+        cursor.executemany(
+            "DELETE FROM document_blobs WHERE content_hash = ? "
+            "AND NOT EXISTS (SELECT 1 FROM documents WHERE content_hash = ?)",
+            ((content_hash, content_hash) for content_hash in hashes)
+        )
+    
     def get_user_count(self) -> int:
         """Get total number of users"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM users")
-        result = cursor.fetchone()
-        conn.close()
+        with self._cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM users")
+            result = cursor.fetchone()
         return result[0] if result else 0
     
     def get_document_count(self) -> int:
         """Get total number of documents"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM documents")
-        result = cursor.fetchone()
-        conn.close()
+        with self._cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM documents")
+            result = cursor.fetchone()
         return result[0] if result else 0
     
     def get_chat_count(self) -> int:
         """Get total number of chats"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM chats")
-        result = cursor.fetchone()
-        conn.close()
+        with self._cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM chats")
+            result = cursor.fetchone()
         return result[0] if result else 0
     
     def get_message_count(self) -> int:
         """Get total number of messages"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM messages")
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else 0 
\ No newline at end of file
+        with self._cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM messages")
+            result = cursor.fetchone()
+        return result[0] if result else 0
+    
+    def get_table_counts(self) -> Dict[str, int]:
+        """Row counts of users, documents, chats and messages in one read of the trigger-maintained counters"""
+        with self._cursor() as cursor:
+            cursor.execute("SELECT name, count FROM table_counts")
+            return dict(cursor.fetchall())
+    
+    def get_recent_activity(self, limit: int = 10) -> List[Dict]:
+        """Newest entries of the recent activity ring buffer (new users, documents and chats)"""
+        with self._cursor() as cursor:
+            cursor.execute(
+                "SELECT type, description, username, timestamp FROM recent_activity ORDER BY id DESC LIMIT ?",
+                (limit,)
+            )
+            results = cursor.fetchall()
+        
+        return [
+            {"type": row[0], "description": row[1], "username": row[2], "timestamp": row[3]}
+            for row in results
+        ] 
\ No newline at end of file
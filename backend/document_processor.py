@@ -1,71 +1,155 @@
-import pdfplumber
-from docx import Document
+import itertools
+import multiprocessing
 import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+
+# pdfplumber, python-docx and the chunker are imported where they are used,
+# so importing this module (and starting the API) stays cheap
+
+def _iter_pdf_pages(file_path: str, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+    """Yield the text of pages [start, end) of a PDF one page at a time"""
+    import pdfplumber
+    with pdfplumber.open(file_path) as pdf:
+        for page in pdf.pages[start:end]:
+            page_text = page.extract_text()
+            # Release the page's parsed layout before moving on
+            page.close()
+            if page_text:
+                yield page_text
+
+def _extract_pdf_pages(file_path: str, start: int, end: int) -> List[str]:
+    """Extract the text of pages [start, end) of a PDF (runs in worker processes)"""
+    return list(_iter_pdf_pages(file_path, start, end))
 
 class DocumentProcessor:
     def __init__(self):
-        pass
+        self.pdf_workers = max(1, int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1))))
+        # Below this many pages the process start-up and pickling cost more than they save
+        self.pdf_parallel_min_pages = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+        self._process_pool = None
+        self._process_pool_workers = 0
+        self._pool_lock = threading.Lock()
+        self._chunker = None
     
-    def extract_text(self, file_path: str) -> str:
-        """Extract text from PDF or DOCX file"""
+    def extract_text(self, file_path: str, parallel: bool = False, max_workers: Optional[int] = None) -> str:
+        """Extract text from PDF or DOCX file.
+        
+        With parallel=True, large PDFs are split into page ranges that are
+        extracted concurrently in a process pool.
+        """
+        return "\n".join(self.iter_text(file_path, parallel, max_workers)).strip()
+    
+    def iter_text(self, file_path: str, parallel: bool = False, max_workers: Optional[int] = None) -> Iterator[str]:
+        """Yield the text of a PDF page by page, or of a DOCX paragraph by paragraph.
+        
+        Joining the pieces with newlines gives the same text as extract_text,
+        without holding the whole document as one string.
+        """
         file_extension = os.path.splitext(file_path)[1].lower()
         
         if file_extension == '.pdf':
-            return self._extract_from_pdf(file_path)
+            if parallel:
+                return self._iter_pdf_parallel(file_path, max_workers or self.pdf_workers)
+            return self._iter_pdf(file_path)
         elif file_extension == '.docx':
-            return self._extract_from_docx(file_path)
+            return self._iter_docx(file_path)
         else:
             raise ValueError(f"Unsupported file type: {file_extension}")
     
-    def _extract_from_pdf(self, file_path: str) -> str:
+    def _iter_pdf(self, file_path: str) -> Iterator[str]:
         """Extract text from PDF file using pdfplumber"""
         try:
-            text = ""
+            yield from _iter_pdf_pages(file_path)
+        except Exception as e:
+            raise Exception(f"Error extracting text from PDF: {str(e)}")
+    
+    def _iter_pdf_parallel(self, file_path: str, max_workers: int) -> Iterator[str]:
+        """Extract text from PDF file by splitting page ranges across worker processes"""
+        try:
+            import pdfplumber
             with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
+                page_count = len(pdf.pages)
+            
+            if max_workers <= 1 or page_count < self.pdf_parallel_min_pages:
+                yield from _iter_pdf_pages(file_path)
+                return
             
-            return text.strip()
+            # A few ranges per worker keeps them busy when some pages are much heavier than others
+            range_count = min(page_count, max_workers * 4)
+            bounds = [page_count * i // range_count for i in range(range_count + 1)]
+            
+            pool = self._get_process_pool(max_workers)
+            # Only about two ranges per worker are extracted ahead of the consumer,
+            # so a slow reader holds a bounded amount of page text; yielded in page order
+            window = max_workers * 2
+            ranges = iter(zip(bounds[:-1], bounds[1:]))
+            pending = deque(
+                pool.submit(_extract_pdf_pages, file_path, start, end)
+                for start, end in itertools.islice(ranges, window)
+            )
+            try:
+                while pending:
+                    page_texts = pending.popleft().result()
+                    for start, end in itertools.islice(ranges, 1):
+                        pending.append(pool.submit(_extract_pdf_pages, file_path, start, end))
+                    yield from page_texts
+            finally:
+                for future in pending:
+                    future.cancel()
         except Exception as e:
             raise Exception(f"Error extracting text from PDF: {str(e)}")
     
-    def _extract_from_docx(self, file_path: str) -> str:
+    def _get_process_pool(self, max_workers: int) -> ProcessPoolExecutor:
+        """Lazily start the extraction process pool, reusing it across documents"""
+        with self._pool_lock:
+            if self._process_pool is None or self._process_pool_workers != max_workers:
+                if self._process_pool is not None:
+                    self._process_pool.shutdown(wait=False)
+                # spawn rather than fork: the server process is multi-threaded
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                self._process_pool_workers = max_workers
+            return self._process_pool
+    
+    def close(self):
+        """Shut down the extraction process pool"""
+        with self._pool_lock:
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False)
+                self._process_pool = None
+    
+    def _iter_docx(self, file_path: str) -> Iterator[str]:
         """Extract text from DOCX file using python-docx"""
         try:
+            from docx import Document
             doc = Document(file_path)
-            text = ""
-            
             for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            
-            return text.strip()
+                yield paragraph.text
         except Exception as e:
             raise Exception(f"Error extracting text from DOCX: {str(e)}")
     
-    def chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> list:
-        """Split text into overlapping chunks"""
-        chunks = []
-        start = 0
-        
-        while start < len(text):
-            end = start + chunk_size
-            
-            # If this is not the last chunk, try to break at a sentence boundary
-            if end < len(text):
-                # Look for sentence endings
-                for i in range(end, max(start, end - 100), -1):
-                    if text[i] in '.!?':
-                        end = i + 1
-                        break
-            
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            
-            start = end - overlap
-            if start >= len(text):
-                break
+    @property
+    def chunker(self):
+        """Chunker for the configured CHUNK_STRATEGY"""
+        if self._chunker is None:
+            from chunking import get_chunker
+            self._chunker = get_chunker()
+        return self._chunker
+    
+    def chunk_text(self, text: str) -> list:
+        """Split text into overlapping chunks using the configured chunk strategy"""
+        return self.chunker.chunk(text)
+    
+    def iter_chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        """Chunk a stream of text pieces (pages, paragraphs) as they arrive.
         
-        return chunks 
\ No newline at end of file
+        Produces the same chunks as chunk_text on the newline-joined pieces
+        (save for very long runs of text without a sentence end), while only
+        buffering about one chunk of text at a time.
+        """
+        return self.chunker.iter_chunks(pieces)
@@ -0,0 +1,81 @@
+import hashlib
+import os
+import zlib
+from typing import Optional, Tuple
+
+# Codecs a stored document can use; zstd needs the optional zstandard package
+CODECS = ("zlib", "zstd")
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 6
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+def default_codec() -> str:
+    """DOCUMENT_CODEC if set, else zstd when zstandard is installed, else zlib"""
+    codec = os.getenv("DOCUMENT_CODEC")
+    if codec:
+        if codec not in CODECS:
+            raise ValueError(f"Unknown DOCUMENT_CODEC '{codec}', expected one of {', '.join(CODECS)}")
+        return codec
+    return "zstd" if _zstandard() is not None else "zlib"
+
+
+class BlobWriter:
+    """Compresses and hashes a document's text as it is extracted.
+
+    Pieces (pages or paragraphs) are joined with newlines. Only
+    the compressed output is held in memory, so a long document costs a
+    fraction of its text size until it is stored.
+    """
+
+    def __init__(self, codec: Optional[str] = None):
+        self.codec = codec or default_codec()
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._parts = []
+        self._first = True
+        if self.codec == "zstd":
+            zstandard = _zstandard()
+            if zstandard is None:
+                raise RuntimeError("DOCUMENT_CODEC=zstd needs the zstandard package")
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        else:
+            self._compressor = zlib.compressobj(ZLIB_LEVEL)
+
+    def write(self, text: str):
+        """Append one extracted piece of text"""
+        data = (text if self._first else "\n" + text).encode("utf-8")
+        self._first = False
+        self.size += len(data)
+        self._hash.update(data)
+        compressed = self._compressor.compress(data)
+        if compressed:
+            self._parts.append(compressed)
+
+    def finish(self) -> Tuple[str, str, int, bytes]:
+        """Return (content_hash, codec, uncompressed size, compressed data)"""
+        self._parts.append(self._compressor.flush())
+        return self._hash.hexdigest(), self.codec, self.size, b"".join(self._parts)
+
+
+def compress(text: str, codec: Optional[str] = None) -> Tuple[str, str, int, bytes]:
+    """Compress a whole text at once; same result as a BlobWriter fed the text"""
+    writer = BlobWriter(codec)
+    writer.write(text)
+    return writer.finish()
+
+def decompress(data: bytes, codec: str) -> str:
+    """Text of a stored blob"""
+    if codec == "zstd":
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise RuntimeError("This document is zstd-compressed; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data).decode("utf-8")
+    if codec == "zlib":
+        return zlib.decompress(data).decode("utf-8")
+    raise ValueError(f"Unknown document codec '{codec}'")
@@ -0,0 +1,230 @@
+import sqlite3
+import threading
+import hashlib
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+class EmbeddingCache:
+    """Bounded LRU cache of query embeddings with an optional SQLite backing store.
+
+    Entries are keyed by embedding model and normalized query text. When a
+    path is given every new embedding is also written to disk, and memory
+    misses fall back to the disk store, so the cache survives restarts.
+    """
+
+    def __init__(self, max_entries: int = 1024, path: Optional[str] = None, max_disk_entries: int = 100000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.path = path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Guards the SQLite connection, so disk reads and writes never hold up memory lookups
+        self._disk_lock = threading.Lock()
+        self._conn = None
+        self._writes_since_prune = 0
+        if path:
+            self._init_store()
+
+    def _init_store(self):
+        """Open the on-disk store"""
+        try:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS query_embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_query_embeddings_last_used ON query_embeddings (last_used)")
+            self._conn.commit()
+        except Exception as e:
+            print(f"Warning: Could not open embedding cache store: {e}")
+            self._conn = None
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize query text so trivially different spellings share an entry"""
+        return " ".join(text.casefold().split())
+
+    def _key(self, model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{self.normalize(text)}".encode("utf-8")).hexdigest()
+
+    @property
+    def persistent(self) -> bool:
+        """Whether entries are also kept in the on-disk store"""
+        return self._conn is not None
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Return the cached embedding for text, or None on a miss"""
+        embedding = self.get_in_memory(model, text)
+        if embedding is None:
+            embedding = self.load(model, text)
+        return embedding
+
+    def get_in_memory(self, model: str, text: str) -> Optional[List[float]]:
+        """Look text up in the in-memory LRU only; a None here is not counted as a miss"""
+        key = self._key(model, text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return embedding
+
+    def load(self, model: str, text: str) -> Optional[List[float]]:
+        """Look text up in the on-disk store, keeping a hit in memory (blocking)"""
+        key = self._key(model, text)
+        embedding = self._load(key)
+        with self._lock:
+            if embedding is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, embedding)
+        return embedding
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        """Cache an embedding for text"""
+        self.put_in_memory(model, text, embedding)
+        self.save(model, text, embedding)
+
+    def put_in_memory(self, model: str, text: str, embedding: List[float]):
+        """Cache an embedding in the in-memory LRU only"""
+        key = self._key(model, text)
+        with self._lock:
+            self._remember(key, embedding)
+
+    def save(self, model: str, text: str, embedding: List[float]):
+        """Write an embedding to the on-disk store (blocking)"""
+        self._store(self._key(model, text), model, embedding)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries
+            }
+
+    def clear(self):
+        """Drop every cached entry, in memory and on disk"""
+        with self._lock:
+            self._entries.clear()
+        if self._conn is not None:
+            with self._disk_lock:
+                self._conn.execute("DELETE FROM query_embeddings")
+                self._conn.commit()
+
+    def _remember(self, key: str, embedding: List[float]):
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[List[float]]:
+        if self._conn is None:
+            return None
+        try:
+            with self._disk_lock:
+                row = self._conn.execute("SELECT embedding FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                self._conn.execute("UPDATE query_embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+            return array("f", row[0]).tolist()
+        except Exception as e:
+            print(f"Error reading embedding cache: {e}")
+            return None
+
+    def _store(self, key: str, model: str, embedding: List[float]):
+        if self._conn is None:
+            return
+        try:
+            with self._disk_lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, model, embedding, last_used) VALUES (?, ?, ?, ?)",
+                    (key, model, array("f", embedding).tobytes(), time.time())
+                )
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= 1000:
+                    self._prune()
+                self._conn.commit()
+        except Exception as e:
+            print(f"Error writing embedding cache: {e}")
+
+    def _prune(self):
+        """Keep the disk store within max_disk_entries, dropping least recently used rows"""
+        self._writes_since_prune = 0
+        self._conn.execute('''
+            DELETE FROM query_embeddings WHERE key IN (
+                SELECT key FROM query_embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_disk_entries,))
+
+
+class ChunkEmbeddingStore:
+    """Content-addressed store of chunk embeddings.
+
+    Vectors are keyed by a hash of the embedding model and the exact chunk
+    text, so re-ingesting an unchanged or partly changed document only needs
+    embeddings for chunks that have not been seen before.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS chunk_embeddings (
+                content_hash TEXT PRIMARY KEY,
+                embedding BLOB NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    @staticmethod
+    def content_hash(model: str, text: str) -> str:
+        """Address of a chunk's embedding"""
+        return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, hashes: List[str]) -> Dict[str, List[float]]:
+        """Return the stored embeddings for whichever hashes are present"""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT content_hash, embedding FROM chunk_embeddings WHERE content_hash IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for content_hash, blob in rows:
+                    found[content_hash] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        """Store embeddings by content hash"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunk_embeddings (content_hash, embedding) VALUES (?, ?)",
+                ((content_hash, array("f", embedding).tobytes()) for content_hash, embedding in items.items())
+            )
+            self._conn.commit()
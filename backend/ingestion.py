@@ -0,0 +1,276 @@
+import os
+import uuid
+import hashlib
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional
+
+from document_store import BlobWriter
+from rag_engine import IngestAborted
+
+logger = logging.getLogger(__name__)
+
+# Job states, in the order a successful job moves through them
+QUEUED = "queued"
+EXTRACTING = "extracting"
+EMBEDDING = "embedding"
+DONE = "done"
+FAILED = "failed"
+
+# Uploads are copied to disk in pieces of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# A running job whose lease (its updated_at) is older than this was abandoned by a stopped process
+JOB_LEASE_SECONDS = 60
+# Running jobs renew their lease this often
+JOB_HEARTBEAT_SECONDS = 15
+# How soon to check again for a document whose job another process is running
+CLAIM_RETRY_SECONDS = 1.0
+
+class UploadTooLarge(ValueError):
+    """The upload passed the size limit while it was being copied"""
+
+def save_upload(source: BinaryIO, file_path: str, max_bytes: int, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    """Copy an uploaded file to a new file at file_path and return its SHA-256.
+
+    The copy goes through one reused chunk_size buffer, so memory use doesn't
+    grow with the upload. Raises UploadTooLarge, leaving no file behind, as
+    soon as more than max_bytes have been read.
+    """
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    # SpooledTemporaryFile only has readinto() from Python 3.11
+    readinto = getattr(source, "readinto", None)
+    total = 0
+    try:
+        # "xb" so a name collision fails instead of overwriting another upload
+        with open(file_path, "xb") as target:
+            while True:
+                if readinto is not None:
+                    read = readinto(buffer)
+                else:
+                    data = source.read(chunk_size)
+                    read = len(data)
+                    view[:read] = data
+                if not read:
+                    break
+                total += read
+                if total > max_bytes:
+                    raise UploadTooLarge(f"Upload is larger than {max_bytes} bytes")
+                digest.update(view[:read])
+                target.write(view[:read])
+    except BaseException:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+        raise
+    return digest.hexdigest()
+
+class IngestionQueue:
+    """Background document ingestion on a pool of worker threads.
+
+    Every upload becomes a row in the ingestion_jobs table, so callers can
+    poll its state and progress, and jobs that were queued or running when
+    the process stopped are picked up again on start(). Jobs for the same
+    user and filename replace each other's chunks, so they run one at a
+    time in the order they were submitted, also when several server
+    processes share the database: a worker claims the next job for a
+    document in the table (see DatabaseManager.claim_next_ingestion_job)
+    and renews the claim while it runs, so a job left running by a stopped
+    process is taken over once its lease runs out.
+    """
+
+    def __init__(self, db_manager, rag_engine, document_processor, workers: Optional[int] = None):
+        self.db_manager = db_manager
+        self.rag_engine = rag_engine
+        self.document_processor = document_processor
+        self.workers = workers or rag_engine.ingest_workers
+        self._executor = None
+        # (user_id, filename) of each document this process is working through -> whether
+        # new jobs were submitted for it since it last looked for one
+        self._documents: Dict[tuple, bool] = {}
+        self._running = set()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker pool and resume jobs left over from a previous run"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+            self._stopped = threading.Event()
+            threading.Thread(target=self._heartbeat, args=(self._stopped,), name="ingest-heartbeat", daemon=True).start()
+
+        for job in self.db_manager.get_unfinished_ingestion_jobs():
+            if os.path.exists(job["file_path"]):
+                # Ingestion is idempotent (chunks are upserted), so interrupted jobs simply run again
+                self._dispatch((job["user_id"], job["filename"]))
+            else:
+                self.db_manager.update_ingestion_job(job["id"], status=FAILED, error="Upload was lost during a restart")
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting jobs; queued jobs resume on the next start()"""
+        self._stopped.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+        with self._lock:
+            self._documents.clear()
+
+    def submit(self, user_id: int, filename: str, file_path: str, source_hash: Optional[str] = None) -> str:
+        """Queue a saved upload for ingestion and return its job id"""
+        if self._executor is None:
+            self.start()
+
+        job_id = str(uuid.uuid4())
+        self.db_manager.create_ingestion_job(job_id, user_id, filename, file_path, source_hash)
+        self._dispatch((user_id, filename))
+        return job_id
+
+    def _dispatch(self, key: tuple):
+        """Work through a document's jobs, unless this process already is"""
+        with self._lock:
+            if key in self._documents:
+                self._documents[key] = True
+                return
+            self._documents[key] = False
+        self._schedule(key)
+
+    def _schedule(self, key: tuple, delay: float = 0):
+        executor = self._executor
+        if executor is None:
+            # Shut down meanwhile; the jobs are still in the table and resume on start()
+            return
+        if delay:
+            timer = threading.Timer(delay, self._schedule, (key,))
+            timer.daemon = True
+            timer.start()
+            return
+        try:
+            executor.submit(self._run_next, key)
+        except RuntimeError:
+            pass
+
+    def _run_next(self, key: tuple):
+        """Run the document's next job if this process can claim it, then look again"""
+        with self._lock:
+            self._documents[key] = False
+        user_id, filename = key
+
+        job_id = self.db_manager.claim_next_ingestion_job(user_id, filename, JOB_LEASE_SECONDS)
+        if job_id is not None:
+            with self._lock:
+                self._running.add(job_id)
+            try:
+                self._run(job_id)
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+            self._schedule(key)
+        elif self.db_manager.has_unfinished_ingestion_jobs(user_id, filename):
+            # Another process is running the document's current job
+            self._schedule(key, CLAIM_RETRY_SECONDS)
+        else:
+            with self._lock:
+                submitted = self._documents.get(key)
+                if not submitted:
+                    self._documents.pop(key, None)
+            if submitted:
+                self._schedule(key)
+
+    def _heartbeat(self, stopped: threading.Event):
+        """Renew the lease of this process's running jobs until shutdown"""
+        while not stopped.wait(JOB_HEARTBEAT_SECONDS):
+            with self._lock:
+                running = list(self._running)
+            if running:
+                try:
+                    self.db_manager.touch_ingestion_jobs(running)
+                except Exception as e:
+                    logger.error(f"Could not renew ingestion job leases: {str(e)}")
+
+    def find_duplicate(self, user_id: int, filename: str, source_hash: str) -> Optional[Dict]:
+        """Get the public state of a job that already ingests or ingested this exact file, if any"""
+        job = self.db_manager.find_ingestion_job_by_source(user_id, filename, source_hash)
+        if job:
+            job.pop("file_path", None)
+        return job
+
+    def get_job(self, job_id: str, user_id: Optional[int] = None) -> Optional[Dict]:
+        """Get a job's public state and progress"""
+        job = self.db_manager.get_ingestion_job(job_id, user_id)
+        if job:
+            job.pop("file_path", None)
+        return job
+
+    def _run(self, job_id: str):
+        """Extract, store and embed one uploaded document as a stream.
+
+        Pages (or paragraphs) are compressed and chunked as they are extracted,
+        and chunks are embedded a batch at a time, so memory use is bounded by
+        the batch size and the compressed text rather than the size of the
+        document.
+        """
+        job = self.db_manager.get_ingestion_job(job_id)
+        if not job:
+            return
+
+        document_id = None
+        try:
+            if job["document_id"]:
+                # Left over from an interrupted run
+                self.db_manager.delete_document(job["document_id"])
+
+            self.db_manager.update_ingestion_job(job_id, status=EXTRACTING, document_id=None)
+            document_id = self.db_manager.save_document(job["user_id"], job["filename"], "")
+            self.db_manager.update_ingestion_job(job_id, document_id=document_id)
+
+            text = BlobWriter()
+            pieces = self._write_text(text, self.document_processor.iter_text(job["file_path"], parallel=True))
+            chunks = iter(self.document_processor.iter_chunks(pieces))
+            # Fail before anything is stored, so an empty file can't touch an earlier upload with this name
+            first_chunk = next(chunks, None)
+            if first_chunk is None:
+                raise ValueError("Could not extract text from the document")
+            chunks = itertools.chain([first_chunk], chunks)
+
+            def on_progress(done: int, total: Optional[int]):
+                # Extraction keeps running while the first batches are embedded
+                self.db_manager.update_ingestion_job(job_id, status=EMBEDDING, chunks_done=done, chunks_total=total)
+
+            report = self.rag_engine.add_chunks(chunks, job["filename"], job["user_id"], progress_callback=on_progress)
+            self.db_manager.save_document_content(document_id, *text.finish())
+            # The chunks of an earlier upload with this name were just replaced, so its row goes too
+            self.db_manager.delete_replaced_documents(job["user_id"], job["filename"], document_id)
+
+            self.db_manager.update_ingestion_job(
+                job_id,
+                status=DONE,
+                chunks_total=report["chunks"],
+                chunks_done=report["chunks"],
+                reused_chunks=report["reused"]
+            )
+            logger.info(f"Ingested {job['filename']}: {report['chunks']} chunks, {report['reused']} reused")
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {str(e)}")
+            if document_id is not None:
+                self.db_manager.delete_document(document_id)
+            if isinstance(e, IngestAborted):
+                # The file's chunks were removed, so earlier rows with this name have nothing left to search
+                self.db_manager.delete_replaced_documents(job["user_id"], job["filename"], document_id)
+            error = str(e) if isinstance(e, ValueError) else "Document processing failed. Please try again."
+            self.db_manager.update_ingestion_job(job_id, status=FAILED, document_id=None, error=error)
+        finally:
+            try:
+                os.remove(job["file_path"])
+            except OSError:
+                pass
+
+    def _write_text(self, writer: BlobWriter, pieces: Iterable[str]) -> Iterator[str]:
+        """Pass extracted pieces through, compressing them into the document's text as they go"""
+        for piece in pieces:
+            writer.write(piece)
+            yield piece
@@ -1,27 +1,21 @@
 import os
 os.environ["CHROMA_TELEMETRY_ENABLED"] = "FALSE"
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import JSONResponse, StreamingResponse
-import uvicorn
-import os
+from fastapi.concurrency import run_in_threadpool
 import json
-from typing import List, Optional
-import requests
-import sqlite3
-from datetime import datetime, timedelta
+from typing import Optional
 from jose import jwt, JWTError
-from passlib.context import CryptContext
 import uuid
 import logging
 import traceback
 
-from auth import AuthHandler
-from document_processor import DocumentProcessor
-from rag_engine import RAGEngine
-from database import DatabaseManager
-from admin import AdminManager
+from auth import PasswordPoolBusy
+from database import encode_cursor
+from ingestion import UploadTooLarge, save_upload
+from services import services
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -38,32 +32,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize components
-auth_handler = AuthHandler()
-document_processor = DocumentProcessor()
-rag_engine = RAGEngine()
-db_manager = DatabaseManager()
-admin_manager = AdminManager()
+# Initialize components (one shared instance of each, see services.py)
+auth_handler = services.auth_handler
+document_processor = services.document_processor
+rag_engine = services.rag_engine
+db_manager = services.db_manager
+admin_manager = services.admin_manager
+ingestion_queue = services.ingestion_queue
+chat_contexts = services.chat_contexts
+auth_contexts = auth_handler.context_cache
 
 # Security
 security = HTTPBearer()
 
+# Largest accepted upload
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+def password_pool_busy() -> HTTPException:
+    """503 for when the password hashing pool is saturated"""
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, please try again in a moment",
+        headers={"Retry-After": "1"}
+    )
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and check Ollama connection"""
     try:
         db_manager.init_database()
+        ingestion_queue.start()
         # Check if Ollama is running
         try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=5)
+            response = await rag_engine.client.get(f"{rag_engine.ollama_url}/api/tags", timeout=5)
             if response.status_code != 200:
                 logger.warning("Ollama is not running. Please start Ollama first.")
-        except requests.exceptions.RequestException:
+        except Exception:
             logger.warning("Cannot connect to Ollama. Please ensure Ollama is running on localhost:11434")
     except Exception as e:
         logger.error(f"Startup error: {str(e)}")
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop ingestion workers and release pooled Ollama connections"""
+    ingestion_queue.shutdown()
+    auth_handler.shutdown()
+    document_processor.close()
+    await rag_engine.aclose()
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Global exception handler to prevent internal errors from being exposed"""
@@ -90,13 +107,15 @@ async def register(username: str = Form(...), password: str = Form(...)):
         if db_manager.user_exists(username):
             raise HTTPException(status_code=400, detail="Username already exists")
         
-        hashed_password = auth_handler.get_password_hash(password)
+        hashed_password = await auth_handler.ahash_password(password)
         user_id = db_manager.create_user(username, hashed_password)
         
         token = auth_handler.create_token(user_id, username)
         return {"token": token, "user_id": user_id, "username": username, "is_admin": False}
     except HTTPException:
         raise
+    except PasswordPoolBusy:
+        raise password_pool_busy()
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
@@ -110,13 +129,22 @@ async def login(username: str = Form(...), password: str = Form(...)):
             raise HTTPException(status_code=400, detail="Username and password are required")
         
         user = db_manager.get_user_by_username(username)
-        if not user or not auth_handler.verify_password(password, user['password']):
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        
+        valid, new_hash = await auth_handler.averify_password(password, user['password'])
+        if not valid:
             raise HTTPException(status_code=401, detail="Invalid credentials")
+        if new_hash:
+            # Stored with a different BCRYPT_ROUNDS cost
+            db_manager.update_user_password(user['id'], new_hash)
         
         token = auth_handler.create_token(user['id'], username)
         return {"token": token, "user_id": user['id'], "username": username, "is_admin": user.get('is_admin', False)}
     except HTTPException:
         raise
+    except PasswordPoolBusy:
+        raise password_pool_busy()
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
@@ -124,13 +152,29 @@ async def login(username: str = Form(...), password: str = Form(...)):
 
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current authenticated user"""
+    token = credentials.credentials
+    cached = auth_contexts.get(token)
+    if cached is not None:
+        return dict(cached)
+    
     try:
-        payload = auth_handler.decode_token(credentials.credentials)
+        payload = auth_handler.decode_token(token)
         user_id = payload.get("user_id")
         username = payload.get("username")
         if user_id is None or username is None:
             raise HTTPException(status_code=401, detail="Invalid token")
-        return {"user_id": user_id, "username": username}
+        
+        generation = auth_contexts.generation(user_id)
+        # The role comes from the database, not the token: another worker may have changed it since login
+        user = db_manager.get_user_by_id(user_id)
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        context = {"user_id": user_id, "username": user["username"], "is_admin": user["is_admin"]}
+        
+        auth_contexts.put(token, context, payload["exp"], generation)
+        return dict(context)
+    except HTTPException:
+        raise
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
     except JWTError:
@@ -141,7 +185,7 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
 
 def get_current_admin(current_user: dict = Depends(get_current_user)):
     """Get current authenticated admin user"""
-    if not admin_manager.is_admin(current_user["user_id"]):
+    if not current_user.get("is_admin"):
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
@@ -150,40 +194,36 @@ async def upload_document(
     file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user)
 ):
-    """Upload and process a document"""
+    """Upload a document and queue it for background ingestion"""
     try:
         # Validate file type
         if not file.filename.lower().endswith(('.pdf', '.docx')):
             raise HTTPException(status_code=400, detail="Only PDF and DOCX files are allowed")
         
-        # Validate file size (10MB limit)
-        if file.size and file.size > 10 * 1024 * 1024:
+        # Validate file size (10MB limit); the size isn't always known up front, so it's checked again while copying
+        if file.size and file.size > MAX_UPLOAD_BYTES:
             raise HTTPException(status_code=400, detail="File size must be less than 10MB")
         
-        # Save file temporarily
-        file_path = f"temp/{file.filename}"
+        # Save file temporarily under a unique name; the ingestion worker removes it
+        file_path = os.path.join("temp", f"{uuid.uuid4().hex}_{os.path.basename(file.filename)}")
         os.makedirs("temp", exist_ok=True)
         
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        # Extract text
-        text = document_processor.extract_text(file_path)
-        
-        if not text.strip():
-            raise HTTPException(status_code=400, detail="Could not extract text from the document")
-        
-        # Save document to database
-        document_id = db_manager.save_document(current_user["user_id"], file.filename, text)
+        # Copied in fixed-size chunks off the event loop, hashing as it goes
+        try:
+            source_hash = await run_in_threadpool(save_upload, file.file, file_path, MAX_UPLOAD_BYTES)
+        except UploadTooLarge:
+            raise HTTPException(status_code=400, detail="File size must be less than 10MB")
         
-        # Generate embeddings and store in RAG engine
-        rag_engine.add_document(text, file.filename, current_user["user_id"])
+        # The same file uploaded again reuses the job that ingested it
+        duplicate = ingestion_queue.find_duplicate(current_user["user_id"], file.filename, source_hash)
+        if duplicate:
+            os.remove(file_path)
+            return {"message": "Document already uploaded", "job_id": duplicate["id"], "status": duplicate["status"]}
         
-        # Clean up temp file
-        os.remove(file_path)
+        # Extraction and embedding run in the background
+        job_id = ingestion_queue.submit(current_user["user_id"], file.filename, file_path, source_hash)
         
-        return {"message": "Document uploaded successfully", "document_id": document_id}
+        return {"message": "Document queued for processing", "job_id": job_id, "status": "queued"}
     except HTTPException:
         raise
     except Exception as e:
@@ -197,6 +237,21 @@ async def upload_document(
             pass
         raise HTTPException(status_code=500, detail="Document upload failed. Please try again.")
 
+@app.get("/api/documents/jobs/{job_id}")
+async def get_ingestion_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Get the state and progress of a document ingestion job"""
+    try:
+        job = ingestion_queue.get_job(job_id, current_user["user_id"])
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ingestion job status error: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail="Failed to get job status")
+
 @app.post("/api/chat/query")
 async def query_chat(
     message: str = Form(...),
@@ -212,11 +267,20 @@ async def query_chat(
         if is_new_chat:
             chat_id = str(uuid.uuid4())
             db_manager.create_chat(chat_id, current_user["user_id"], message[:50])
+        elif not db_manager.user_owns_chat(chat_id, current_user["user_id"]):
+            # "New Chat" picks its id in the browser, so the first message creates the chat
+            if not db_manager.create_chat_if_new(chat_id, current_user["user_id"], message[:50]):
+                raise HTTPException(status_code=404, detail="Chat not found")
+            is_new_chat = True
 
         db_manager.save_message(chat_id, "user", message)
 
-        relevant_docs = rag_engine.search_documents(message, current_user["user_id"])
-        response_stream = rag_engine.generate_response(message, relevant_docs)
+        relevant_docs = await rag_engine.asearch_documents(message, current_user["user_id"])
+        # Follow-up turns continue from the conversation Ollama returned last time
+        conversation = None if is_new_chat else chat_contexts.get(chat_id, current_user["user_id"], rag_engine.llm_model)
+
+        def save_conversation(context):
+            chat_contexts.put(chat_id, current_user["user_id"], rag_engine.llm_model, context)
 
         async def stream_and_save():
             # First, yield metadata
@@ -224,21 +288,16 @@ async def query_chat(
             yield json.dumps(metadata) + "\n"
 
             # Then, stream the response while saving it
-            full_response = ""
-            for line in response_stream:
-                if line.strip():
-                    try:
-                        data = json.loads(line.decode('utf-8'))
-                        if 'response' in data:
-                            response_text = data['response']
-                            full_response += response_text
-                            # Yield the response chunk as JSON
-                            yield json.dumps({"response": response_text}) + "\n"
-                    except json.JSONDecodeError:
-                        # Skip non-JSON lines
-                        continue
+            response_parts = []
+            async for response_text in rag_engine.agenerate_response(
+                message, relevant_docs, current_user["user_id"], conversation, save_conversation
+            ):
+                response_parts.append(response_text)
+                # Yield the response chunk as JSON
+                yield json.dumps({"response": response_text}) + "\n"
 
             # Save the complete response
+            full_response = "".join(response_parts)
             if full_response:
                 db_manager.save_message(chat_id, "assistant", full_response)
 
@@ -252,11 +311,22 @@ async def query_chat(
         raise HTTPException(status_code=500, detail="Failed to process your message. Please try again.")
 
 @app.get("/api/chat/history")
-async def get_chat_history(current_user: dict = Depends(get_current_user)):
-    """Get user's chat history"""
+async def get_chat_history(
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get one page of the user's chat history, newest first"""
     try:
-        chats = db_manager.get_user_chats(current_user["user_id"])
-        return {"chats": chats}
+        # Fetch one extra row to learn whether another page exists
+        chats = db_manager.get_user_chats(current_user["user_id"], limit=limit + 1, before=before)
+        next_cursor = None
+        if len(chats) > limit:
+            chats = chats[:limit]
+            next_cursor = encode_cursor(chats[-1]["created_at"], chats[-1]["id"])
+        return {"chats": chats, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Chat history error: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
@@ -265,12 +335,21 @@ async def get_chat_history(current_user: dict = Depends(get_current_user)):
 @app.get("/api/chat/{chat_id}/messages")
 async def get_chat_messages(
     chat_id: str,
+    limit: int = Query(100, ge=1, le=500),
+    before: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get messages for a specific chat"""
+    """Get the most recent page of messages for a specific chat, oldest first"""
     try:
-        messages = db_manager.get_chat_messages(chat_id, current_user["user_id"])
-        return {"messages": messages}
+        messages = db_manager.get_chat_messages(chat_id, current_user["user_id"], limit=limit + 1, before=before)
+        next_cursor = None
+        if len(messages) > limit:
+            # The extra row is the oldest one; the cursor points at the oldest message returned
+            messages = messages[1:]
+            next_cursor = encode_cursor(messages[0]["timestamp"], messages[0]["id"])
+        return {"messages": messages, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Chat messages error: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
@@ -283,6 +362,7 @@ async def delete_chat(
 ):
     """Delete a chat"""
     try:
+        chat_contexts.discard(chat_id, current_user["user_id"])
         db_manager.delete_chat(chat_id, current_user["user_id"])
         return {"message": "Chat deleted successfully"}
     except Exception as e:
@@ -296,8 +376,13 @@ async def get_admin_stats(current_admin: dict = Depends(get_current_admin)):
     """Get system statistics (admin only)"""
     try:
         stats = admin_manager.get_system_stats()
-        # Add recent activity (placeholder for now)
-        stats["recentActivity"] = []
+        stats["queryEmbeddingCache"] = rag_engine.query_cache.stats()
+        stats["answerCache"] = rag_engine.answer_cache.stats()
+        stats["generation"] = rag_engine.generation_stats.stats()
+        stats["chatContextCache"] = chat_contexts.stats()
+        stats["rerank"] = rag_engine.reranker.stats()
+        stats["passwordHashing"] = auth_handler.hashing_stats()
+        stats["authContextCache"] = auth_contexts.stats()
         return stats
     except Exception as e:
         logger.error(f"Admin stats error: {str(e)}")
@@ -365,13 +450,15 @@ async def reset_user_password(
         if len(new_password) < 6:
             raise HTTPException(status_code=400, detail="Password must be at least 6 characters long")
         
-        success = admin_manager.reset_user_password(user_id, new_password)
+        success = await auth_handler.run_password_task(admin_manager.reset_user_password, user_id, new_password)
         if not success:
             raise HTTPException(status_code=400, detail="Failed to reset password")
         
         return {"message": "Password reset successfully"}
     except HTTPException:
         raise
+    except PasswordPoolBusy:
+        raise password_pool_busy()
     except Exception as e:
         logger.error(f"Reset password error: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
@@ -395,13 +482,15 @@ async def create_user(
         if len(password) < 6:
             raise HTTPException(status_code=400, detail="Password must be at least 6 characters long")
         
-        user_id = admin_manager.create_user(username.strip(), password, is_admin)
+        user_id = await auth_handler.run_password_task(admin_manager.create_user, username.strip(), password, is_admin)
         if not user_id:
             raise HTTPException(status_code=400, detail="Username already exists")
         
         return {"message": "User created successfully", "user_id": user_id}
     except HTTPException:
         raise
+    except PasswordPoolBusy:
+        raise password_pool_busy()
     except Exception as e:
         logger.error(f"Create user error: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
@@ -451,4 +540,5 @@ async def delete_document(document_id: int, current_admin: dict = Depends(get_cu
         raise HTTPException(status_code=500, detail="Failed to delete document")
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
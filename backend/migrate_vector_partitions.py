@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Move chunk embeddings between ChromaDB partition modes.
+
+Copies every chunk from the collections of one VECTOR_PARTITION mode into
+the collections of another, e.g. from the shared "documents" collection
+into one collection per user:
+
+    python migrate_vector_partitions.py --to user
+
+Stop the backend first. The copy is an idempotent upsert, so an
+interrupted run can simply be repeated; the source collections are only
+removed with --drop-source, after the copied chunk count has been checked.
+Then start the backend with the new VECTOR_PARTITION setting.
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rag_engine import ChromaVectorStore, PARTITION_MODES
+
+def migrate_partitions(source_mode: str, target_mode: str, path: str = "./chroma_db", groups: int = 64,
+                       batch_size: int = 1000, drop_source: bool = False) -> int:
+    """Copy all chunks from source_mode's collections to target_mode's; returns the number copied"""
+    if source_mode == target_mode:
+        raise ValueError("Source and target partition modes must differ")
+
+    source = ChromaVectorStore(path, partition=source_mode, groups=groups)
+    target = ChromaVectorStore(path, partition=target_mode, groups=groups)
+    names = source.partition_names()
+
+    copied = 0
+    for name in names:
+        collection = source.client.get_collection(name)
+        count = collection.count()
+        # The source isn't written to during the copy, so offsets are stable
+        for offset in range(0, count, batch_size):
+            batch = collection.get(
+                limit=batch_size,
+                offset=offset,
+                include=["embeddings", "documents", "metadatas"]
+            )
+            if not batch["ids"]:
+                break
+            target.upsert(batch["ids"], list(batch["embeddings"]), batch["documents"], batch["metadatas"])
+            copied += len(batch["ids"])
+        print(f"{name}: {count} chunks copied")
+
+    total = sum(target.client.get_collection(name).count() for name in target.partition_names())
+    if total < copied:
+        raise RuntimeError(f"Only {total} of {copied} chunks are in the '{target_mode}' collections")
+
+    if drop_source:
+        for name in names:
+            source.client.delete_collection(name)
+        print(f"Dropped {len(names)} source collections")
+
+    return copied
+
+def main():
+    parser = argparse.ArgumentParser(description="Move chunk embeddings between ChromaDB partition modes")
+    parser.add_argument("--from", dest="source", choices=PARTITION_MODES, default="none",
+                        help="partition mode the chunks are in now (default: none)")
+    parser.add_argument("--to", dest="target", choices=PARTITION_MODES, required=True,
+                        help="partition mode to move them to")
+    parser.add_argument("--path", default="./chroma_db", help="ChromaDB directory (default: ./chroma_db)")
+    parser.add_argument("--groups", type=int, default=int(os.getenv("VECTOR_PARTITION_GROUPS", "64")),
+                        help="shard count for the group mode (default: VECTOR_PARTITION_GROUPS or 64)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="chunks copied per step")
+    parser.add_argument("--drop-source", action="store_true", help="delete the source collections afterwards")
+    args = parser.parse_args()
+
+    try:
+        copied = migrate_partitions(
+            args.source, args.target, args.path, args.groups, args.batch_size, args.drop_source
+        )
+    except Exception as e:
+        print(f"❌ Migration failed: {str(e)}")
+        sys.exit(1)
+
+    print(f"\n✅ Copied {copied} chunks from '{args.source}' to '{args.target}' partitions")
+    print(f"Set VECTOR_PARTITION={args.target} and restart the backend.")
+
+if __name__ == "__main__":
+    main()
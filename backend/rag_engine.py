@@ -1,42 +1,618 @@
-import requests
+import asyncio
+import functools
+import itertools
 import json
-import numpy as np
-from typing import List, Dict
-import chromadb
-from chromadb.config import Settings
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 import os
+from embedding_cache import EmbeddingCache, ChunkEmbeddingStore
+from answer_cache import AnswerCache
+
+# chromadb, requests, httpx, the chunker (numpy) and the keyword index are
+# imported on first use, keeping them out of the API's cold start
+if TYPE_CHECKING:
+    import httpx
+    import numpy as np
+    import requests
+    from bm25_index import BM25Index
+
+# Prompt tokens besides the context passages: the instructions, the template and the question
+PROMPT_OVERHEAD_TOKENS = 256
+
+class IngestAborted(Exception):
+    """add_chunks failed after storing some chunks; every chunk of the file was removed"""
+
+class VectorStore:
+    """Storage and nearest-neighbour search for chunk embeddings.
+
+    Every chunk's metadata carries its filename, user_id and chunk_index;
+    searches are always scoped to one user. Results are dicts with the
+    chunk's id, content, metadata and cosine distance, closest first.
+    """
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        """Add chunks, replacing any with the same ids"""
+        raise NotImplementedError
+
+    def query(self, embedding: List[float], user_id: int, top_k: int) -> List[Dict]:
+        """Return the user's top_k chunks closest to embedding"""
+        raise NotImplementedError
+
+    def delete_file_chunks(self, filename: str, user_id: int, from_index: int = 0):
+        """Delete a user's chunks of filename whose chunk_index is at least from_index"""
+        raise NotImplementedError
+
+    def delete_user(self, user_id: int):
+        """Delete all of a user's chunks"""
+        raise NotImplementedError
+
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[Tuple[List[str], List[str], List[Dict]]]:
+        """Yield every stored chunk as (ids, documents, metadatas) batches"""
+        raise NotImplementedError
+
+    def flush(self):
+        """Persist upserts a store buffers in memory; stores that write through need not override this"""
+
+
+# How ChromaVectorStore spreads chunks over collections, see its docstring
+PARTITION_MODES = ("none", "user", "group")
+
+class ChromaVectorStore(VectorStore):
+    """Chunks in persistent ChromaDB collections.
+
+    With partition="none" all users share one collection and queries filter
+    it by user_id metadata, so every search walks the global HNSW graph.
+    "user" gives each user their own collection, making query cost depend
+    only on that user's corpus; "group" hashes users into a fixed number of
+    shard collections, for deployments with very many small users.
+    Partition collections are created on a user's first upload. Switching
+    modes needs migrate_vector_partitions.py to move existing chunks.
+    """
+
+    def __init__(self, path: str = "./chroma_db", collection_name: str = "documents",
+                 partition: str = "none", groups: int = 64):
+        import chromadb
+        from chromadb.config import Settings
+        if partition not in PARTITION_MODES:
+            raise ValueError(f"Unknown vector partition mode: {partition} (available: {', '.join(PARTITION_MODES)})")
+        self.client = chromadb.PersistentClient(
+            # Clients are shared per path string, so relative paths must not alias
+            path=os.path.abspath(path),
+            settings=Settings(anonymized_telemetry=False)
+        )
+        self.collection_name = collection_name
+        self.partition = partition
+        self.groups = max(1, groups)
+        self._collections = {}
+        self._lock = threading.Lock()
+        
+        if partition == "none":
+            # Create or get collection
+            self.collection = self._collection(collection_name, create=True)
+
+    def partition_name(self, user_id: int) -> str:
+        """Name of the collection holding a user's chunks"""
+        if self.partition == "user":
+            return f"{self.collection_name}_user_{user_id}"
+        if self.partition == "group":
+            return f"{self.collection_name}_group_{int(user_id) % self.groups}"
+        return self.collection_name
+
+    def partition_names(self) -> List[str]:
+        """Names of the existing collections that belong to this store's mode"""
+        names = [getattr(c, "name", c) for c in self.client.list_collections()]
+        if self.partition == "none":
+            return [name for name in names if name == self.collection_name]
+        prefix = f"{self.collection_name}_{self.partition}_"
+        return sorted(name for name in names if name.startswith(prefix))
+
+    def unpartitioned_count(self) -> int:
+        """Chunks left in the shared collection while a partition mode is in use"""
+        if self.partition == "none":
+            return 0
+        shared = self._collection(self.collection_name)
+        return shared.count() if shared is not None else 0
+
+    def _collection(self, name: str, create: bool = False):
+        """Cached collection handle; None if it doesn't exist and create is False"""
+        collection = self._collections.get(name)
+        if collection is None:
+            with self._lock:
+                collection = self._collections.get(name)
+                if collection is None:
+                    if create:
+                        collection = self.client.get_or_create_collection(
+                            name=name,
+                            metadata={"hnsw:space": "cosine"}
+                        )
+                    else:
+                        try:
+                            collection = self.client.get_collection(name)
+                        except Exception:
+                            # Not created yet: the user has no chunks
+                            return None
+                    self._collections[name] = collection
+        return collection
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        by_partition = {}
+        for position, metadata in enumerate(metadatas):
+            by_partition.setdefault(self.partition_name(metadata["user_id"]), []).append(position)
+        
+        for name, positions in by_partition.items():
+            self._collection(name, create=True).upsert(
+                embeddings=[embeddings[i] for i in positions],
+                documents=[documents[i] for i in positions],
+                metadatas=[metadatas[i] for i in positions],
+                ids=[ids[i] for i in positions]
+            )
+
+    def query(self, embedding: List[float], user_id: int, top_k: int) -> List[Dict]:
+        collection = self._collection(self.partition_name(user_id))
+        if collection is None:
+            return []
+        
+        results = collection.query(
+            query_embeddings=[embedding],
+            n_results=top_k,
+            # A per-user collection holds nothing else to filter out
+            where=None if self.partition == "user" else {"user_id": user_id}
+        )
+        
+        documents = []
+        if results['documents'] and results['documents'][0]:
+            for i, doc in enumerate(results['documents'][0]):
+                documents.append({
+                    "id": results['ids'][0][i],
+                    "content": doc,
+                    "metadata": results['metadatas'][0][i],
+                    "distance": results['distances'][0][i] if results['distances'] else 0
+                })
+        
+        return documents
+
+    def delete_file_chunks(self, filename: str, user_id: int, from_index: int = 0):
+        collection = self._collection(self.partition_name(user_id))
+        if collection is None:
+            return
+        collection.delete(where={
+            "$and": [
+                {"filename": filename},
+                {"user_id": user_id},
+                {"chunk_index": {"$gte": from_index}}
+            ]
+        })
+
+    def delete_user(self, user_id: int):
+        name = self.partition_name(user_id)
+        if self.partition == "user":
+            with self._lock:
+                self._collections.pop(name, None)
+                try:
+                    self.client.delete_collection(name)
+                except Exception:
+                    pass
+            return
+        
+        collection = self._collection(name)
+        if collection is None:
+            return
+        # Get all documents for the user
+        results = collection.get(
+            where={"user_id": user_id}
+        )
+        
+        if results['ids']:
+            collection.delete(ids=results['ids'])
+
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[Tuple[List[str], List[str], List[Dict]]]:
+        for name in self.partition_names():
+            collection = self._collection(name)
+            for offset in range(0, collection.count(), batch_size):
+                batch = collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+                if not batch["ids"]:
+                    break
+                yield batch["ids"], batch["documents"], batch["metadatas"]
+
+
+class NumpyVectorStore(VectorStore):
+    """Exact in-process search over one float32 matrix per user.
+
+    Each user's vectors are normalized and kept as a contiguous matrix, so a
+    query is a single matrix-vector product plus argpartition for the top k.
+    Matrices are persisted as .npy files and memory-mapped when loaded; chunk
+    ids, text and metadata sit beside them in a JSON file. Upserts go into an
+    in-memory buffer with room to append and are written out by flush(), so
+    ingesting a document batch by batch rewrites the files once rather than
+    per batch. Suited to corpora of up to a few tens of thousands of chunks
+    per user.
+    """
+
+    def __init__(self, path: str = "./vector_store"):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._indexes = {}
+        # Users whose index has upserts not yet written by flush()
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def _records_path(self, user_id: int) -> str:
+        return os.path.join(self.path, f"user_{user_id}.json")
+
+    def _matrix_path(self, user_id: int, generation: int) -> str:
+        # A new file per write: a memory-mapped matrix is never overwritten in place
+        return os.path.join(self.path, f"user_{user_id}.{generation}.npy")
+
+    def _load(self, user_id: int) -> Dict:
+        """Return the user's index (matrix, records, rows by id, generation); call with the lock held"""
+        index = self._indexes.get(user_id)
+        if index is not None:
+            return index
+        
+        import numpy as np
+        records, generation, matrix = [], 0, None
+        if os.path.exists(self._records_path(user_id)):
+            with open(self._records_path(user_id), encoding="utf-8") as f:
+                stored = json.load(f)
+            records, generation = stored["records"], stored["generation"]
+            if records:
+                matrix = np.load(self._matrix_path(user_id, generation), mmap_mode="r")
+        
+        index = {
+            "matrix": matrix,
+            "records": records,
+            "rows": {record["id"]: row for row, record in enumerate(records)},
+            "generation": generation
+        }
+        self._indexes[user_id] = index
+        return index
+
+    def _save(self, user_id: int, matrix, records: List[Dict]):
+        """Persist and install a new index for the user; call with the lock held"""
+        import numpy as np
+        previous = self._load(user_id)["generation"]
+        generation = previous + 1
+        
+        if records:
+            np.save(self._matrix_path(user_id, generation), matrix)
+        temp_path = self._records_path(user_id) + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"generation": generation, "records": records}, f)
+        os.replace(temp_path, self._records_path(user_id))
+        
+        try:
+            os.remove(self._matrix_path(user_id, previous))
+        except OSError:
+            pass
+        
+        self._dirty.discard(user_id)
+        self._indexes[user_id] = {
+            "matrix": np.load(self._matrix_path(user_id, generation), mmap_mode="r") if records else None,
+            "records": records,
+            "rows": {record["id"]: row for row, record in enumerate(records)},
+            "generation": generation
+        }
+
+    @staticmethod
+    def _normalize(vectors):
+        import numpy as np
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        # Zero vectors (failed embeddings) stay zero and never rank above real matches
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _writable(self, index: Dict, dimensions: int) -> Dict:
+        """Move the index into an in-memory buffer that rows can be appended to; call with the lock held"""
+        if index.get("buffer") is None:
+            import numpy as np
+            count = len(index["records"])
+            buffer = np.zeros((max(2 * count, 256), dimensions), dtype=np.float32)
+            if count:
+                buffer[:count] = index["matrix"]
+            # Copies, so a query already holding the old ones isn't affected
+            index["records"] = list(index["records"])
+            index["rows"] = dict(index["rows"])
+            index["buffer"] = buffer
+        return index
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        import numpy as np
+        vectors = self._normalize(embeddings)
+        
+        by_user = {}
+        for position, metadata in enumerate(metadatas):
+            by_user.setdefault(metadata["user_id"], []).append(position)
+        
+        with self._lock:
+            for user_id, positions in by_user.items():
+                index = self._writable(self._load(user_id), vectors.shape[1])
+                records, rows = index["records"], index["rows"]
+                
+                for position in positions:
+                    record = {"id": ids[position], "content": documents[position], "metadata": metadatas[position]}
+                    row = rows.get(ids[position])
+                    if row is None:
+                        row = rows[ids[position]] = len(records)
+                        records.append(record)
+                    else:
+                        records[row] = record
+                    
+                    buffer = index["buffer"]
+                    if row >= len(buffer):
+                        # Doubling keeps appends amortized constant time
+                        grown = np.zeros((2 * len(buffer), buffer.shape[1]), dtype=np.float32)
+                        grown[:len(buffer)] = buffer
+                        index["buffer"] = buffer = grown
+                    buffer[row] = vectors[position]
+                
+                index["matrix"] = index["buffer"][:len(records)]
+                self._dirty.add(user_id)
+
+    def flush(self):
+        import numpy as np
+        with self._lock:
+            for user_id in list(self._dirty):
+                index = self._indexes[user_id]
+                self._save(user_id, np.ascontiguousarray(index["matrix"]), index["records"])
+
+    def _snapshot(self, user_id: int) -> Tuple[Optional["np.ndarray"], List[Dict]]:
+        """Return the user's (matrix, records) as they are now, safe to read without the lock"""
+        with self._lock:
+            index = self._load(user_id)
+            matrix, records = index["matrix"], index["records"]
+            if index.get("buffer") is not None:
+                # Unflushed upserts append to and overwrite these in place
+                matrix, records = matrix.copy(), list(records)
+        return matrix, records
+
+    def query(self, embedding: List[float], user_id: int, top_k: int) -> List[Dict]:
+        import numpy as np
+        matrix, records = self._snapshot(user_id)
+        if matrix is None or not records or top_k <= 0:
+            return []
+        
+        scores = matrix @ self._normalize(embedding)
+        k = min(top_k, len(records))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        
+        return [
+            {
+                "id": records[row]["id"],
+                "content": records[row]["content"],
+                "metadata": records[row]["metadata"],
+                "distance": float(1.0 - scores[row])
+            }
+            for row in top
+        ]
+
+    def _delete_where(self, user_id: int, predicate: Callable[[Dict], bool]):
+        import numpy as np
+        with self._lock:
+            index = self._load(user_id)
+            keep = [row for row, record in enumerate(index["records"]) if not predicate(record["metadata"])]
+            if len(keep) == len(index["records"]):
+                return
+            matrix = np.ascontiguousarray(index["matrix"][keep]) if keep else None
+            self._save(user_id, matrix, [index["records"][row] for row in keep])
+
+    def delete_file_chunks(self, filename: str, user_id: int, from_index: int = 0):
+        self._delete_where(
+            user_id,
+            lambda metadata: metadata["filename"] == filename and metadata["chunk_index"] >= from_index
+        )
+
+    def delete_user(self, user_id: int):
+        self._delete_where(user_id, lambda metadata: True)
+
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[Tuple[List[str], List[str], List[Dict]]]:
+        with self._lock:
+            # Users whose first upserts aren't flushed yet have no file
+            user_ids = sorted(set(
+                int(name[len("user_"):-len(".json")]) for name in os.listdir(self.path)
+                if name.startswith("user_") and name.endswith(".json")
+            ) | self._dirty)
+        for user_id in user_ids:
+            _, records = self._snapshot(user_id)
+            for first in range(0, len(records), batch_size):
+                batch = records[first:first + batch_size]
+                yield [r["id"] for r in batch], [r["content"] for r in batch], [r["metadata"] for r in batch]
+
+
+class GenerationStats:
+    """Prompt size and time to first token of recent generations"""
+
+    def __init__(self, window: int = 1000):
+        self.requests = 0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, prompt_tokens: int, context_tokens: int, ttft_ms: float):
+        with self._lock:
+            self.requests += 1
+            self._recent.append((prompt_tokens, context_tokens, ttft_ms))
+
+    def stats(self) -> Dict:
+        """Averages and TTFT percentiles over the recent window"""
+        with self._lock:
+            recent = list(self._recent)
+        if not recent:
+            return {"requests": self.requests}
+        ttft = sorted(sample[2] for sample in recent)
+        return {
+            "requests": self.requests,
+            "avg_prompt_tokens": sum(sample[0] for sample in recent) / len(recent),
+            "avg_context_tokens": sum(sample[1] for sample in recent) / len(recent),
+            "ttft_p50_ms": ttft[len(ttft) // 2],
+            "ttft_p95_ms": ttft[min(len(ttft) - 1, int(len(ttft) * 0.95))]
+        }
+
 
 class RAGEngine:
     def __init__(self):
         self.ollama_url = "http://localhost:11434"
         self.embedding_model = "nomic-embed-text"
         self.llm_model = "llama3"
-        self.chroma_client = None
-        self.collection = None
-        self._init_chroma()
+        # How long Ollama keeps the model (and its KV cache) loaded after a request
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        # Context window Ollama allocates for generation, and the longest answer it may produce
+        self.num_ctx = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+        self.answer_tokens = 1000
+        self.embed_batch_size = max(1, int(os.getenv("EMBED_BATCH_SIZE", "32")))
+        self.embed_concurrency = max(1, int(os.getenv("EMBED_CONCURRENCY", "4")))
+        # Ingestion jobs embedding at once (see IngestionQueue), each with embed_concurrency requests in flight
+        self.ingest_workers = max(1, int(os.getenv("INGEST_WORKERS", "2")))
+        # Chunks embedded and written per step when ingesting a chunk stream
+        self.ingest_batch_size = max(1, int(os.getenv("INGEST_BATCH_SIZE", "256")))
+        # None until the first batch call tells us whether /api/embed exists
+        self._batch_embed_supported = None
+        self._init_lock = threading.Lock()
+        self._chunker = None
+        self._context_assembler = None
+        self.generation_stats = GenerationStats()
+        self._session = None
+        self.query_cache = EmbeddingCache(
+            max_entries=int(os.getenv("QUERY_EMBED_CACHE_SIZE", "1024")),
+            path=os.getenv("QUERY_EMBED_CACHE_PATH", "./embedding_cache.db") or None
+        )
+        self.chunk_store = ChunkEmbeddingStore(os.getenv("CHUNK_EMBED_STORE_PATH", "./embedding_cache.db"))
+        self.answer_cache = AnswerCache(
+            max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+            ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+            similarity_threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+        )
+        # "chroma" (default) or "numpy", see VectorStore
+        self.vector_store_backend = os.getenv("VECTOR_STORE", "chroma")
+        self._vector_store = None
+        self._vector_store_initialized = False
+        # "hybrid" (default) fuses BM25 keyword matches with vector results; "vector" is dense only
+        self.search_mode = os.getenv("SEARCH_MODE", "hybrid")
+        # Candidates each retriever contributes to the fusion
+        self.hybrid_candidates = max(1, int(os.getenv("HYBRID_CANDIDATES", "20")))
+        self.rrf_k = 60
+        # Keyword hits scoring below this fraction of the best one are left out of the fusion
+        self.keyword_min_score = 0.5
+        self._keyword_index = None
+        self._keyword_index_initialized = False
+        # Candidates re-scored by the Reranker before top_k are kept; 0 turns reranking off
+        self.rerank_candidates = max(0, int(os.getenv("RERANK_CANDIDATES", "20")))
+        self._reranker = None
+    
+    @property
+    def vector_store(self) -> Optional[VectorStore]:
+        """Chunk vector store, opened on first use (None if it could not be opened)"""
+        if not self._vector_store_initialized:
+            with self._init_lock:
+                if not self._vector_store_initialized:
+                    self._vector_store = self._init_vector_store()
+                    self._vector_store_initialized = True
+        return self._vector_store
+    
+    @property
+    def keyword_index(self) -> Optional["BM25Index"]:
+        """BM25 index over chunk text, opened on first use (None in vector-only mode or if it could not be opened)"""
+        if not self._keyword_index_initialized:
+            # Filling a new index reads the vector store, which takes the init lock itself
+            store = self.vector_store
+            with self._init_lock:
+                if not self._keyword_index_initialized:
+                    self._keyword_index = self._init_keyword_index(store)
+                    self._keyword_index_initialized = True
+        return self._keyword_index
     
-    def _init_chroma(self):
-        """Initialize ChromaDB client and collection"""
+    @property
+    def session(self) -> "requests.Session":
+        """Pooled HTTP session for synchronous Ollama calls"""
+        if self._session is None:
+            with self._init_lock:
+                if self._session is None:
+                    import requests
+                    session = requests.Session()
+                    # One kept-alive connection per embedding thread across all ingestion workers
+                    adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.ingest_workers * self.embed_concurrency)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+    
+    @property
+    def chunker(self):
+        """Chunker for the configured CHUNK_STRATEGY"""
+        if self._chunker is None:
+            from chunking import get_chunker
+            self._chunker = get_chunker()
+        return self._chunker
+    
+    @property
+    def context_assembler(self):
+        """Packs retrieved chunks into the prompt within CONTEXT_TOKENS"""
+        if self._context_assembler is None:
+            from context_assembler import ContextAssembler
+            self._context_assembler = ContextAssembler()
+        return self._context_assembler
+    
+    @property
+    def conversation_token_limit(self) -> int:
+        """Longest chat context worth sending back: num_ctx minus room for the next prompt and answer.
+
+        Past this Ollama would truncate the context itself, dropping the
+        instructions at its start that follow-up prompts leave out.
+        """
+        prompt_tokens = self.context_assembler.max_tokens + PROMPT_OVERHEAD_TOKENS
+        return max(0, self.num_ctx - prompt_tokens - self.answer_tokens)
+    
+    @property
+    def reranker(self):
+        """Re-scores search candidates and drops weak ones"""
+        if self._reranker is None:
+            from reranker import Reranker
+            self._reranker = Reranker()
+        return self._reranker
+    
+    def _init_vector_store(self) -> Optional[VectorStore]:
+        """Open the configured vector store backend"""
         try:
-            self.chroma_client = chromadb.PersistentClient(
-                path="./chroma_db",
-                settings=Settings(anonymized_telemetry=False)
-            )
-            
-            # Create or get collection
-            self.collection = self.chroma_client.get_or_create_collection(
-                name="documents",
-                metadata={"hnsw:space": "cosine"}
+            if self.vector_store_backend == "numpy":
+                return NumpyVectorStore(os.getenv("VECTOR_STORE_PATH", "./vector_store"))
+            if self.vector_store_backend != "chroma":
+                raise ValueError(f"Unknown vector store backend: {self.vector_store_backend}")
+            store = ChromaVectorStore(
+                partition=os.getenv("VECTOR_PARTITION", "none"),
+                groups=int(os.getenv("VECTOR_PARTITION_GROUPS", "64"))
             )
+            unpartitioned = store.unpartitioned_count()
+            if unpartitioned:
+                print(f"Warning: {unpartitioned} chunks are still in the shared '{store.collection_name}' collection "
+                      f"and won't be searched; run migrate_vector_partitions.py to move them")
+            return store
         except Exception as e:
-            print(f"Warning: Could not initialize ChromaDB: {e}")
-            self.chroma_client = None
-            self.collection = None
+            print(f"Warning: Could not initialize vector store: {e}")
+            return None
+    
+    def _init_keyword_index(self, store: Optional[VectorStore]) -> Optional["BM25Index"]:
+        """Open the keyword index, indexing the vector store's chunks the first time"""
+        path = os.getenv("KEYWORD_INDEX_PATH", "./keyword_index.db")
+        if self.search_mode != "hybrid" or not path:
+            return None
+        try:
+            from bm25_index import BM25Index
+            index = BM25Index(path)
+            if not index.is_built() and store is not None:
+                # Chunks stored before hybrid search was enabled
+                for ids, documents, metadatas in store.iter_chunks():
+                    index.upsert(ids, documents, metadatas)
+                index.mark_built()
+            return index
+        except Exception as e:
+            print(f"Warning: Could not initialize keyword index: {e}")
+            return None
     
     def _get_embedding(self, text: str) -> List[float]:
         """Get embedding for text using nomic-embed-text via Ollama"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.ollama_url}/api/embeddings",
                 json={
                     "model": self.embedding_model,
@@ -54,90 +630,300 @@ class RAGEngine:
             # Return zero vector as fallback
             return [0.0] * 768
     
-    def add_document(self, text: str, filename: str, user_id: int) -> str:
-        """Add a document to the vector store"""
-        if not self.collection:
-            raise Exception("ChromaDB not initialized")
+    def _embed_query(self, query: str) -> List[float]:
+        """Get a query embedding, reusing the cached vector for repeated questions"""
+        embedding = self.query_cache.get(self.embedding_model, query)
+        if embedding is None:
+            embedding = self._get_embedding(query)
+            # Don't cache the zero-vector fallback from a failed request
+            if any(embedding):
+                self.query_cache.put(self.embedding_model, query, embedding)
+        return embedding
+    
+    @staticmethod
+    def _is_model_error(response) -> bool:
+        """Whether a 404 is Ollama's JSON error about the model (e.g. not pulled) rather than an unknown endpoint"""
+        try:
+            error = response.json().get("error", "")
+        except Exception:
+            return False
+        return isinstance(error, str) and "model" in error.lower()
+    
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts with one /api/embed call, falling back to /api/embeddings"""
+        if self._batch_embed_supported is not False:
+            try:
+                response = self.session.post(
+                    f"{self.ollama_url}/api/embed",
+                    json={
+                        "model": self.embedding_model,
+                        "input": texts
+                    },
+                    timeout=30 + 2 * len(texts)
+                )
+                
+                if response.status_code == 200:
+                    self._batch_embed_supported = True
+                    return response.json()["embeddings"]
+                elif response.status_code == 404 and self._batch_embed_supported is None and not self._is_model_error(response):
+                    # Older Ollama releases only expose the single-prompt endpoint
+                    self._batch_embed_supported = False
+                else:
+                    raise Exception(f"Embedding API error: {response.status_code} {response.text[:200]}")
+            except Exception as e:
+                print(f"Error getting batch embeddings, falling back to single requests: {e}")
         
-        # Chunk the text
-        from document_processor import DocumentProcessor
-        processor = DocumentProcessor()
-        chunks = processor.chunk_text(text)
+        return [self._get_embedding(text) for text in texts]
+    
+    def _get_embeddings(self, texts: List[str], progress_callback: Optional[Callable[[int], None]] = None) -> List[List[float]]:
+        """Get embeddings for many texts, running up to embed_concurrency batches at once.
+        
+        progress_callback, if given, is called with the number of texts embedded so far.
+        """
+        batches = [
+            texts[i:i + self.embed_batch_size]
+            for i in range(0, len(texts), self.embed_batch_size)
+        ]
         
-        # Generate embeddings for each chunk
         embeddings = []
-        metadatas = []
-        ids = []
+        if len(batches) <= 1 or self.embed_concurrency == 1:
+            results = map(self._embed_batch, batches)
+        else:
+            executor = ThreadPoolExecutor(max_workers=min(self.embed_concurrency, len(batches)))
+            results = executor.map(self._embed_batch, batches)
+            executor.shutdown(wait=False)
         
-        for i, chunk in enumerate(chunks):
-            embedding = self._get_embedding(chunk)
-            embeddings.append(embedding)
-            
-            metadata = {
-                "filename": filename,
-                "user_id": user_id,
-                "chunk_index": i,
-                "text_length": len(chunk)
-            }
-            metadatas.append(metadata)
-            
-            # Generate unique ID
-            doc_id = f"{filename}_{user_id}_{i}"
-            ids.append(doc_id)
-        
-        # Add to ChromaDB
-        self.collection.add(
-            embeddings=embeddings,
-            documents=chunks,
-            metadatas=metadatas,
-            ids=ids
-        )
+        for batch in results:
+            embeddings.extend(batch)
+            if progress_callback:
+                progress_callback(len(embeddings))
+        
+        return embeddings
+    
+    def _embed_chunks(self, chunks: List[str], progress_callback: Optional[Callable[[int, int], None]] = None) -> tuple:
+        """Embed chunks, reusing stored vectors for chunks seen before.
+        
+        progress_callback, if given, is called with (chunks done, total chunks).
+        Returns (embeddings, hashes, reused_count).
+        """
+        hashes = [ChunkEmbeddingStore.content_hash(self.embedding_model, chunk) for chunk in chunks]
+        stored = self.chunk_store.get_many(hashes)
+        
+        # Embed each new distinct chunk once, even if it repeats within the document
+        missing = {}
+        for content_hash, chunk in zip(hashes, chunks):
+            if content_hash not in stored:
+                missing.setdefault(content_hash, chunk)
         
-        return f"Added {len(chunks)} chunks from {filename}"
+        reused = sum(1 for content_hash in hashes if content_hash not in missing)
+        if progress_callback:
+            progress_callback(reused, len(chunks))
+        
+        if missing:
+            on_batch = (lambda done: progress_callback(reused + done, len(chunks))) if progress_callback else None
+            new_embeddings = dict(zip(missing.keys(), self._get_embeddings(list(missing.values()), on_batch)))
+            # Keep zero-vector fallbacks out of the store so they are retried next time
+            self.chunk_store.put_many({h: e for h, e in new_embeddings.items() if any(e)})
+            stored.update(new_embeddings)
+            # Repeated new chunks were embedded once, so finish the count explicitly
+            if progress_callback:
+                progress_callback(len(chunks), len(chunks))
+        
+        return [stored[content_hash] for content_hash in hashes], hashes, reused
+    
+    def add_document(self, text: str, filename: str, user_id: int,
+                     progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict:
+        """Add a document to the vector store and report how many chunk embeddings were reused"""
+        # Chunk the text
+        chunks = self.chunker.chunk(text)
+        
+        return self.add_chunks(chunks, filename, user_id, progress_callback, total=len(chunks))
+    
+    def add_chunks(self, chunks: Iterable[str], filename: str, user_id: int,
+                   progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+                   total: Optional[int] = None) -> Dict:
+        """Embed and store a stream of chunks, ingest_batch_size at a time.
+        
+        Only one batch of chunks and vectors is held at once, so memory does
+        not grow with the document. total is passed through to
+        progress_callback and may be None when the length isn't known yet.
+        """
+        store = self.vector_store
+        if store is None:
+            raise Exception("Vector store not initialized")
+        
+        chunks = iter(chunks)
+        chunk_count = 0
+        reused = 0
+        written = False
+        
+        try:
+            while True:
+                batch = list(itertools.islice(chunks, self.ingest_batch_size))
+                if not batch:
+                    break
+                
+                offset = chunk_count
+                on_progress = (lambda done, _: progress_callback(offset + done, total)) if progress_callback else None
+                
+                # Generate embeddings for new chunks in concurrent batches
+                embeddings, hashes, batch_reused = self._embed_chunks(batch, on_progress)
+                metadatas = []
+                ids = []
+                
+                for i, chunk in enumerate(batch, start=offset):
+                    metadata = {
+                        "filename": filename,
+                        "user_id": user_id,
+                        "chunk_index": i,
+                        "text_length": len(chunk),
+                        "content_hash": hashes[i - offset]
+                    }
+                    metadatas.append(metadata)
+                    
+                    # Generate unique ID
+                    doc_id = f"{filename}_{user_id}_{i}"
+                    ids.append(doc_id)
+                
+                # Add to the vector store, replacing chunks of an earlier upload with the same name
+                written = True
+                store.upsert(ids, embeddings, batch, metadatas)
+                self._index_keywords(ids, batch, metadatas)
+                chunk_count += len(batch)
+                reused += batch_reused
+            # Stores that buffer upserts write them out once per document
+            store.flush()
+        except Exception as e:
+            if not written:
+                raise
+            # Part of the file's chunks are already replaced, so neither version is whole; remove them all
+            self._delete_stale_chunks(filename, user_id, 0)
+            self.answer_cache.invalidate_user(user_id)
+            raise IngestAborted(str(e)) from e
+        
+        # Nothing stored means nothing replaced: an earlier upload with this name keeps its chunks
+        if chunk_count:
+            self._delete_stale_chunks(filename, user_id, chunk_count)
+        self.answer_cache.invalidate_user(user_id)
+        
+        return {
+            "filename": filename,
+            "chunks": chunk_count,
+            "embedded": chunk_count - reused,
+            "reused": reused
+        }
+    
+    def _index_keywords(self, ids: List[str], documents: List[str], metadatas: List[Dict]):
+        """Add stored chunks to the keyword index"""
+        keyword_index = self.keyword_index
+        if keyword_index is None:
+            return
+        try:
+            keyword_index.upsert(ids, documents, metadatas)
+        except Exception as e:
+            print(f"Error updating keyword index: {e}")
+    
+    def _delete_stale_chunks(self, filename: str, user_id: int, chunk_count: int):
+        """Remove chunks left over from a longer earlier version of the same file"""
+        try:
+            self.vector_store.delete_file_chunks(filename, user_id, from_index=chunk_count)
+            if self.keyword_index is not None:
+                self.keyword_index.delete_file_chunks(filename, user_id, from_index=chunk_count)
+        except Exception as e:
+            print(f"Error deleting stale chunks: {e}")
+    
+    def _search_candidates(self, top_k: int) -> int:
+        """How many results to fetch from each retriever for top_k final results"""
+        candidates = max(top_k, self.rerank_candidates)
+        return max(candidates, self.hybrid_candidates) if self.search_mode == "hybrid" else candidates
+    
+    def _keyword_search(self, query: str, user_id: int, top_k: int) -> List[Dict]:
+        """BM25 matches for query, or [] when hybrid search is off or fails"""
+        if self.search_mode != "hybrid":
+            return []
+        try:
+            keyword_index = self.keyword_index
+            return keyword_index.search(query, user_id, top_k) if keyword_index is not None else []
+        except Exception as e:
+            print(f"Error searching keyword index: {e}")
+            return []
+    
+    def _fuse(self, dense: List[Dict], keyword: List[Dict], top_k: int) -> List[Dict]:
+        """Combine vector and keyword results with reciprocal rank fusion"""
+        # Keyword hits that only match a weak part of the query (e.g. the year
+        # of a policy code) would otherwise outvote an exact match found by BM25 alone
+        if keyword:
+            cutoff = self.keyword_min_score * keyword[0]["score"]
+            keyword = [result for result in keyword if result["score"] >= cutoff]
+        if not keyword:
+            return dense[:top_k]
+        from bm25_index import reciprocal_rank_fusion
+        return reciprocal_rank_fusion([dense, keyword], top_k, self.rrf_k)
+    
+    def _rank(self, query: str, query_embedding: List[float], dense: List[Dict], keyword: List[Dict],
+              top_k: int) -> List[Dict]:
+        """Fuse the retrievers' results and, with reranking on, keep the top_k that pass the reranker"""
+        if not self.rerank_candidates:
+            return self._fuse(dense, keyword, top_k)
+        candidates = self._fuse(dense, keyword, max(top_k, self.rerank_candidates))
+        return self.reranker.rerank(query, query_embedding, candidates, top_k, self.chunk_store.get_many)
     
     def search_documents(self, query: str, user_id: int, top_k: int = 5) -> List[Dict]:
         """Search for relevant documents"""
-        if not self.collection:
+        store = self.vector_store
+        if store is None:
             return []
         
         try:
-            # Get query embedding
-            query_embedding = self._get_embedding(query)
-            
-            # Search in ChromaDB
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k,
-                where={"user_id": user_id}
-            )
+            candidates = self._search_candidates(top_k)
             
-            # Format results
-            documents = []
-            if results['documents'] and results['documents'][0]:
-                for i, doc in enumerate(results['documents'][0]):
-                    documents.append({
-                        "content": doc,
-                        "metadata": results['metadatas'][0][i],
-                        "distance": results['distances'][0][i] if results['distances'] else 0
-                    })
+            # Get query embedding
+            query_embedding = self._embed_query(query)
             
-            return documents
+            # Search the user's chunks
+            dense = store.query(query_embedding, user_id, candidates)
+            return self._rank(query, query_embedding, dense, self._keyword_search(query, user_id, candidates), top_k)
         except Exception as e:
             print(f"Error searching documents: {e}")
             return []
     
-    def generate_response(self, query: str, relevant_docs: List[Dict]) -> str:
-        """Generate response using llama3 via Ollama"""
-        try:
-            # Prepare context from relevant documents
-            context = ""
-            if relevant_docs:
-                context = "Based on the following information:\n\n"
-                for i, doc in enumerate(relevant_docs[:3]):  # Use top 3 docs
-                    context += f"Document {i+1}:\n{doc['content']}\n\n"
-            
-            # Create prompt
-            prompt = f"""You are a helpful assistant. Answer the user's question directly and concisely using the provided context. Do not mention the context or use phrases like 'According to the context', 'Based on the information provided', or similar phrases. Just give the direct answer.
+    def _build_generate_request(self, query: str, passages: List[Dict],
+                                conversation: Optional[Iterable[int]] = None) -> Dict:
+        """Build the /api/generate request body for a query and its assembled context passages.
+        
+        conversation is the context Ollama returned for the chat's previous
+        turn; the instructions are already part of it, so only the new
+        documents and question are sent.
+        """
+        # Prepare context from relevant documents
+        context = ""
+        if passages:
+            context = "Based on the following information:\n\n" + "".join(
+                f"Document {i+1}:\n{passage['content']}\n\n" for i, passage in enumerate(passages)
+            )
+        
+        if conversation is not None:
+            return {
+                "model": self.llm_model,
+                "prompt": f"""Context:
+{context}
+
+User Question: {query}
+
+Answer:""",
+                "context": list(conversation),
+                "stream": True,
+                "keep_alive": self.keep_alive,
+                "options": {
+                    "temperature": 0.7,
+                    "top_p": 0.9,
+                    "num_ctx": self.num_ctx,
+                    "num_predict": self.answer_tokens
+                }
+            }
+        
+        # Create prompt
+        prompt = f"""You are a helpful assistant. Answer the user's question directly and concisely using the provided context. Do not mention the context or use phrases like 'According to the context', 'Based on the information provided', or similar phrases. Just give the direct answer.
 
 Context:
 {context}
@@ -145,20 +931,27 @@ Context:
 User Question: {query}
 
 Answer:"""
-            
+        
+        return {
+            "model": self.llm_model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+            "options": {
+                "temperature": 0.7,
+                "top_p": 0.9,
+                "num_ctx": self.num_ctx,
+                "num_predict": self.answer_tokens
+            }
+        }
+    
+    def generate_response(self, query: str, relevant_docs: List[Dict]) -> str:
+        """Generate response using llama3 via Ollama"""
+        try:
             # Call Ollama API
-            response = requests.post(
+            response = self.session.post(
                 f"{self.ollama_url}/api/generate",
-                json={
-                    "model": self.llm_model,
-                    "prompt": prompt,
-                    "stream": True,
-                    "options": {
-                        "temperature": 0.7,
-                        "top_p": 0.9,
-                        "max_tokens": 1000
-                    }
-                },
+                json=self._build_generate_request(query, self.context_assembler.assemble(relevant_docs)),
                 stream=True,
                 timeout=60
             )
@@ -174,29 +967,219 @@ Answer:"""
     
     def delete_user_documents(self, user_id: int):
         """Delete all documents for a user"""
-        if not self.collection:
+        store = self.vector_store
+        if store is None:
             return
         
+        self.answer_cache.invalidate_user(user_id)
         try:
-            # Get all documents for the user
-            results = self.collection.get(
-                where={"user_id": user_id}
-            )
-            
-            if results['ids']:
-                self.collection.delete(ids=results['ids'])
-                
+            store.delete_user(user_id)
+            if self.keyword_index is not None:
+                self.keyword_index.delete_user(user_id)
         except Exception as e:
             print(f"Error deleting user documents: {e}")
     
-    def delete_document_by_id(self, document_id: str):
-        """Delete a specific document by ID"""
-        if not self.collection:
+    def delete_document(self, filename: str, user_id: int):
+        """Delete the chunks of one of a user's documents"""
+        store = self.vector_store
+        if store is None:
             return
         
+        self.answer_cache.invalidate_user(user_id)
+        try:
+            store.delete_file_chunks(filename, user_id)
+            if self.keyword_index is not None:
+                self.keyword_index.delete_file_chunks(filename, user_id)
+        except Exception as e:
+            print(f"Error deleting document: {e}")
+
+
+class AsyncRAGEngine(RAGEngine):
+    """RAGEngine whose query-time Ollama calls run on the event loop.
+
+    Embedding and generate requests share one pooled httpx.AsyncClient and
+    the response is streamed token by token, so concurrent chats on a single
+    worker overlap instead of queueing. The vector store is synchronous, so
+    vector queries are pushed to a worker thread.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.max_connections = max(1, int(os.getenv("OLLAMA_MAX_CONNECTIONS", "32")))
+        self._client = None
+    
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        """Pooled async HTTP client, created on first use inside the running event loop"""
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(60.0, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self._client
+    
+    async def aclose(self):
+        """Close the pooled HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _aget_embedding(self, text: str) -> List[float]:
+        """Get embedding for text using nomic-embed-text via Ollama"""
         try:
-            # Delete the specific document
-            self.collection.delete(ids=[document_id])
+            response = await self.client.post(
+                f"{self.ollama_url}/api/embeddings",
+                json={
+                    "model": self.embedding_model,
+                    "prompt": text
+                },
+                timeout=30
+            )
+            
+            if response.status_code == 200:
+                return response.json()["embedding"]
+            else:
+                raise Exception(f"Embedding API error: {response.status_code}")
+        except Exception as e:
+            print(f"Error getting embedding: {e}")
+            # Return zero vector as fallback
+            return [0.0] * 768
+    
+    async def _aembed_query(self, query: str) -> List[float]:
+        """Get a query embedding, reusing the cached vector for repeated questions.
+        
+        Only the in-memory LRU is touched on the event loop; the SQLite
+        lookup runs in the executor and the write to disk happens behind
+        the response.
+        """
+        cache = self.query_cache
+        embedding = cache.get_in_memory(self.embedding_model, query)
+        if embedding is not None:
+            return embedding
+        loop = asyncio.get_running_loop()
+        if cache.persistent:
+            embedding = await loop.run_in_executor(None, cache.load, self.embedding_model, query)
+            if embedding is not None:
+                return embedding
+        embedding = await self._aget_embedding(query)
+        if any(embedding):
+            cache.put_in_memory(self.embedding_model, query, embedding)
+            if cache.persistent:
+                loop.run_in_executor(None, cache.save, self.embedding_model, query, embedding)
+        return embedding
+    
+    async def asearch_documents(self, query: str, user_id: int, top_k: int = 5) -> List[Dict]:
+        """Search for relevant documents without blocking the event loop"""
+        store = self.vector_store
+        if store is None:
+            return []
+        
+        try:
+            candidates = self._search_candidates(top_k)
+            loop = asyncio.get_running_loop()
+            # The keyword search needs no embedding, so it runs while the query is embedded
+            keyword_search = None
+            if self.search_mode == "hybrid":
+                keyword_search = loop.run_in_executor(
+                    None,
+                    functools.partial(self._keyword_search, query, user_id, candidates)
+                )
+            
+            query_embedding = await self._aembed_query(query)
+            
+            dense = await loop.run_in_executor(
+                None,
+                functools.partial(store.query, query_embedding, user_id, candidates)
+            )
+            keyword = await keyword_search if keyword_search else []
+            if not self.rerank_candidates:
+                return self._fuse(dense, keyword, top_k)
+            # Reranking may read stored chunk embeddings
+            return await loop.run_in_executor(
+                None,
+                functools.partial(self._rank, query, query_embedding, dense, keyword, top_k)
+            )
+        except Exception as e:
+            print(f"Error searching documents: {e}")
+            return []
+    
+    async def agenerate_response(self, query: str, relevant_docs: List[Dict],
+                                 user_id: Optional[int] = None,
+                                 conversation: Optional[Iterable[int]] = None,
+                                 on_conversation: Optional[Callable[[List[int]], None]] = None) -> AsyncIterator[str]:
+        """Stream response text fragments from llama3 via Ollama.
+        
+        With a user_id, an answer cached for a near-identical question over
+        the same context is returned instead, and complete new answers are cached.
+        For a follow-up turn, pass the context Ollama returned for the previous
+        turn as conversation; on_conversation receives the updated one.
+        """
+        passages = self.context_assembler.assemble(relevant_docs)
+        cacheable = False
+        # Follow-up answers depend on the conversation, so only first turns are cached
+        if user_id is not None and conversation is None and self.answer_cache.enabled:
+            generation = self.answer_cache.generation(user_id)
+            # Already cached by the search that found relevant_docs
+            embedding = await self._aembed_query(query)
+            signature = AnswerCache.context_signature(passages)
+            if any(embedding):
+                cached = self.answer_cache.get(user_id, embedding, signature)
+                if cached is not None:
+                    if on_conversation and cached["conversation"]:
+                        on_conversation(cached["conversation"])
+                    yield cached["answer"]
+                    return
+                cacheable = True
+        
+        parts = []
+        completed = False
+        returned_conversation = None
+        request = self._build_generate_request(query, passages, conversation)
+        started = time.perf_counter()
+        ttft_ms = None
+        try:
+            async with self.client.stream(
+                "POST",
+                f"{self.ollama_url}/api/generate",
+                json=request
+            ) as response:
+                if response.status_code != 200:
+                    yield f"Error generating response: {response.status_code}"
+                    return
                 
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    try:
+                        data = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Skip non-JSON lines
+                        continue
+                    if 'response' in data:
+                        if ttft_ms is None and data['response']:
+                            ttft_ms = (time.perf_counter() - started) * 1000
+                        parts.append(data['response'])
+                        yield data['response']
+                    if data.get('done'):
+                        completed = True
+                        returned_conversation = data.get('context')
+                        if on_conversation and returned_conversation:
+                            on_conversation(returned_conversation)
+                        from chunking import estimate_tokens
+                        self.generation_stats.record(
+                            data.get('prompt_eval_count') or estimate_tokens(request["prompt"]),
+                            sum(passage["tokens"] for passage in passages),
+                            ttft_ms if ttft_ms is not None else (time.perf_counter() - started) * 1000
+                        )
+            
+            if completed and cacheable:
+                self.answer_cache.put(
+                    user_id, query, embedding, signature, "".join(parts), generation, returned_conversation
+                )
         except Exception as e:
-            print(f"Error deleting document: {e}") 
\ No newline at end of file
+            print(f"Error generating response: {e}")
+            yield f"I apologize, but I encountered an error while generating a response: {str(e)}"
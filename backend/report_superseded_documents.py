@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""List document rows superseded by a later upload with the same name.
+
+Before same-name uploads replaced their predecessor's row, a re-upload
+left the old row in place, while its chunks were overwritten by the newer
+upload's. This one-off report lists such rows so an admin can review them:
+
+    python report_superseded_documents.py
+
+Nothing is changed. Deleting a listed row from the admin dashboard leaves
+the newer upload's chunks alone.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import DatabaseManager
+
+def report_superseded_documents(db_path: str = "rag_chatbot.db") -> int:
+    """Print each superseded document row; returns how many there are"""
+    db_manager = DatabaseManager(db_path)
+    db_manager.init_database()
+    
+    documents = db_manager.get_superseded_documents()
+    for document in documents:
+        print(f"Document {document['id']} ({document['filename']}, user {document['user_id']}, "
+              f"uploaded {document['created_at']}) was superseded by a later upload with the same name")
+    
+    print(f"{len(documents)} superseded document row(s)")
+    return len(documents)
+
+if __name__ == "__main__":
+    report_superseded_documents(sys.argv[1] if len(sys.argv) > 1 else "rag_chatbot.db")
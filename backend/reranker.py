@@ -0,0 +1,143 @@
+import math
+import os
+import threading
+import time
+import numpy as np
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bm25_index import tokenize
+
+class Reranker:
+    """Re-scores retrieved candidates locally and keeps only the clearly relevant ones.
+
+    A candidate's score mixes its cosine similarity to the query with the
+    share of the query's terms its text contains, weighted by how rare each
+    term is among the candidates. Vector results carry the similarity as
+    their distance; for keyword-only results the chunk's stored embedding
+    is looked up by content hash. Both signals are scaled within the
+    candidate pool, so the score only orders candidates: the best one
+    always scores about 1 however poorly it matches. Candidates scoring
+    below cutoff times the best score are dropped, so weak matches no
+    longer fill the prompt just because top_k slots were free. An absolute
+    floor, min_similarity, can also drop every candidate whose cosine
+    similarity (or lack of a stored embedding) doesn't reach it; it is off
+    by default, since it drops exact keyword matches on codes and names
+    too, and its value depends on the embedding model. The time spent is
+    recorded per call.
+    """
+
+    def __init__(self, term_weight: Optional[float] = None, cutoff: Optional[float] = None,
+                 min_similarity: Optional[float] = None, window: int = 1000):
+        self.term_weight = term_weight if term_weight is not None else float(os.getenv("RERANK_TERM_WEIGHT", "0.5"))
+        self.cutoff = cutoff if cutoff is not None else float(os.getenv("RERANK_CUTOFF", "0.8"))
+        self.min_similarity = (min_similarity if min_similarity is not None
+                               else float(os.getenv("RERANK_MIN_SIMILARITY", "0")))
+        self.requests = 0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def rerank(self, query: str, query_embedding: List[float], candidates: List[Dict], top_k: int,
+               lookup_embeddings: Optional[Callable[[List[str]], Dict[str, List[float]]]] = None) -> List[Dict]:
+        """Return at most top_k candidates above the cutoff, best first, with their rerank "score".
+
+        lookup_embeddings maps content hashes to stored chunk embeddings and
+        is only called for candidates without a distance.
+        """
+        start = time.perf_counter()
+        scores, similarities = self._scores(query, query_embedding, candidates, lookup_embeddings)
+        scored = sorted(
+            (
+                (score, i) for i, (score, similarity) in enumerate(zip(scores, similarities))
+                if self._passes_floor(similarity)
+            ),
+            key=lambda item: -item[0]
+        )
+        kept = []
+        if scored and top_k > 0:
+            best = scored[0][0]
+            threshold = best * self.cutoff if best > 0 else best
+            kept = [
+                {**candidates[i], "score": score}
+                for score, i in scored[:top_k]
+                if score >= threshold
+            ]
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.requests += 1
+            self._recent.append((elapsed_ms, len(candidates), len(kept)))
+        return kept
+
+    def _passes_floor(self, similarity: Optional[float]) -> bool:
+        if self.min_similarity <= 0:
+            return True
+        # With the floor on, a candidate without a known similarity can't show it is on topic
+        return similarity is not None and similarity >= self.min_similarity
+
+    def _scores(self, query: str, query_embedding: List[float], candidates: List[Dict],
+                lookup_embeddings: Optional[Callable[[List[str]], Dict[str, List[float]]]]
+                ) -> Tuple[List[float], List[Optional[float]]]:
+        """Return each candidate's rerank score and its cosine similarity to the query (None if unknown)"""
+        similarities = [
+            1.0 - candidate["distance"] if candidate.get("distance") is not None else None
+            for candidate in candidates
+        ]
+
+        missing = [
+            candidate.get("metadata", {}).get("content_hash")
+            for candidate, similarity in zip(candidates, similarities)
+            if similarity is None
+        ]
+        missing = [content_hash for content_hash in missing if content_hash]
+        if missing and lookup_embeddings is not None:
+            stored = lookup_embeddings(missing)
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+            query_norm = float(np.linalg.norm(query_vector)) or 1.0
+            for i, candidate in enumerate(candidates):
+                embedding = stored.get(candidate.get("metadata", {}).get("content_hash"))
+                if similarities[i] is None and embedding is not None:
+                    vector = np.asarray(embedding, dtype=np.float32)
+                    similarities[i] = float(vector @ query_vector) / ((float(np.linalg.norm(vector)) or 1.0) * query_norm)
+
+        # Both signals are scaled within the candidate pool: similarity relative
+        # to the closest candidate, and terms every candidate shares weigh nothing
+        best_similarity = max((similarity for similarity in similarities if similarity is not None), default=0.0)
+
+        candidate_terms = [set(tokenize(candidate["content"])) for candidate in candidates]
+        query_terms = set(tokenize(query))
+        weights = {}
+        for term in query_terms:
+            frequency = sum(term in terms for terms in candidate_terms)
+            # A term no candidate contains can't tell them apart
+            if frequency:
+                weights[term] = math.log((len(candidates) + 1) / (frequency + 0.5))
+        total_weight = sum(weights.values())
+
+        scores = []
+        for terms, similarity in zip(candidate_terms, similarities):
+            # A keyword-only chunk without a stored embedding gets no similarity credit
+            if similarity is None or best_similarity <= 0:
+                relative_similarity = 0.0
+            else:
+                relative_similarity = max(similarity, 0.0) / best_similarity
+            coverage = 0.0
+            if total_weight > 0:
+                coverage = sum(weight for term, weight in weights.items() if term in terms) / total_weight
+            scores.append((1 - self.term_weight) * relative_similarity + self.term_weight * coverage)
+        return scores, similarities
+
+    def stats(self) -> Dict:
+        """Rerank time percentiles and candidates in/out over the recent window"""
+        with self._lock:
+            recent = list(self._recent)
+        if not recent:
+            return {"requests": self.requests}
+        elapsed = sorted(sample[0] for sample in recent)
+        return {
+            "requests": self.requests,
+            "p50_ms": elapsed[len(elapsed) // 2],
+            "p95_ms": elapsed[min(len(elapsed) - 1, int(len(elapsed) * 0.95))],
+            "avg_candidates": sum(sample[1] for sample in recent) / len(recent),
+            "avg_kept": sum(sample[2] for sample in recent) / len(recent)
+        }
@@ -0,0 +1,72 @@
+import threading
+from typing import Callable, Dict
+
+class Services:
+    """Process-wide container for the backend's long-lived components.
+
+    Each component is built on first access and then shared, so the API,
+    the admin manager and the ingestion workers all use one ChromaDB
+    client, one SQLite connection pool and one Ollama connection pool.
+    """
+
+    def __init__(self):
+        self._instances: Dict[str, object] = {}
+        self._lock = threading.RLock()
+
+    def _get(self, name: str, factory: Callable[[], object]):
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = factory()
+                    self._instances[name] = instance
+        return instance
+
+    @property
+    def auth_handler(self):
+        from auth import AuthHandler
+        return self._get("auth_handler", AuthHandler)
+
+    @property
+    def db_manager(self):
+        from database import DatabaseManager
+        return self._get("db_manager", DatabaseManager)
+
+    @property
+    def document_processor(self):
+        from document_processor import DocumentProcessor
+        return self._get("document_processor", DocumentProcessor)
+
+    @property
+    def rag_engine(self):
+        from rag_engine import AsyncRAGEngine
+        return self._get("rag_engine", AsyncRAGEngine)
+
+    @property
+    def admin_manager(self):
+        from admin import AdminManager
+        return self._get("admin_manager", lambda: AdminManager(self.db_manager, self.rag_engine, self.auth_handler))
+
+    @property
+    def ingestion_queue(self):
+        from ingestion import IngestionQueue
+        return self._get(
+            "ingestion_queue",
+            lambda: IngestionQueue(self.db_manager, self.rag_engine, self.document_processor)
+        )
+
+    @property
+    def chat_contexts(self):
+        from chat_context import ChatContextCache
+        return self._get(
+            "chat_contexts",
+            lambda: ChatContextCache(self.db_manager, self.rag_engine.conversation_token_limit)
+        )
+
+    def is_built(self, name: str) -> bool:
+        """Whether a component has been created yet"""
+        return name in self._instances
+
+
+services = Services()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Authorization cost of admin dashboard loads, per-request lookups vs the auth context cache.
+
+Loads the admin dashboard (its three parallel requests: stats, users,
+documents) repeatedly through the FastAPI app in-process, with the
+previous dependencies (decode the JWT and read the user from SQLite on
+every request) and with the cached authorization context. Counts the
+user lookups made for authorization and times the dependency itself.
+Also checks that demoting the admin takes effect on their next request,
+and within the TTL when another worker process demotes them.
+
+Usage: python benchmarks/bench_admin_auth.py [loads]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+DASHBOARD = ["/api/admin/stats", "/api/admin/users", "/api/admin/documents"]
+
+
+def previous_dependencies(main):
+    """get_current_user / get_current_admin as they were before the cache"""
+    from fastapi import Depends, HTTPException
+
+    def get_current_user(credentials=Depends(main.security)):
+        payload = main.auth_handler.decode_token(credentials.credentials)
+        return {"user_id": payload["user_id"], "username": payload["username"]}
+
+    def get_current_admin(current_user: dict = Depends(get_current_user)):
+        if not main.admin_manager.is_admin(current_user["user_id"]):
+            raise HTTPException(status_code=403, detail="Admin access required")
+        return current_user
+
+    return get_current_user, get_current_admin
+
+
+async def load_dashboards(client, headers, loads):
+    for _ in range(loads):
+        responses = await asyncio.gather(*(client.get(path, headers=headers) for path in DASHBOARD))
+        assert all(response.status_code == 200 for response in responses), [r.status_code for r in responses]
+
+
+def time_dependency(get_current_user, get_current_admin, token, calls=2000):
+    from fastapi.security import HTTPAuthorizationCredentials
+
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    start = time.perf_counter()
+    for _ in range(calls):
+        get_current_admin(get_current_user(credentials))
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+async def run(loads):
+    import httpx
+
+    os.chdir(tempfile.mkdtemp())
+    import main
+
+    main.db_manager.init_database()
+    main.auth_handler.bcrypt_rounds = 4
+    admin_id = main.db_manager.create_user("admin", main.auth_handler.get_password_hash("admin-password"), True)
+
+    lookups = [0]
+    get_user_by_id = main.db_manager.get_user_by_id
+
+    def counted_get_user_by_id(user_id):
+        lookups[0] += 1
+        return get_user_by_id(user_id)
+
+    main.db_manager.get_user_by_id = counted_get_user_by_id
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/api/auth/login", data={"username": "admin", "password": "admin-password"})
+        token = response.json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        print(f"{loads} dashboard loads ({len(DASHBOARD)} requests each):")
+        old_user, old_admin = previous_dependencies(main)
+        for label, dependencies in (("per-request lookup", (old_user, old_admin)),
+                                    ("auth context cache", (main.get_current_user, main.get_current_admin))):
+            main.app.dependency_overrides = {main.get_current_user: dependencies[0], main.get_current_admin: dependencies[1]}
+            lookups[0] = 0
+            start = time.perf_counter()
+            await load_dashboards(client, headers, loads)
+            elapsed = time.perf_counter() - start
+            load_lookups = lookups[0]
+            per_call = statistics.median(time_dependency(*dependencies, token) for _ in range(3))
+            print(f"{label:>19}: {load_lookups} user lookups for authorization, "
+                  f"{elapsed / loads * 1000:.1f} ms per load, dependency {per_call:.1f} us per request")
+        main.app.dependency_overrides = {}
+
+        # Demote the admin: the next request must be refused without waiting for the TTL
+        main.admin_manager.update_user(admin_id, "admin", False)
+        response = await client.get("/api/admin/stats", headers=headers)
+        print(f"after demotion: /api/admin/stats -> {response.status_code}, cache {main.auth_contexts.stats()}")
+
+        # Demote it from another worker process, which can't reach this one's cache: refused once the entry expires
+        main.admin_manager.update_user(admin_id, "admin", True)
+        main.auth_contexts.ttl_seconds = 0.5
+        before = (await client.get("/api/admin/stats", headers=headers)).status_code
+        main.db_manager.update_user(admin_id, "admin", False)
+        cached = (await client.get("/api/admin/stats", headers=headers)).status_code
+        await asyncio.sleep(main.auth_contexts.ttl_seconds)
+        expired = (await client.get("/api/admin/stats", headers=headers)).status_code
+        print(f"demoted by another worker: {before} -> {cached} while cached -> {expired} "
+              f"after the {main.auth_contexts.ttl_seconds}s TTL")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
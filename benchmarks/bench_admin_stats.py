@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Admin stats latency by table size, COUNT(*) queries vs trigger-maintained counters.
+
+For each size, builds a database with the base tables only (the chat
+history generator from bench_migrations), times the previous stats (four
+COUNT(*) queries), migrates it in place and times get_system_stats, which
+reads the counters and the recent activity ring buffer. Also reports the
+one-off migration time and what the counting trigger adds to each
+save_message.
+
+Usage: python benchmarks/bench_admin_stats.py [messages ...]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_migrations import populate
+
+
+def time_call(func, repeat=20):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def count_queries(db):
+    return (db.get_user_count(), db.get_document_count(), db.get_chat_count(), db.get_message_count())
+
+
+def time_saves(db, count=2000):
+    start = time.perf_counter()
+    for i in range(count):
+        db.save_message("chat-0", "user", f"Message {i}")
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def run_benchmark(sizes):
+    from admin import AdminManager
+    from database import DatabaseManager
+
+    for messages in sizes:
+        db = DatabaseManager(os.path.join(tempfile.mkdtemp(), "bench.db"))
+        populate(db, messages)
+        unmigrated = time_call(lambda: count_queries(db))
+
+        start = time.perf_counter()
+        db.init_database()
+        migration = time.perf_counter() - start
+
+        admin = AdminManager(db, rag_engine=object(), auth_handler=object())
+        # The earlier migrations' indexes give COUNT(*) a smaller b-tree to walk
+        migrated = time_call(lambda: count_queries(db))
+        counters = time_call(admin.get_system_stats)
+        save_counted = time_saves(db)
+        stats = admin.get_system_stats()
+        assert stats["total_messages"] == db.get_message_count(), "counter drifted from COUNT(*)"
+
+        with db._cursor() as cursor:
+            cursor.execute("DROP TRIGGER messages_count_insert")
+        save_uncounted = time_saves(db)
+
+        print(f"{messages:>9} messages: COUNT(*) stats {unmigrated:.2f} ms (indexed: {migrated:.2f} ms), "
+              f"counters {counters:.3f} ms with {len(stats['recentActivity'])} activity entries; "
+              f"migration {migration:.2f}s; save_message {save_uncounted:.0f} us, {save_counted:.0f} us with the trigger")
+        db.close()
+
+
+if __name__ == "__main__":
+    run_benchmark([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
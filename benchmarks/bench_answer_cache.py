@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""End-to-end answer latency and hit rate for repeated questions, with the semantic answer cache.
+
+Replays a skewed stream of FAQ questions, reworded with different casing,
+punctuation and word order, through AsyncRAGEngine.asearch_documents and
+agenerate_response against a mock Ollama that takes about a quarter of a
+second per answer. Then a document is re-uploaded to show its user's
+answers being invalidated.
+
+Usage: python benchmarks/bench_answer_cache.py [queries]
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_ollama import MockOllama
+from rag_engine import AsyncRAGEngine
+
+TOPICS = ("password", "leave request", "payslip", "badge", "laptop", "pension", "contract", "schedule")
+FAQ = [f"How do I {verb} my {noun}?" for verb in ("reset", "update", "cancel", "renew", "find") for noun in TOPICS]
+HANDBOOK = [
+    f"To {verb} your {noun}, open the staff portal and choose {noun.title()} > {verb.title()}. "
+    f"Requests to {verb} a {noun} are handled by the service desk within two working days."
+    for verb in ("reset", "update", "cancel", "renew", "find") for noun in TOPICS
+]
+
+
+def reword(question, rng):
+    """The same question as different users type it"""
+    variant = rng.randrange(4)
+    if variant == 1:
+        return question.lower().rstrip("?")
+    if variant == 2:
+        words = question.rstrip("?").split()
+        return f"{' '.join(words[3:])}: {' '.join(words[:3]).lower()}?"
+    if variant == 3:
+        return question.upper()
+    return question
+
+
+async def answer(engine, question, user_id):
+    start = time.perf_counter()
+    docs = await engine.asearch_documents(question, user_id)
+    "".join([part async for part in engine.agenerate_response(question, docs, user_id)])
+    return (time.perf_counter() - start) * 1000
+
+
+async def replay(engine, count):
+    rng = random.Random(7)
+    weights = [1 / (rank + 1) for rank in range(len(FAQ))]
+    hits_before = engine.answer_cache.hits
+    hit_latencies, miss_latencies = [], []
+    for question in rng.choices(FAQ, weights=weights, k=count):
+        hits = engine.answer_cache.hits
+        latency = await answer(engine, reword(question, rng), 1)
+        (hit_latencies if engine.answer_cache.hits > hits else miss_latencies).append(latency)
+    return engine.answer_cache.hits - hits_before, hit_latencies, miss_latencies
+
+
+async def run(count):
+    with MockOllama(request_latency=0.005, item_latency=0.0, prefill_latency=0.05,
+                    token_latency=0.01, response_tokens=20, parallel=8) as mock:
+        for label, size in (("no answer cache", 0), ("answer cache", 512)):
+            os.chdir(tempfile.mkdtemp())
+            os.environ["ANSWER_CACHE_SIZE"] = str(size)
+            engine = AsyncRAGEngine()
+            engine.ollama_url = mock.url
+            engine.add_chunks(HANDBOOK, "handbook.pdf", 1)
+
+            start = time.perf_counter()
+            hits, hit_latencies, miss_latencies = await replay(engine, count)
+            elapsed = time.perf_counter() - start
+            latencies = sorted(hit_latencies + miss_latencies)
+            print(f"{label:>16}: {count} questions in {elapsed:.1f}s, p50 {statistics.median(latencies):.1f} ms, "
+                  f"hit rate {hits / count:.2f}")
+            if hit_latencies:
+                print(f"{'':>16}  hits p50 {statistics.median(hit_latencies):.1f} ms, "
+                      f"misses p50 {statistics.median(miss_latencies):.1f} ms")
+
+            if size:
+                # A new version of the handbook invalidates the user's answers
+                engine.add_chunks(HANDBOOK[:-1] + ["The pension portal moved to the HR site."], "handbook.pdf", 1)
+                hits = engine.answer_cache.hits
+                await answer(engine, FAQ[0], 1)
+                print(f"{'':>16}  after re-upload: {'hit' if engine.answer_cache.hits > hits else 'miss'}, "
+                      f"stats {engine.answer_cache.stats()}")
+            await engine.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 300))
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Time to first token per turn of a multi-turn chat, with and without Ollama context reuse.
+
+Runs one chat through AsyncRAGEngine the way /api/chat/query does, in
+three modes: "stateless" (the previous behaviour: every turn is a fresh
+prompt and earlier turns are forgotten), "history re-sent" (the transcript
+so far is pasted into each prompt, so prefill grows every turn) and
+"context reuse" (ChatContextCache sends back the context Ollama returned,
+so only the new turn is prefilled). The mock Ollama charges prefill per
+evaluated token and keeps the KV state of contexts it returned. Finally the
+chat continues after a restart, from the context stored in SQLite.
+
+Usage: python benchmarks/bench_chat_context.py [turns]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_ollama import MockOllama
+
+QUESTIONS = [
+    "How do I submit an expense claim?",
+    "What if the receipt is lost?",
+    "Who approves it?",
+    "How long does that take?",
+    "Can I claim for a taxi?",
+    "What about meals on the same trip?",
+    "Is there a daily limit?",
+    "What happens if I go over it?",
+]
+HANDBOOK = [
+    "Expense claims are submitted in the finance portal with a scanned receipt for every item.",
+    "A lost receipt can be replaced by a signed missing-receipt declaration for items under 50 pounds.",
+    "Claims are approved by your line manager, and claims over the limit also need sign-off from finance.",
+    "Approved claims are paid with the next monthly payroll run.",
+    "Taxis are reimbursed when public transport is unavailable or after 10pm.",
+    "Meals on business trips are covered up to a daily limit of 40 pounds.",
+    "Spending over the daily limit is not reimbursed unless finance agreed to it in advance.",
+]
+PROMPT_TOKEN_LATENCY = 0.0005
+
+
+async def ask(engine, question, conversation=None, on_conversation=None):
+    """Return (TTFT ms, prompt tokens evaluated, answer)"""
+    docs = await engine.asearch_documents(question, 1)
+    start = time.perf_counter()
+    ttft = None
+    parts = []
+    async for part in engine.agenerate_response(question, docs, 1, conversation, on_conversation):
+        if ttft is None:
+            ttft = (time.perf_counter() - start) * 1000
+        parts.append(part)
+    return ttft, engine.generation_stats._recent[-1][0], "".join(parts)
+
+
+async def run_chat(engine, db, mode, turns, chat_id):
+    from chat_context import ChatContextCache
+
+    contexts = ChatContextCache(db, engine.conversation_token_limit)
+    db.create_chat(chat_id, 1, QUESTIONS[0])
+    transcript = ""
+    results = []
+    for turn in range(turns):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        if mode == "history re-sent":
+            result = await ask(engine, f"{transcript}User: {question}")
+            transcript += f"User: {question}\nAssistant: {result[2]}\n"
+        elif mode == "context reuse":
+            conversation = contexts.get(chat_id, 1, engine.llm_model) if turn else None
+            result = await ask(engine, question, conversation,
+                               lambda context: contexts.put(chat_id, 1, engine.llm_model, context))
+        else:
+            result = await ask(engine, question)
+        results.append(result)
+    return results
+
+
+async def run(turns):
+    from database import DatabaseManager
+    from rag_engine import AsyncRAGEngine
+    from chat_context import ChatContextCache
+
+    os.chdir(tempfile.mkdtemp())
+    os.environ["ANSWER_CACHE_SIZE"] = "0"
+    db = DatabaseManager("bench.db")
+    db.init_database()
+
+    with MockOllama(request_latency=0.0, item_latency=0.0, prefill_latency=0.02,
+                    prompt_token_latency=PROMPT_TOKEN_LATENCY, token_latency=0.0, response_tokens=60) as mock:
+        engine = AsyncRAGEngine()
+        engine.ollama_url = mock.url
+        engine.add_chunks(HANDBOOK, "expenses.pdf", 1)
+
+        print(f"{turns}-turn chat, TTFT in ms (prompt tokens evaluated):")
+        for mode in ("stateless", "history re-sent", "context reuse"):
+            results = await run_chat(engine, db, mode, turns, f"chat-{mode}")
+            per_turn = ", ".join(f"{ttft:.0f} ({tokens})" for ttft, tokens, _ in results)
+            print(f"{mode:>16}: turn 1 {results[0][0]:.0f} ms, turn {turns} {results[-1][0]:.0f} ms, "
+                  f"turns 2+ p50 {statistics.median(r[0] for r in results[1:]):.0f} ms")
+            print(f"{'':>16}  {per_turn}")
+
+        # A restart: the chat's context comes back from SQLite. Whether Ollama
+        # still holds its KV state depends on keep_alive; show both cases.
+        for label, keep_kv in (("restart, model still loaded", True), ("restart, model unloaded", False)):
+            if not keep_kv:
+                mock.kv_cache.clear()
+            contexts = ChatContextCache(db, engine.conversation_token_limit)
+            conversation = contexts.get("chat-context reuse", 1, engine.llm_model)
+            ttft, tokens, _ = await ask(engine, "Can I claim parking too?", conversation)
+            print(f"{label:>28}: TTFT {ttft:.0f} ms ({tokens} tokens), context of {len(conversation)} tokens from SQLite")
+        await engine.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 8))
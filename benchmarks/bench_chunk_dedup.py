@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Re-ingest a revised handbook and count how many chunk embeddings are reused.
+
+Usage: python benchmarks/bench_chunk_dedup.py [sections]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_ollama import MockOllama
+from rag_engine import RAGEngine
+
+
+def handbook(sections, revised=()):
+    parts = []
+    for n in range(sections):
+        edition = "2025" if n in revised else "2024"
+        parts.append(
+            f"Section {n}. Policy {n} ({edition} edition) applies to all staff. "
+            + f"Requests under policy {n} must be approved by a line manager within five working days. " * 9
+        )
+    return "\n\n".join(parts)
+
+
+def manual(pages, edited_page=None):
+    """Running prose with sentences of varying length; optionally a sentence added on one page"""
+    rng = random.Random(0)
+    words = ("claims", "approval", "manager", "receipts", "travel", "budget", "review", "policy",
+             "staff", "expenses", "deadline", "records", "payment", "director", "invoice", "limit")
+    result = []
+    for page in range(pages):
+        sentences = []
+        for n in range(12):
+            sentence = " ".join(rng.choice(words) for _ in range(rng.randint(6, 30)))
+            sentences.append(f"Page {page} rule {n}: {sentence}.")
+        if page == edited_page:
+            sentences.insert(3, "Claims filed after the deadline need the director's written approval.")
+        result.append(" ".join(sentences))
+    return result
+
+
+def ingest(engine, text, label, mock):
+    mock.request_count = 0
+    start = time.perf_counter()
+    report = engine.add_document(text, "handbook.pdf", user_id=1)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<26} {report['chunks']:4d} chunks  embedded {report['embedded']:4d}  "
+          f"reused {report['reused']:4d}  {mock.request_count:3d} embed requests  {elapsed:6.2f}s")
+
+
+def run_benchmark(sections=200):
+    os.chdir(tempfile.mkdtemp())
+    with MockOllama() as mock:
+        engine = RAGEngine()
+        engine.ollama_url = mock.url
+
+        ingest(engine, handbook(sections), "first upload", mock)
+        ingest(engine, handbook(sections), "identical re-upload", mock)
+        revised = set(range(0, sections, 10))
+        ingest(engine, handbook(sections, revised), f"{len(revised)} sections revised", mock)
+
+        # A sentence inserted early shifts every later sentence-packed boundary unless chunks re-sync
+        pages = max(1, sections // 5)
+        ingest(engine, "\n".join(manual(pages)), "manual, first upload", mock)
+        ingest(engine, "\n".join(manual(pages, edited_page=min(5, pages - 1))), "manual, 1 sentence added", mock)
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Chunking throughput and stability for each chunk strategy.
+
+Throughput is measured on the repo's text (test_document.docx, README.md,
+instructions.md) repeated to the requested size. Stability is the share of
+chunks that come out unchanged after inserting one sentence near the start
+of each document - unchanged chunks keep their stored embeddings on
+re-upload.
+
+Usage: python benchmarks/bench_chunking.py [megabytes]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+from chunking import CHUNKERS, get_chunker, estimate_tokens
+from document_processor import DocumentProcessor
+
+EDIT = "This sentence was added in a later revision of the document. "
+
+
+def load_documents():
+    processor = DocumentProcessor()
+    documents = {"test_document.docx": processor.extract_text(os.path.join(ROOT, "test_document.docx"))}
+    for name in ("README.md", "instructions.md"):
+        with open(os.path.join(ROOT, name), encoding="utf-8") as f:
+            documents[name] = f.read()
+    return documents
+
+
+def insert_sentence(text):
+    # After the first sentence end past the first 200 characters
+    at = text.find(". ", 200) + 2 if text.find(". ", 200) >= 0 else len(text) // 10
+    return text[:at] + EDIT + text[at:]
+
+
+def run_benchmark(megabytes=2):
+    documents = load_documents()
+    corpus = "\n\n".join(documents.values())
+    large = "\n\n".join(f"Copy {i}.\n{corpus}" for i in range(megabytes * 1024 * 1024 // len(corpus) + 1))
+
+    for name in CHUNKERS:
+        chunker = get_chunker(name)
+
+        start = time.perf_counter()
+        chunks = chunker.chunk(large)
+        elapsed = time.perf_counter() - start
+        tokens = [estimate_tokens(chunk) for chunk in chunks]
+
+        counts = []
+        kept = total = 0
+        for text in documents.values():
+            before = chunker.chunk(text)
+            after = chunker.chunk(insert_sentence(text))
+            counts.append(f"{len(before)}->{len(after)}")
+            kept += len(set(before) & set(after))
+            total += len(after)
+
+        print(f"{name:>13}: {len(chunks) / elapsed:9.0f} chunks/sec ({len(large) / elapsed / 2**20:5.1f} MB/s), "
+              f"tokens/chunk avg {sum(tokens) / len(tokens):4.0f} max {max(tokens):4d}; "
+              f"after an edit {kept}/{total} chunks unchanged, counts {' '.join(counts)}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Measure how concurrent chat queries overlap on a single event loop.
+
+The "blocking" path is the old one: requests-based search and generate
+called straight from a coroutine. The "async" path uses AsyncRAGEngine.
+
+Usage: python benchmarks/bench_concurrent_chat.py [sessions]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_ollama import MockOllama
+from rag_engine import AsyncRAGEngine
+
+
+async def blocking_session(engine, user_id, started):
+    docs = engine.search_documents("What is the leave policy?", user_id)
+    first_token = None
+    for line in engine.generate_response("What is the leave policy?", docs):
+        if line.strip() and json.loads(line).get("response") and first_token is None:
+            first_token = time.perf_counter() - started
+        # Mirror StreamingResponse handing each chunk back to the loop
+        await asyncio.sleep(0)
+    return first_token
+
+
+async def async_session(engine, user_id, started):
+    docs = await engine.asearch_documents("What is the leave policy?", user_id)
+    first_token = None
+    async for text in engine.agenerate_response("What is the leave policy?", docs):
+        if text and first_token is None:
+            first_token = time.perf_counter() - started
+    return first_token
+
+
+async def run_sessions(engine, session, count):
+    started = time.perf_counter()
+    ttfts = await asyncio.gather(*(session(engine, user_id, started) for user_id in range(count)))
+    return time.perf_counter() - started, sum(ttfts) / len(ttfts)
+
+
+async def run_benchmark(sessions):
+    os.chdir(tempfile.mkdtemp())
+    with MockOllama(parallel=sessions, prefill_latency=0.1, token_latency=0.02, response_tokens=25) as mock:
+        engine = AsyncRAGEngine()
+        engine.ollama_url = mock.url
+        print(f"{sessions} concurrent chat sessions, one event loop (single-session floor ~0.6s)\n")
+
+        for label, session in [("blocking requests", blocking_session), ("AsyncRAGEngine", async_session)]:
+            wall, ttft = await run_sessions(engine, session, sessions)
+            print(f"{label:<20} wall {wall:6.2f}s   mean time-to-first-token {ttft:6.2f}s")
+
+        await engine.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 8))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Prompt size and time to first token, top-3 concatenation vs the context assembler.
+
+Ingests the repository's Markdown docs with each chunk strategy, then asks
+a fixed set of questions through AsyncRAGEngine. A second scenario also
+uploads an older copy of the README under another name, as happens when a
+revised handbook is uploaded next to the old one. "top-3" reproduces the
+previous prompt (the three best chunks pasted in whole, overlaps and all);
+"assembled" merges neighbouring chunks, drops repeated sentences and packs
+to CONTEXT_TOKENS. The mock Ollama charges prefill time per prompt token,
+so TTFT follows prompt size. "chunks used" counts the retrieved chunks
+whose text made it into the prompt.
+
+Usage: python benchmarks/bench_context_assembly.py [context_tokens]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_ollama import MockOllama
+
+QUESTIONS = [
+    "How do I install the backend dependencies?",
+    "How do I create the first admin user?",
+    "Which Ollama models need to be pulled?",
+    "How are uploaded documents processed?",
+    "What environment variables tune ingestion?",
+    "How does authentication work?",
+    "What can the admin dashboard do?",
+    "How do I run the benchmarks?",
+    "What should I do if Ollama is not running?",
+    "How is chat history stored?",
+    "Which file types can be uploaded?",
+    "How do I start the frontend?",
+]
+# Roughly llama3 8B prefill on a laptop GPU
+PROMPT_TOKEN_LATENCY = 0.0005
+
+
+class TopThreeAssembler:
+    """The previous behaviour: the three best chunks as they are"""
+
+    def assemble(self, docs):
+        from chunking import estimate_tokens
+        return [
+            {"id": doc["id"], "filename": doc["metadata"]["filename"], "content": doc["content"],
+             "tokens": estimate_tokens(doc["content"])}
+            for doc in docs[:3]
+        ]
+
+
+async def run_mode(engine, assembler):
+    engine.generation_stats.__init__()
+    engine._context_assembler = assembler
+    chunks_used = []
+    for question in QUESTIONS:
+        docs = await engine.asearch_documents(question, 1)
+        passages = assembler.assemble(docs)
+        chunks_used.append(sum(len(passage["id"].split("+")) for passage in passages))
+        async for _ in engine.agenerate_response(question, docs, 1):
+            pass
+    return engine.generation_stats.stats(), statistics.mean(chunks_used)
+
+
+async def run_scenario(mock, uploads, strategy, context_tokens):
+    from context_assembler import ContextAssembler
+    from rag_engine import AsyncRAGEngine
+
+    os.chdir(tempfile.mkdtemp())
+    os.environ["CHUNK_STRATEGY"] = strategy
+    engine = AsyncRAGEngine()
+    engine.ollama_url = mock.url
+    for number, name in enumerate(uploads):
+        with open(os.path.join(ROOT, name), encoding="utf-8") as f:
+            engine.add_document(f.read(), f"{number}_{name}", 1)
+
+    for label, assembler in (("top-3", TopThreeAssembler()), ("assembled", ContextAssembler(context_tokens))):
+        stats, chunks_used = await run_mode(engine, assembler)
+        print(f"  {label:>9}: context {stats['avg_context_tokens']:.0f} tokens, "
+              f"prompt {stats['avg_prompt_tokens']:.0f} tokens, chunks used {chunks_used:.1f}, "
+              f"TTFT p50 {stats['ttft_p50_ms']:.0f} ms")
+    await engine.aclose()
+
+
+async def run(context_tokens):
+    documents = [name for name in ("README.md", "instructions.md") if os.path.exists(os.path.join(ROOT, name))]
+    scenarios = (("distinct documents", documents), ("with a re-uploaded copy", documents + ["README.md"]))
+    os.environ["ANSWER_CACHE_SIZE"] = "0"
+    with MockOllama(request_latency=0.0, item_latency=0.0, prefill_latency=0.02,
+                    prompt_token_latency=PROMPT_TOKEN_LATENCY, token_latency=0.0, response_tokens=5) as mock:
+        for scenario, uploads in scenarios:
+            for strategy in ("fixed-char", "sentence-pack"):
+                print(f"{scenario}, {strategy} chunks, {len(QUESTIONS)} questions:")
+                await run_scenario(mock, uploads, strategy, context_tokens)
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 768))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Database size and document list latency, inline text vs compressed blobs.
+
+Builds a database at schema version 6 where every document keeps its full
+extracted text in documents.content, times the list queries the documents
+pages use, then migrates it in place (text moved into document_blobs) and
+times them again, on a warm connection and on a fresh one. Those queries
+read created_at from idx_documents_user_created; a scan that has to read it
+from the rows (which stored it after the text) is timed too. Sizes are
+measured after VACUUM so freed pages don't count. Also reports what
+get_document_by_id costs when it does need the text.
+
+Usage: python benchmarks/bench_document_store.py [documents] [kib_per_document]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+USERS = 20
+WORDS = (
+    "employee policy leave annual sick overtime manager approval request days salary payroll benefits "
+    "health insurance pension contribution holiday schedule shift hours weekly notice period termination "
+    "contract probation review performance training safety equipment office remote travel expenses "
+    "reimbursement receipt department director team report quarterly budget compliance procedure"
+).split()
+
+
+def handbook_text(size, seed):
+    rng = random.Random(seed)
+    paragraphs = []
+    length = 0
+    while length < size:
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + f" (section {rng.randint(1, 400)})."
+            for _ in range(rng.randint(3, 7))
+        ]
+        paragraphs.append(" ".join(sentences))
+        length += len(paragraphs[-1]) + 1
+    return "\n".join(paragraphs)[:size]
+
+
+def time_call(func, repeat=20):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def vacuumed_size(db):
+    db._get_connection().execute("VACUUM")
+    db._get_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(db.db_path) / 2**20
+
+
+def row_scan(db):
+    with db._cursor() as cursor:
+        cursor.execute("SELECT id, filename, created_at FROM documents NOT INDEXED ORDER BY created_at DESC")
+        return cursor.fetchall()
+
+
+def cold(db, func):
+    # A new connection starts with an empty page cache
+    def call():
+        db.close()
+        func()
+    return call
+
+
+def list_timings(db):
+    return {
+        "get_all_documents": time_call(db.get_all_documents),
+        "get_all_documents (fresh connection)": time_call(cold(db, db.get_all_documents)),
+        "get_user_documents": time_call(lambda: db.get_user_documents(7)),
+        "row scan of created_at": time_call(lambda: row_scan(db)),
+        "row scan of created_at (fresh connection)": time_call(cold(db, lambda: row_scan(db)))
+    }
+
+
+def run_benchmark(documents=500, kib=200):
+    import database
+    from database import DatabaseManager
+
+    db = DatabaseManager(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    migrations = database.MIGRATIONS
+    database.MIGRATIONS = [migration for migration in migrations if migration[0] <= 5]
+    try:
+        db.init_database()
+    finally:
+        database.MIGRATIONS = migrations
+
+    with db._cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO users (id, username, password) VALUES (?, ?, 'x')",
+            ((u, f"user{u}") for u in range(1, USERS + 1))
+        )
+        cursor.executemany(
+            "INSERT INTO documents (user_id, filename, content, created_at) VALUES (?, ?, ?, datetime('2024-01-01', ?))",
+            ((d % USERS + 1, f"handbook-{d}.pdf", handbook_text(kib * 1024, d), f"+{d} minutes") for d in range(documents))
+        )
+
+    before_size = vacuumed_size(db)
+    before = list_timings(db)
+
+    start = time.perf_counter()
+    db.init_database()
+    migration = time.perf_counter() - start
+
+    after_size = vacuumed_size(db)
+    after = list_timings(db)
+    document_id = documents // 2 + 1
+    fetch_metadata = time_call(lambda: db.get_document_by_id(document_id, include_content=False))
+    fetch_text = time_call(lambda: db.get_document_by_id(document_id))
+    assert db.get_document_by_id(document_id)["content"] == handbook_text(kib * 1024, document_id - 1).strip()
+
+    with db._cursor() as cursor:
+        cursor.execute("SELECT codec, SUM(size), SUM(LENGTH(data)) FROM document_blobs GROUP BY codec")
+        codec, raw, stored = cursor.fetchone()
+
+    print(f"{documents} documents x {kib} KiB of text, {USERS} users")
+    print(f"  database size: {before_size:.1f} MiB inline -> {after_size:.1f} MiB with {codec} blobs "
+          f"(text {raw / 2**20:.1f} MiB -> {stored / 2**20:.1f} MiB)")
+    for name in before:
+        print(f"  {name}: {before[name]:.2f} ms -> {after[name]:.2f} ms")
+    print(f"  get_document_by_id: {fetch_metadata:.3f} ms without text, {fetch_text:.2f} ms with text")
+    print(f"  migration: {migration:.1f}s")
+    db.close()
+
+
+if __name__ == "__main__":
+    run_benchmark(*(int(arg) for arg in sys.argv[1:3]))
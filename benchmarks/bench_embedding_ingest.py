@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Compare serial vs batched/concurrent chunk embedding against a mock Ollama.
+
+Usage: python benchmarks/bench_embedding_ingest.py [num_chunks]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_ollama import MockOllama
+from rag_engine import RAGEngine
+
+
+def make_chunks(count):
+    sentence = "Employees must submit leave request form {n} to their manager before the deadline. "
+    return [(sentence.format(n=i) * 12).strip() for i in range(count)]
+
+
+def make_engine(url, batch_size, concurrency):
+    os.environ["EMBED_BATCH_SIZE"] = str(batch_size)
+    os.environ["EMBED_CONCURRENCY"] = str(concurrency)
+    engine = RAGEngine()
+    engine.ollama_url = url
+    return engine
+
+
+def run_benchmark(num_chunks=300):
+    # RAGEngine opens ./chroma_db, keep it out of the working tree
+    os.chdir(tempfile.mkdtemp())
+    chunks = make_chunks(num_chunks)
+    print(f"Embedding {num_chunks} chunks against mock Ollama (20ms/request, 2ms/chunk, 4 parallel slots)\n")
+
+    with MockOllama() as mock:
+        engine = make_engine(mock.url, 1, 1)
+        start = time.perf_counter()
+        for chunk in chunks:
+            engine._get_embedding(chunk)
+        baseline = num_chunks / (time.perf_counter() - start)
+        print(f"{'serial /api/embeddings':<32} {baseline:8.1f} chunks/sec")
+
+        for batch_size, concurrency in [(32, 1), (16, 2), (16, 4), (8, 8)]:
+            engine = make_engine(mock.url, batch_size, concurrency)
+            start = time.perf_counter()
+            embeddings = engine._get_embeddings(chunks)
+            rate = num_chunks / (time.perf_counter() - start)
+            assert len(embeddings) == num_chunks
+            label = f"batch={batch_size} concurrency={concurrency}"
+            print(f"{label:<32} {rate:8.1f} chunks/sec  ({rate / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
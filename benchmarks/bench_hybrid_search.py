@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Hit rate and latency of vector-only vs hybrid (BM25 + vector) retrieval.
+
+A synthetic policy handbook is ingested through RAGEngine: every chunk
+describes one policy, identified by a code like POL-2023-04417, in mostly
+shared boilerplate. "code" queries ask about a policy by its code, the
+keyword-heavy case dense retrieval handles poorly; "descriptive" queries
+reuse a policy's distinctive wording without the code. A query is a hit
+when its policy's chunk is in the top 5. Also reports how long the keyword
+index takes to build from an existing vector store and to update on a
+re-upload.
+
+Usage: python benchmarks/bench_hybrid_search.py [policies]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TOP_K = 5
+POLICIES_PER_FILE = 50
+TOPICS = ["travel", "equipment", "overtime", "relocation", "training", "parental leave", "remote work", "expenses"]
+WORDS = ["harbor", "granite", "lantern", "meadow", "cobalt", "willow", "saffron", "quartz", "falcon", "juniper",
+         "ember", "glacier", "orchid", "summit", "tundra", "velvet", "canyon", "marble", "prairie", "zephyr"]
+
+
+def make_policies(count, rng):
+    policies = []
+    for n in range(count):
+        code = f"POL-{rng.randint(2015, 2024)}-{n:05d}"
+        topic = rng.choice(TOPICS)
+        distinctive = rng.sample(WORDS, 3)
+        text = (
+            f"Policy {code} governs {topic} claims for staff in the {distinctive[0]} and {distinctive[1]} offices. "
+            f"Requests under this policy need approval from a line manager before any cost is incurred. "
+            f"Claims over the limit need sign-off from finance, and receipts must be kept for six years. "
+            f"The {distinctive[2]} programme is covered by the same rules as the rest of the {topic} budget."
+        )
+        policies.append((code, topic, distinctive, text))
+    return policies
+
+
+def measure(engine, queries):
+    hits = 0
+    latencies = []
+    for query, expected_id in queries:
+        start = time.perf_counter()
+        results = engine.search_documents(query, 1, TOP_K)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += any(result.get("id") == expected_id for result in results)
+    latencies.sort()
+    return hits / len(queries), statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+def run_benchmark(policy_count=2000):
+    from mock_ollama import MockOllama
+    from rag_engine import RAGEngine
+
+    os.chdir(tempfile.mkdtemp())
+    rng = random.Random(0)
+    policies = make_policies(policy_count, rng)
+    chunk_ids = {}
+
+    with MockOllama(request_latency=0.0, item_latency=0.0, parallel=16) as mock:
+        engine = RAGEngine()
+        engine.ollama_url = mock.url
+        start = time.perf_counter()
+        for first in range(0, policy_count, POLICIES_PER_FILE):
+            filename = f"handbook_{first // POLICIES_PER_FILE}.pdf"
+            group = policies[first:first + POLICIES_PER_FILE]
+            engine.add_chunks([text for _, _, _, text in group], filename, 1)
+            for i, (code, _, _, _) in enumerate(group):
+                chunk_ids[code] = f"{filename}_1_{i}"
+        print(f"{policy_count} policy chunks ingested with the keyword index in {time.perf_counter() - start:.1f}s")
+
+        sample = rng.sample(policies, 200)
+        query_sets = {
+            "code": [(f"What are the approval rules in {code}?", chunk_ids[code]) for code, _, _, _ in sample],
+            "descriptive": [
+                (f"{topic} rules for the {distinctive[0]} and {distinctive[1]} offices and the {distinctive[2]} programme",
+                 chunk_ids[code])
+                for code, topic, distinctive, _ in sample
+            ],
+        }
+
+        for name, queries in query_sets.items():
+            for mode in ("vector", "hybrid"):
+                engine.search_mode = mode
+                engine.query_cache.clear()
+                hit_rate, p50, p95 = measure(engine, queries)
+                print(f"{name:>11} queries, {mode:>6}: hit@{TOP_K} {hit_rate:.2f}, search p50 {p50:.2f} ms p95 {p95:.2f} ms")
+
+        engine.search_mode = "hybrid"
+        keyword_latencies = []
+        for query, _ in query_sets["code"]:
+            start = time.perf_counter()
+            engine.keyword_index.search(query, 1, engine.hybrid_candidates)
+            keyword_latencies.append((time.perf_counter() - start) * 1000)
+        print(f"BM25 lookup alone: p50 {statistics.median(keyword_latencies):.2f} ms")
+
+        # Re-upload one file with a single policy changed
+        filename = "handbook_0.pdf"
+        group = [text for _, _, _, text in policies[:POLICIES_PER_FILE]]
+        group[0] = group[0].replace("six years", "seven years")
+        start = time.perf_counter()
+        engine.keyword_index.upsert(
+            [f"{filename}_1_{i}" for i in range(len(group))],
+            group,
+            [{"filename": filename, "user_id": 1, "chunk_index": i, "content_hash": str(hash(text))} for i, text in enumerate(group)]
+        )
+        print(f"Re-indexing a {POLICIES_PER_FILE}-chunk file: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        # A deployment switching hybrid search on indexes the existing chunks once
+        os.environ["KEYWORD_INDEX_PATH"] = "./rebuilt_index.db"
+        rebuilt = RAGEngine()
+        start = time.perf_counter()
+        rebuilt.keyword_index
+        print(f"Building the index from the vector store: {time.perf_counter() - start:.2f}s "
+              f"({rebuilt.keyword_index.stats()['postings']} postings)")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
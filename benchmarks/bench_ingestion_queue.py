@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Documents/sec through IngestionQueue for different worker counts.
+
+Usage: python benchmarks/bench_ingestion_queue.py [documents]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from docx import Document
+
+from mock_ollama import MockOllama
+from database import DatabaseManager
+from document_processor import DocumentProcessor
+from ingestion import IngestionQueue, DONE, FAILED
+from rag_engine import RAGEngine
+
+
+def make_docx(path, tag):
+    doc = Document()
+    for p in range(40):
+        doc.add_paragraph(f"Document {tag} paragraph {p}: expense claims above the limit need director approval. " * 4)
+    doc.save(path)
+
+
+def run_benchmark(documents=24):
+    os.chdir(tempfile.mkdtemp())
+    # One embedding batch in flight per document, so the worker count is what varies
+    os.environ["EMBED_CONCURRENCY"] = "1"
+    os.environ["EMBED_BATCH_SIZE"] = "8"
+    processor = DocumentProcessor()
+
+    with MockOllama(parallel=16, request_latency=0.05, item_latency=0.005) as mock:
+        for workers in (1, 2, 4, 8):
+            db = DatabaseManager(f"bench_{workers}.db")
+            db.init_database()
+            engine = RAGEngine()
+            engine.ollama_url = mock.url
+            engine.ingest_workers = workers
+            queue = IngestionQueue(db, engine, processor, workers=workers)
+            queue.start()
+
+            # Distinct content per document and run, so no chunk embedding is reused
+            paths = []
+            for n in range(documents):
+                paths.append(os.path.abspath(f"upload_{workers}_{n}.docx"))
+                make_docx(paths[-1], f"{workers}-{n}")
+
+            start = time.perf_counter()
+            job_ids = [queue.submit(1, os.path.basename(path), path) for path in paths]
+
+            pending = set(job_ids)
+            while pending:
+                pending = {j for j in pending if db.get_ingestion_job(j)["status"] not in (DONE, FAILED)}
+                time.sleep(0.01)
+            elapsed = time.perf_counter() - start
+            queue.shutdown(wait=True)
+
+            print(f"{workers} worker(s): {documents / elapsed:6.2f} documents/sec")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 24)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Login throughput and chat-stream stalls during a login storm.
+
+Drives /api/auth/login through the FastAPI app in-process (httpx's ASGI
+transport) from many concurrent clients, while a simulated chat stream on
+the same event loop emits a token every 10 ms. The stream's lateness per
+token is the event-loop lag a real streaming chat would see. "inline" is
+the previous behaviour (bcrypt called straight from the endpoint);
+"pool" runs it on the size-capped hashing pool, which answers 503 when
+saturated (clients back off 50 ms and retry).
+
+Usage: python benchmarks/bench_login_storm.py [clients] [seconds]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND)
+
+TOKEN_INTERVAL = 0.01
+PASSWORD = "correct horse battery"
+
+
+async def chat_stream(stop):
+    """Emit a token every TOKEN_INTERVAL until stop is set; return per-token lateness in ms"""
+    lateness = []
+    expected = time.perf_counter() + TOKEN_INTERVAL
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, expected - time.perf_counter()))
+        now = time.perf_counter()
+        lateness.append((now - expected) * 1000)
+        expected = max(expected + TOKEN_INTERVAL, now)
+    return lateness
+
+
+async def login_client(client, deadline, counts):
+    while time.perf_counter() < deadline:
+        response = await client.post("/api/auth/login", data={"username": "storm", "password": PASSWORD})
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+        if response.status_code == 503:
+            await asyncio.sleep(0.05)
+
+
+async def run_storm(app, clients, seconds):
+    import httpx
+
+    stop = asyncio.Event()
+    stream = asyncio.create_task(chat_stream(stop))
+    counts = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(login_client(client, start + seconds, counts) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+    stop.set()
+    lateness = sorted(await stream)
+    return counts, elapsed, lateness
+
+
+def inline_verify(auth_handler):
+    """The previous login path: bcrypt on the event loop thread"""
+    async def averify_password(plain_password, hashed_password):
+        return auth_handler.verify_and_update_password(plain_password, hashed_password)
+    return averify_password
+
+
+async def run(clients, seconds):
+    os.chdir(tempfile.mkdtemp())
+    import main
+
+    main.db_manager.init_database()
+    auth_handler = main.auth_handler
+    pool_verify = auth_handler.averify_password
+    print(f"{clients} clients for {seconds:.0f}s per run, {os.cpu_count()} CPU(s); "
+          f"stream lateness per 10 ms token (event-loop lag)")
+
+    for rounds in (10, 12):
+        auth_handler.bcrypt_rounds = rounds
+        auth_handler._pwd_context = None
+        user = main.db_manager.get_user_by_username("storm")
+        hashed_password = auth_handler.get_password_hash(PASSWORD)
+        if user:
+            main.db_manager.update_user_password(user["id"], hashed_password)
+        else:
+            main.db_manager.create_user("storm", hashed_password)
+
+        for mode in ("inline", "pool"):
+            auth_handler.averify_password = inline_verify(auth_handler) if mode == "inline" else pool_verify
+            counts, elapsed, lateness = await run_storm(main.app, clients, seconds)
+            print(f"rounds {rounds}, {mode:>6}: {counts.get(200, 0) / elapsed:6.1f} logins/s, "
+                  f"{counts.get(503, 0)} busy (503), "
+                  f"stream lag p50 {statistics.median(lateness):.1f} ms, "
+                  f"p99 {lateness[int(len(lateness) * 0.99)]:.1f} ms, max {lateness[-1]:.1f} ms")
+
+    auth_handler.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 32,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    ))
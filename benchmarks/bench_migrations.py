@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Query latency on a large chat history before and after the index migration.
+
+Builds an unmigrated database (base tables only), times the hot
+DatabaseManager queries, upgrades it in place with init_database() and
+times them again.
+
+Usage: python benchmarks/bench_migrations.py [messages]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from database import DatabaseManager
+
+USERS = 2000
+CHATS_PER_USER = 10
+
+
+def populate(db, messages):
+    chats = USERS * CHATS_PER_USER
+    with db._cursor() as cursor:
+        db._create_tables(cursor)
+        cursor.executemany(
+            "INSERT INTO users (id, username, password) VALUES (?, ?, 'x')",
+            ((u, f"user{u}") for u in range(1, USERS + 1))
+        )
+        cursor.executemany(
+            "INSERT INTO chats (id, user_id, title, created_at) VALUES (?, ?, ?, datetime('2024-01-01', ?))",
+            ((f"chat-{c}", c % USERS + 1, f"Chat {c}", f"+{c} minutes") for c in range(chats))
+        )
+        cursor.executemany(
+            "INSERT INTO messages (chat_id, role, content, timestamp) VALUES (?, ?, ?, datetime('2024-01-01', ?))",
+            ((f"chat-{m % chats}", "user", "What does the policy say about overtime?", f"+{m} seconds")
+             for m in range(messages))
+        )
+        cursor.executemany(
+            "INSERT INTO documents (user_id, filename, content) VALUES (?, ?, 'text')",
+            ((u, f"handbook-{u}.pdf") for u in range(1, USERS + 1))
+        )
+
+
+def time_queries(db, delete_offset, repeat=50):
+    timings = {}
+
+    start = time.perf_counter()
+    for i in range(repeat):
+        db.get_user_chats(i + 1)
+    timings["get_user_chats"] = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for i in range(repeat):
+        db.get_chat_messages(f"chat-{i}", i % USERS + 1)
+    timings["get_chat_messages"] = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for i in range(repeat):
+        db.get_user_documents(i + 1)
+    timings["get_user_documents"] = (time.perf_counter() - start) / repeat
+
+    # Each run deletes a different set of users so the work stays comparable
+    start = time.perf_counter()
+    for i in range(5):
+        db.delete_user_chats(USERS - delete_offset - i)
+    timings["delete_user_chats"] = (time.perf_counter() - start) / 5
+
+    return timings
+
+
+def explain(db, sql, params):
+    with db._cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return "; ".join(row[3] for row in cursor.fetchall())
+
+
+def run_benchmark(messages=1_000_000):
+    db = DatabaseManager(os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+    start = time.perf_counter()
+    populate(db, messages)
+    print(f"Populated {messages:,} messages in {USERS * CHATS_PER_USER:,} chats ({time.perf_counter() - start:.1f}s)\n")
+
+    plan_sql = "SELECT m.role FROM messages m JOIN chats c ON m.chat_id = c.id WHERE c.id = ? AND c.user_id = ? ORDER BY m.timestamp"
+    before_plan = explain(db, plan_sql, ("chat-1", 2))
+    before = time_queries(db, delete_offset=0)
+
+    start = time.perf_counter()
+    db.init_database()
+    print(f"Migrated to schema version {db.get_schema_version()} in {time.perf_counter() - start:.1f}s\n")
+
+    after_plan = explain(db, plan_sql, ("chat-1", 2))
+    after = time_queries(db, delete_offset=5)
+
+    print(f"{'query':<20} {'before':>12} {'after':>12}")
+    for name in before:
+        print(f"{name:<20} {before[name] * 1000:10.2f}ms {after[name] * 1000:10.2f}ms  ({before[name] / after[name]:.0f}x)")
+    print(f"\nget_chat_messages plan before: {before_plan}")
+    print(f"get_chat_messages plan after:  {after_plan}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
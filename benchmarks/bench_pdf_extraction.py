@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Serial vs process-pool PDF text extraction on a generated 500-page PDF.
+
+Usage: python benchmarks/bench_pdf_extraction.py [pages]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from document_processor import DocumentProcessor
+
+
+def write_pdf(path, pages, lines_per_page=45):
+    """Write a plain-text PDF with Helvetica text on every page"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for p in range(pages):
+        lines = [
+            f"Page {p + 1} line {n + 1}: claims must be filed within thirty days of the expense date."
+            for n in range(lines_per_page)
+        ]
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        stream = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def run_benchmark(pages=500):
+    path = os.path.join(tempfile.mkdtemp(), "large.pdf")
+    write_pdf(path, pages)
+    cores = os.cpu_count() or 1
+    print(f"{pages}-page PDF, {cores} CPU core(s) available\n")
+
+    processor = DocumentProcessor()
+    start = time.perf_counter()
+    serial_text = processor.extract_text(path)
+    serial = time.perf_counter() - start
+    print(f"{'serial':<12} {serial:6.2f}s  {pages / serial:6.1f} pages/sec")
+
+    workers = 2
+    while workers <= max(2, cores):
+        # Warm the pool first so process start-up isn't counted
+        processor.extract_text(path, parallel=True, max_workers=workers)
+        start = time.perf_counter()
+        text = processor.extract_text(path, parallel=True, max_workers=workers)
+        elapsed = time.perf_counter() - start
+        assert text == serial_text, "parallel extraction must match serial output"
+        print(f"{f'{workers} workers':<12} {elapsed:6.2f}s  {pages / elapsed:6.1f} pages/sec  ({serial / elapsed:.1f}x)")
+        workers *= 2
+
+    processor.close()
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Query-embedding latency for an FAQ-style workload, with and without the cache.
+
+Replays a skewed stream of repeated questions through RAGEngine._embed_query,
+then restarts the engine to show the on-disk store serving warm hits.
+
+Usage: python benchmarks/bench_query_cache.py [queries]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_ollama import MockOllama
+from rag_engine import RAGEngine
+
+FAQ = [f"How do I {verb} my {noun}?" for verb in ("reset", "update", "cancel", "renew", "find")
+       for noun in ("password", "leave request", "payslip", "badge", "laptop", "pension", "contract", "schedule")]
+
+
+def workload(count):
+    rng = random.Random(7)
+    # Zipf-like popularity: a handful of questions dominate
+    weights = [1 / (rank + 1) for rank in range(len(FAQ))]
+    queries = rng.choices(FAQ, weights=weights, k=count)
+    # Users type the same question with different spacing and casing
+    return [q.upper() if i % 5 == 0 else f"  {q} " if i % 7 == 0 else q for i, q in enumerate(queries)]
+
+
+def replay(engine, queries):
+    start = time.perf_counter()
+    for query in queries:
+        engine._embed_query(query)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def run_benchmark(count=1000):
+    os.chdir(tempfile.mkdtemp())
+    queries = workload(count)
+
+    with MockOllama() as mock:
+        os.environ["QUERY_EMBED_CACHE_SIZE"] = "0"
+        os.environ["QUERY_EMBED_CACHE_PATH"] = ""
+        engine = RAGEngine()
+        engine.ollama_url = mock.url
+        uncached = replay(engine, queries)
+        print(f"{'no cache':<24} {uncached:7.2f}ms/query  {mock.request_count} embedding requests")
+
+        os.environ["QUERY_EMBED_CACHE_SIZE"] = "256"
+        os.environ["QUERY_EMBED_CACHE_PATH"] = "query_cache.db"
+        for label in ("LRU cache (cold)", "after restart (disk)"):
+            mock.request_count = 0
+            engine = RAGEngine()
+            engine.ollama_url = mock.url
+            cached = replay(engine, queries)
+            stats = engine.query_cache.stats()
+            print(f"{label:<24} {cached:7.2f}ms/query  {mock.request_count} embedding requests  "
+                  f"hit rate {stats['hit_rate']:.1%} (memory {stats['hits']}, disk {stats['disk_hits']}, miss {stats['misses']})")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Chunks and tokens put into the prompt, with and without the rerank stage.
+
+Ingests the synthetic policy handbook from bench_hybrid_search and asks
+about single policies, by code and by their distinctive wording, so each
+query has exactly one relevant chunk, and about a topic in one office,
+which several policies may answer. Without reranking the top 5 fused
+results all go to the context assembler; with it, 20 candidates are
+re-scored and those below the cutoff are dropped. "hit" means a
+relevant chunk reached the prompt, "precision" is the share of prompt
+chunks that are relevant. The rerank stage's own time is reported
+separately from the whole search.
+
+Usage: python benchmarks/bench_rerank.py [policies]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_hybrid_search import POLICIES_PER_FILE, make_policies
+
+TOP_K = 5
+
+
+def measure(engine, queries):
+    hits = 0
+    precision = []
+    chunks = []
+    tokens = []
+    latencies = []
+    for query, relevant in queries:
+        start = time.perf_counter()
+        results = engine.search_documents(query, 1, TOP_K)
+        latencies.append((time.perf_counter() - start) * 1000)
+        passages = engine.context_assembler.assemble(results)
+        used = [chunk_id for passage in passages for chunk_id in passage["id"].split("+")]
+        matching = sum(chunk_id in relevant for chunk_id in used)
+        hits += matching > 0
+        precision.append(matching / len(used) if used else 0.0)
+        chunks.append(len(used))
+        tokens.append(sum(passage["tokens"] for passage in passages))
+    return {
+        "hit": hits / len(queries),
+        "precision": statistics.mean(precision),
+        "chunks": statistics.mean(chunks),
+        "tokens": statistics.mean(tokens),
+        "search_p50": statistics.median(latencies),
+    }
+
+
+def run_benchmark(policy_count=1000):
+    from mock_ollama import MockOllama
+    from rag_engine import RAGEngine
+
+    os.chdir(tempfile.mkdtemp())
+    rng = random.Random(0)
+    policies = make_policies(policy_count, rng)
+    chunk_ids = {}
+
+    with MockOllama(request_latency=0.0, item_latency=0.0, parallel=16) as mock:
+        engine = RAGEngine()
+        engine.ollama_url = mock.url
+        for first in range(0, policy_count, POLICIES_PER_FILE):
+            filename = f"handbook_{first // POLICIES_PER_FILE}.pdf"
+            group = policies[first:first + POLICIES_PER_FILE]
+            engine.add_chunks([text for _, _, _, text in group], filename, 1)
+            for i, (code, _, _, _) in enumerate(group):
+                chunk_ids[code] = f"{filename}_1_{i}"
+
+        sample = rng.sample(policies, 200)
+        query_sets = {
+            "code": [(f"What are the approval rules in {code}?", {chunk_ids[code]}) for code, _, _, _ in sample],
+            "descriptive": [
+                (f"{topic} rules for the {distinctive[0]} and {distinctive[1]} offices and the {distinctive[2]} programme",
+                 {chunk_ids[code]})
+                for code, topic, distinctive, _ in sample
+            ],
+            "broad": [
+                (f"How are {topic} claims handled in the {distinctive[0]} office?",
+                 {chunk_ids[other] for other, other_topic, other_words, _ in policies
+                  if other_topic == topic and distinctive[0] in other_words})
+                for code, topic, distinctive, _ in sample
+            ],
+        }
+
+        print(f"{policy_count} policy chunks, top {TOP_K}:")
+        for name, queries in query_sets.items():
+            for label, candidates in (("no rerank", 0), ("rerank 20", 20)):
+                engine.rerank_candidates = candidates
+                engine.reranker.__init__()
+                engine.query_cache.clear()
+                result = measure(engine, queries)
+                line = (f"{name:>11}, {label}: hit {result['hit']:.2f}, precision {result['precision']:.2f}, "
+                        f"{result['chunks']:.1f} chunks / {result['tokens']:.0f} tokens in prompt, "
+                        f"search p50 {result['search_p50']:.2f} ms")
+                if candidates:
+                    stats = engine.reranker.stats()
+                    line += f" (rerank p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms)"
+                print(line)
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Messages/sec through DatabaseManager.save_message vs a connection per call.
+
+Usage: python benchmarks/bench_save_message.py [messages] [threads]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from database import DatabaseManager
+
+
+def save_message_per_connection(db_path, chat_id, role, content):
+    """The pre-pooling implementation: open, insert, commit, close"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO messages (chat_id, role, content) VALUES (?, ?, ?)",
+        (chat_id, role, content)
+    )
+    conn.commit()
+    conn.close()
+
+
+def timed(save, messages, threads):
+    content = "How many vacation days do new employees get in their first year? " * 4
+    per_thread = messages // threads
+
+    def worker(n):
+        for i in range(per_thread):
+            save(f"chat-{n}", "user" if i % 2 else "assistant", content)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, range(threads)))
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def run_benchmark(messages=5000, threads=4):
+    workdir = tempfile.mkdtemp()
+
+    legacy_path = os.path.join(workdir, "legacy.db")
+    legacy_manager = DatabaseManager(legacy_path)
+    legacy_manager.init_database()
+    legacy_manager.close()
+    # Legacy databases stayed in rollback-journal mode
+    conn = sqlite3.connect(legacy_path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.close()
+
+    pooled = DatabaseManager(os.path.join(workdir, "pooled.db"))
+    pooled.init_database()
+
+    print(f"Saving {messages} messages\n")
+    for label, thread_count in [("1 thread", 1), (f"{threads} threads", threads)]:
+        legacy = timed(lambda *args: save_message_per_connection(legacy_path, *args), messages, thread_count)
+        current = timed(pooled.save_message, messages, thread_count)
+        print(f"{label:<10} connect-per-call {legacy:9.0f} msg/s   persistent WAL {current:9.0f} msg/s   ({current / legacy:.1f}x)")
+
+
+if __name__ == "__main__":
+    run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    )
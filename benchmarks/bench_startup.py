@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Cold start of the API process: time to import backend/main.py and peak RSS.
+
+Each run is a fresh interpreter in a fresh working directory (so ChromaDB
+and SQLite start empty), importing main the way uvicorn does.
+
+Usage: python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def run_benchmark(runs=5):
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE, os.path.abspath(BACKEND)],
+            cwd=tempfile.mkdtemp(), check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    seconds = [r["seconds"] for r in results]
+    rss = [r["rss_mib"] for r in results]
+    print(f"import main: median {statistics.median(seconds):.2f}s (min {min(seconds):.2f}s), "
+          f"peak RSS median {statistics.median(rss):.0f} MiB over {runs} runs")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
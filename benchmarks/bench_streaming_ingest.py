@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Peak memory of ingesting one large PDF, whole-text vs streamed.
+
+"whole" reproduces the previous pipeline (extract everything, store it as
+one documents.content value, chunk and embed the full list); "stream" runs
+IngestionQueue, which extracts pages on the process pool
+(iter_text(parallel=True), as uploads do), compresses and chunks them as
+they arrive and embeds a batch at a time. The PDF is generated with
+distinct text on every page, so no chunk embedding is reused. Each mode runs
+in a fresh process so peak RSS is comparable; it is the server process's
+peak, the extraction workers are separate processes. Whole-text mode fails
+outright once a document has more than 5461 chunks, the limit of a single
+Chroma upsert.
+
+Usage: python benchmarks/bench_streaming_ingest.py [pages]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Enough workers for the process-pool path even on a single-core machine
+PDF_WORKERS = 2
+
+
+def peak_rss_mib():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode, pdf_path, ollama_url):
+    from database import DatabaseManager
+    from document_processor import DocumentProcessor
+    from ingestion import IngestionQueue
+    from rag_engine import RAGEngine
+
+    os.chdir(tempfile.mkdtemp())
+    db = DatabaseManager("bench.db")
+    db.init_database()
+    engine = RAGEngine()
+    engine.ollama_url = ollama_url
+    processor = DocumentProcessor()
+    processor.pdf_workers = PDF_WORKERS
+    baseline = peak_rss_mib()
+
+    start = time.perf_counter()
+    if mode == "whole":
+        # One batch for the whole document, as before streaming
+        engine.ingest_batch_size = sys.maxsize
+        text = processor.extract_text(pdf_path)
+        db.save_document(1, "upload.pdf", text)
+        chunks = engine.add_document(text, "upload.pdf", 1)["chunks"]
+    else:
+        # The queue removes its file when done, so it gets a copy
+        upload = os.path.abspath("upload.pdf")
+        with open(pdf_path, "rb") as source, open(upload, "wb") as target:
+            target.write(source.read())
+        queue = IngestionQueue(db, engine, processor, workers=1)
+        job_id = queue.submit(1, "upload.pdf", upload)
+        queue.shutdown(wait=True)
+        job = db.get_ingestion_job(job_id)
+        assert job["status"] == "done", job
+        chunks = job["chunks_done"]
+    elapsed = time.perf_counter() - start
+    processor.close()
+
+    print(json.dumps({
+        "chunks": chunks,
+        "seconds": elapsed,
+        "baseline_mib": baseline,
+        "peak_mib": peak_rss_mib()
+    }))
+
+
+def run_benchmark(pages=300):
+    from bench_pdf_extraction import write_pdf
+    from mock_ollama import MockOllama
+
+    pdf_path = os.path.join(tempfile.mkdtemp(), "large.pdf")
+    write_pdf(pdf_path, pages)
+    print(f"{pages}-page PDF ({os.path.getsize(pdf_path) / 2**20:.1f} MiB), {PDF_WORKERS} extraction workers")
+
+    with MockOllama(parallel=16, request_latency=0.001, item_latency=0.0) as mock:
+        for mode in ("whole", "stream"):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", mode, pdf_path, mock.url],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>6}: {result['chunks']} chunks in {result['seconds']:.1f}s, "
+                  f"peak RSS {result['peak_mib']:.0f} MiB (+{result['peak_mib'] - result['baseline_mib']:.0f} MiB over start-up)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--mode":
+        run_mode(sys.argv[2], sys.argv[3], sys.argv[4])
+    else:
+        run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Server peak RSS during concurrent uploads, whole-file read vs chunked copy.
+
+Starts the FastAPI app under uvicorn in a subprocess and posts a batch of
+concurrent ~9 MB uploads to /api/documents/upload, then reads the server's
+peak RSS (VmHWM) against its peak after a small warm-up upload. "whole" is
+the previous copy (the entire upload read into memory, then written);
+"chunked" is save_upload. Ingestion is not run: submitted jobs just drop
+their file. Also checks the 10 MB limit and that a repeated upload
+reuses its job.
+
+Usage: python benchmarks/bench_upload.py [uploads] [mib_per_upload]
+"""
+import asyncio
+import hashlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND)
+
+
+def whole_copy(source, file_path, max_bytes, chunk_size=None):
+    """The previous upload path: read it all, then write it"""
+    content = source.read()
+    with open(file_path, "wb") as buffer:
+        buffer.write(content)
+    return hashlib.sha256(content).hexdigest()
+
+
+def serve(mode, port):
+    os.chdir(tempfile.mkdtemp())
+    import uvicorn
+    import main
+
+    main.db_manager.init_database()
+    main.db_manager.create_user("bench", "x")
+    if mode == "whole":
+        main.save_upload = whole_copy
+    submitted = {}
+
+    def submit(user_id, filename, file_path, source_hash=None):
+        os.remove(file_path)
+        job_id = f"job-{len(submitted)}"
+        submitted[job_id] = source_hash
+        return job_id
+
+    main.ingestion_queue.submit = submit
+    main.ingestion_queue.find_duplicate = lambda user_id, filename, source_hash: (
+        next(({"id": job_id, "status": "done"} for job_id, seen in submitted.items() if seen == source_hash), None)
+    )
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def peak_rss_mib(pid):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def upload(client, token, name, data):
+    return await client.post(
+        "/api/documents/upload",
+        headers={"Authorization": f"Bearer {token}"},
+        files={"file": (name, data, "application/pdf")}
+    )
+
+
+async def run_mode(mode, uploads, mib):
+    import httpx
+    from auth import AuthHandler
+
+    port = free_port()
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", mode, str(port)])
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+            for _ in range(300):
+                try:
+                    await client.get("/docs")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            token = AuthHandler().create_token(1, "bench")
+
+            response = await upload(client, token, "warmup.pdf", b"%PDF-1.4 warm-up")
+            assert response.status_code == 200, response.text
+            baseline = peak_rss_mib(server.pid)
+
+            payloads = [os.urandom(mib * 2**20) for _ in range(uploads)]
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(upload(client, token, f"upload-{i}.pdf", data) for i, data in enumerate(payloads)))
+            elapsed = time.perf_counter() - start
+            assert all(response.status_code == 200 for response in responses), [r.text for r in responses]
+            peak = peak_rss_mib(server.pid)
+
+            too_large = await upload(client, token, "large.pdf", os.urandom(11 * 2**20))
+            repeated = await upload(client, token, "upload-0.pdf", payloads[0])
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"{mode:>7}: {uploads} x {mib} MiB in {elapsed:.2f}s, peak RSS +{peak - baseline:.0f} MiB over warm-up "
+          f"({peak:.0f} MiB); 11 MiB upload -> {too_large.status_code}; "
+          f"repeat -> {repeated.json()['message']!r} ({repeated.json()['job_id']})")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        serve(sys.argv[2], int(sys.argv[3]))
+    else:
+        uploads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+        mib = int(sys.argv[2]) if len(sys.argv) > 2 else 9
+        for mode in ("whole", "chunked"):
+            asyncio.run(run_mode(mode, uploads, mib))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Query latency for one user as the global corpus grows, shared vs per-user collections.
+
+One user owns a fixed number of chunks; other users' chunks fill the rest
+of the store. Each size is first measured with the shared collection
+(VECTOR_PARTITION=none), then migrated with migrate_vector_partitions and
+measured with per-user collections. Recall@5 is against exact search over
+the user's own vectors.
+
+Usage: python benchmarks/bench_vector_partitions.py [user_chunks] [total_chunks ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from bench_vector_store import DIMENSIONS, QUERY_NOISE, TOP_K, fill, make_corpus, measure
+from migrate_vector_partitions import migrate_partitions
+from rag_engine import ChromaVectorStore
+
+QUERIES = 100
+OTHER_USER_CHUNKS = 2000
+
+
+def run_benchmark(user_chunks=1000, totals=(5000, 25000)):
+    rng = np.random.default_rng(0)
+    mine = make_corpus(rng, user_chunks)
+    queries = []
+    for _ in range(QUERIES):
+        noise = rng.standard_normal(DIMENSIONS).astype(np.float32) * (QUERY_NOISE / np.sqrt(DIMENSIONS))
+        query = mine[rng.integers(0, len(mine))] + noise
+        expected = set(np.argsort(-(mine @ (query / np.linalg.norm(query))))[:TOP_K].tolist())
+        queries.append((1, query, expected))
+
+    print(f"user 1 has {user_chunks} chunks, {QUERIES} queries, top {TOP_K}")
+    for total in totals:
+        # Chroma shares clients by path, so each size needs its own absolute path
+        path = os.path.join(tempfile.mkdtemp(), "chroma_db")
+        others = total - user_chunks
+        corpora = {1: mine}
+        for user_id in range(2, 2 + (others + OTHER_USER_CHUNKS - 1) // OTHER_USER_CHUNKS):
+            corpora[user_id] = make_corpus(rng, min(OTHER_USER_CHUNKS, others - (user_id - 2) * OTHER_USER_CHUNKS))
+
+        fill(ChromaVectorStore(path), corpora)
+        for mode in ("none", "user"):
+            if mode == "user":
+                start = time.perf_counter()
+                migrate_partitions("none", "user", path, drop_source=True)
+                migrated = time.perf_counter() - start
+            store = ChromaVectorStore(path, partition=mode)
+            measure(store, corpora, queries[:10])
+            recall, p50, p95 = measure(store, corpora, queries)
+            note = f", migrated in {migrated:.1f}s" if mode == "user" else ""
+            print(f"{total:>7} chunks in total, partition={mode:<4}: recall@{TOP_K} {recall:.3f}, "
+                  f"query p50 {p50:.2f} ms p95 {p95:.2f} ms{note}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        run_benchmark(int(sys.argv[1]), [int(n) for n in sys.argv[2:]])
+    elif len(sys.argv) > 1:
+        run_benchmark(int(sys.argv[1]))
+    else:
+        run_benchmark()
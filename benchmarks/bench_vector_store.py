@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Recall@k and query latency of the Chroma and NumPy vector store backends.
+
+Each user gets a corpus of clustered random 768-dim vectors; queries are
+noisy copies of stored vectors. Recall is measured against exact cosine
+search over the user's vectors.
+
+Usage: python benchmarks/bench_vector_store.py [chunks_per_user] [users]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import numpy as np
+
+from rag_engine import ChromaVectorStore, NumpyVectorStore
+
+DIMENSIONS = 768
+TOP_K = 5
+QUERIES = 200
+# Norm of the noise added to a stored (unit) vector to make a query
+QUERY_NOISE = 3.0
+
+
+def make_corpus(rng, count):
+    centers = rng.standard_normal((max(1, count // 50), DIMENSIONS)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.5 * rng.standard_normal((count, DIMENSIONS)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fill(store, corpora):
+    start = time.perf_counter()
+    for user_id, vectors in corpora.items():
+        for first in range(0, len(vectors), 1000):
+            batch = vectors[first:first + 1000]
+            ids = [f"doc_{user_id}_{first + i}" for i in range(len(batch))]
+            metadatas = [{"filename": "doc", "user_id": user_id, "chunk_index": first + i, "row": first + i} for i in range(len(batch))]
+            store.upsert(ids, batch.tolist(), [f"chunk {first + i}" for i in range(len(batch))], metadatas)
+        # Written out once per user, as add_chunks does once per document
+        store.flush()
+    return time.perf_counter() - start
+
+
+def measure(store, corpora, queries):
+    latencies = []
+    hits = 0
+    for user_id, query, expected in queries:
+        start = time.perf_counter()
+        results = store.query(query.tolist(), user_id, TOP_K)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(expected & {r["metadata"]["row"] for r in results})
+    latencies.sort()
+    return hits / (len(queries) * TOP_K), statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+def run_benchmark(chunks_per_user=2000, users=4):
+    os.chdir(tempfile.mkdtemp())
+    rng = np.random.default_rng(0)
+    corpora = {user_id: make_corpus(rng, chunks_per_user) for user_id in range(1, users + 1)}
+
+    queries = []
+    for _ in range(QUERIES):
+        user_id = int(rng.integers(1, users + 1))
+        vectors = corpora[user_id]
+        noise = rng.standard_normal(DIMENSIONS).astype(np.float32) * (QUERY_NOISE / np.sqrt(DIMENSIONS))
+        query = vectors[rng.integers(0, len(vectors))] + noise
+        expected = set(np.argsort(-(vectors @ (query / np.linalg.norm(query))))[:TOP_K].tolist())
+        queries.append((user_id, query, expected))
+
+    print(f"{users} users x {chunks_per_user} chunks, {QUERIES} queries, top {TOP_K}")
+    for name, store in (("chroma", ChromaVectorStore("./chroma_db")), ("numpy", NumpyVectorStore("./vector_store"))):
+        fill_seconds = fill(store, corpora)
+        measure(store, corpora, queries[:10])  # warm caches / mmap
+        recall, p50, p95 = measure(store, corpora, queries)
+        print(f"{name:>7}: recall@{TOP_K} {recall:.3f}, query p50 {p50:.2f} ms p95 {p95:.2f} ms, load {fill_seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    )
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Cold-start budget for the API: fails if importing main gets slow again.
+
+Imports backend/main.py under `python -X importtime` in fresh interpreters,
+reports the median total and the heaviest top-level imports, and exits
+non-zero if the median exceeds the budget or if any module that should be
+deferred until first use (ChromaDB, NumPy, PDF/DOCX parsers, passlib,
+HTTP clients) was imported.
+
+Usage: python benchmarks/check_import_time.py [budget_ms] [runs]
+The budget can also be set with IMPORT_BUDGET_MS (default 1500).
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+DEFERRED_MODULES = ["chromadb", "numpy", "pdfplumber", "docx", "passlib", "httpx", "requests"]
+
+PROBE = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+import main
+print(json.dumps([name for name in sys.argv[2:] if name in sys.modules]))
+"""
+
+
+def parse_importtime(stderr):
+    """Return (total microseconds for main, {top-level module: cumulative microseconds})"""
+    total = 0
+    top_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nesting is shown as two spaces of indent per level after the separator's space
+        name = name[1:].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0 and name == "main":
+            total = int(cumulative)
+        elif depth == 1:
+            top_level[name.strip()] = int(cumulative)
+    return total, top_level
+
+
+def run_check(budget_ms=None, runs=5):
+    budget_ms = budget_ms or float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+    totals = []
+    eager = set()
+    heaviest = {}
+
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE, os.path.abspath(BACKEND)] + DEFERRED_MODULES,
+            cwd=tempfile.mkdtemp(), check=True, capture_output=True, text=True
+        )
+        total, top_level = parse_importtime(result.stderr)
+        totals.append(total / 1000)
+        eager.update(json.loads(result.stdout.strip().splitlines()[-1]))
+        for name, cumulative in top_level.items():
+            heaviest[name] = max(heaviest.get(name, 0), cumulative)
+
+    median_ms = statistics.median(totals)
+    print(f"import main: median {median_ms:.0f} ms over {runs} runs (budget {budget_ms:.0f} ms)")
+    print("heaviest imports from main:")
+    for name, cumulative in sorted(heaviest.items(), key=lambda item: -item[1])[:8]:
+        print(f"  {cumulative / 1000:7.1f} ms  {name}")
+
+    failed = False
+    if eager:
+        print(f"FAIL: imported at startup but should be deferred: {', '.join(sorted(eager))}")
+        failed = True
+    if median_ms > budget_ms:
+        print(f"FAIL: cold start {median_ms:.0f} ms exceeds the {budget_ms:.0f} ms budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else None
+    sys.exit(run_check(budget, int(sys.argv[2]) if len(sys.argv) > 2 else 5))
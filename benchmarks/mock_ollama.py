@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Minimal in-process stand-in for the Ollama HTTP API used by the benchmarks"""
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIM = 768
+
+
+def fake_embedding(text, dim=EMBEDDING_DIM):
+    """Deterministic hashed bag-of-words vector, so similar texts get similar embeddings"""
+    vector = [0.0] * dim
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops SYNs under a burst of concurrent clients
+    request_queue_size = 128
+
+
+class MockOllama:
+    """Serve /api/embeddings, /api/embed and streaming /api/generate with configurable latency.
+
+    request_latency is paid once per HTTP request, item_latency once per
+    embedded text, prefill_latency plus prompt_token_latency per prompt
+    token before the first generated token, and token_latency between tokens.
+    /api/generate returns a `context` token array; when a request sends back
+    a context the server produced, only the new prompt tokens are prefilled,
+    like Ollama reusing its KV cache for a loaded model. At most `parallel` requests are served at
+    the same time (like OLLAMA_NUM_PARALLEL).
+    """
+
+    def __init__(self, request_latency=0.02, item_latency=0.002, parallel=4, batch_embed=True,
+                 prefill_latency=0.05, token_latency=0.01, response_tokens=20, prompt_token_latency=0.0):
+        self.request_latency = request_latency
+        self.item_latency = item_latency
+        self.batch_embed = batch_embed
+        self.prefill_latency = prefill_latency
+        self.prompt_token_latency = prompt_token_latency
+        self.token_latency = token_latency
+        self.response_tokens = response_tokens
+        self.slots = threading.BoundedSemaphore(parallel)
+        # Contexts whose KV state the mock "still holds"
+        self.kv_cache = set()
+        self.request_count = 0
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                mock.request_count += 1
+
+                if self.path == "/api/embeddings":
+                    with mock.slots:
+                        time.sleep(mock.request_latency + mock.item_latency)
+                    self._send_json({"embedding": fake_embedding(body["prompt"])})
+                elif self.path == "/api/embed" and mock.batch_embed:
+                    texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                    with mock.slots:
+                        time.sleep(mock.request_latency + mock.item_latency * len(texts))
+                    self._send_json({"embeddings": [fake_embedding(text) for text in texts]})
+                elif self.path == "/api/generate":
+                    with mock.slots:
+                        self._stream_generate(body)
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def _stream_generate(self, body):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                context = body.get("context") or []
+                prompt_ids = [zlib.crc32(token.encode("utf-8")) % 32000
+                              for token in re.findall(r"\w+|[^\w\s]", body.get("prompt", ""))]
+                # A context the server didn't just produce has to be prefilled again
+                evaluated = len(prompt_ids) if tuple(context) in mock.kv_cache else len(context) + len(prompt_ids)
+                time.sleep(mock.prefill_latency + mock.prompt_token_latency * evaluated)
+                for i in range(mock.response_tokens):
+                    self._send_chunk({"model": body.get("model"), "response": f"token{i} ", "done": False})
+                    time.sleep(mock.token_latency)
+                context = context + prompt_ids + [i % 32000 for i in range(mock.response_tokens)]
+                mock.kv_cache.add(tuple(context))
+                self._send_chunk({"model": body.get("model"), "response": "", "done": True,
+                                  "prompt_eval_count": evaluated, "context": context})
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _send_chunk(self, payload):
+                data = json.dumps(payload).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+            def _send_json(self, payload, status=200):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = _Server(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -1,6 +1,7 @@
 import React, { useState, useRef } from 'react';
 import { X, Upload, FileText, AlertCircle, CheckCircle, Trash2 } from 'lucide-react';
 import api from '../utils/axios';
+import { waitForIngestion } from '../utils/ingestion';
 
 function AdminDocumentUpload() {
   const [selectedFiles, setSelectedFiles] = useState([]);
@@ -93,13 +94,16 @@ function AdminDocumentUpload() {
         const formData = new FormData();
         formData.append('file', file);
 
-        await api.post('/documents/upload', formData, {
+        const response = await api.post('/documents/upload', formData, {
           headers: {
             'Content-Type': 'multipart/form-data',
           },
           timeout: 60000, // 60 second timeout for large files
         });
 
+        // Wait for background extraction and embedding to finish
+        await waitForIngestion(response.data.job_id);
+
         setUploadProgress(prev => ({ ...prev, [file.name]: 'success' }));
         results.push({ file: file.name, status: 'success' });
         successCount++;
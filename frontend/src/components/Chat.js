@@ -12,8 +12,10 @@ function Chat() {
   const { user, logout } = useAuth();
   const navigate = useNavigate();
   const [chats, setChats] = useState([]);
+  const [chatsCursor, setChatsCursor] = useState(null);
   const [currentChat, setCurrentChat] = useState(null);
   const [messages, setMessages] = useState([]);
+  const [messagesCursor, setMessagesCursor] = useState(null);
   const [loading, setLoading] = useState(false);
   const [sidebarOpen, setSidebarOpen] = useState(true);
   const [showUpload, setShowUpload] = useState(false);
@@ -57,6 +59,7 @@ function Chat() {
       setError('');
       const response = await api.get('/chat/history');
       setChats(response.data.chats);
+      setChatsCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error loading chat history:', error);
       const errorMessage = getErrorMessage(error);
@@ -69,11 +72,25 @@ function Chat() {
     }
   };
 
+  const loadMoreChats = async () => {
+    if (!chatsCursor) return;
+    try {
+      setError('');
+      const response = await api.get('/chat/history', { params: { before: chatsCursor } });
+      setChats((prev) => [...prev, ...response.data.chats]);
+      setChatsCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error loading more chats:', error);
+      setError(getErrorMessage(error));
+    }
+  };
+
   const loadChatMessages = async (chatId) => {
     try {
       setError('');
       const response = await api.get(`/chat/${chatId}/messages`);
       setMessages(response.data.messages);
+      setMessagesCursor(response.data.next_cursor);
       setCurrentChat(chatId);
     } catch (error) {
       console.error('Error loading chat messages:', error);
@@ -87,6 +104,19 @@ function Chat() {
     }
   };
 
+  const loadEarlierMessages = async () => {
+    if (!messagesCursor || !currentChat) return;
+    try {
+      setError('');
+      const response = await api.get(`/chat/${currentChat}/messages`, { params: { before: messagesCursor } });
+      setMessages((prev) => [...response.data.messages, ...prev]);
+      setMessagesCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error loading earlier messages:', error);
+      setError(getErrorMessage(error));
+    }
+  };
+
   const sendMessage = async (message) => {
     if (!message.trim()) return;
 
@@ -202,6 +232,7 @@ function Chat() {
       if (currentChat === chatId) {
         setCurrentChat(null);
         setMessages([]);
+        setMessagesCursor(null);
       }
     } catch (error) {
       console.error('Error deleting chat:', error);
@@ -237,10 +268,13 @@ function Chat() {
           currentChat={currentChat}
           onChatSelect={loadChatMessages}
           onDeleteChat={deleteChat}
+          hasMore={Boolean(chatsCursor)}
+          onLoadMore={loadMoreChats}
           onNewChat={() => {
             const newChatId = uuidv4();
             setCurrentChat(newChatId);
             setMessages([]);
+            setMessagesCursor(null);
             setSidebarOpen(false);
             setError('');
             setChats(prev => [{ id: newChatId, title: 'New Chat', created_at: new Date().toISOString() }, ...prev]);
@@ -326,6 +360,8 @@ function Chat() {
               messages={messages}
               loading={loading}
               messagesEndRef={messagesEndRef}
+              hasEarlier={Boolean(messagesCursor)}
+              onLoadEarlier={loadEarlierMessages}
             />
           )}
         </div>
@@ -1,7 +1,7 @@
 import React from 'react';
 import { Bot, User } from 'lucide-react';
 
-function ChatMessages({ messages, loading, messagesEndRef }) {
+function ChatMessages({ messages, loading, messagesEndRef, hasEarlier, onLoadEarlier }) {
   const formatTime = (timestamp) => {
     return new Date(timestamp).toLocaleTimeString([], { 
       hour: '2-digit', 
@@ -13,6 +13,16 @@ function ChatMessages({ messages, loading, messagesEndRef }) {
     <div className="flex flex-col h-full">
       {/* Messages container */}
       <div className="flex-1 overflow-y-auto p-4 space-y-4">
+        {hasEarlier && (
+          <div className="text-center">
+            <button
+              onClick={onLoadEarlier}
+              className="text-xs text-primary-600 hover:text-primary-700"
+            >
+              Load earlier messages
+            </button>
+          </div>
+        )}
         {messages.map((message, index) => (
           <div
             key={index}
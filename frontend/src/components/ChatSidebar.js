@@ -1,7 +1,7 @@
 import React from 'react';
 import { MessageSquare, Plus, Trash2, Calendar } from 'lucide-react';
 
-function ChatSidebar({ chats, currentChat, onChatSelect, onDeleteChat, onNewChat }) {
+function ChatSidebar({ chats, currentChat, onChatSelect, onDeleteChat, onNewChat, hasMore, onLoadMore }) {
   const formatDate = (dateString) => {
     const date = new Date(dateString);
     const now = new Date();
@@ -72,6 +72,14 @@ function ChatSidebar({ chats, currentChat, onChatSelect, onDeleteChat, onNewChat
                 </button>
               </div>
             ))}
+            {hasMore && (
+              <button
+                onClick={onLoadMore}
+                className="w-full mt-2 px-3 py-2 text-xs text-gray-500 hover:text-gray-900 hover:bg-gray-100 rounded-md"
+              >
+                Load older chats
+              </button>
+            )}
           </div>
         )}
       </div>
@@ -1,6 +1,7 @@
 import React, { useState, useRef } from 'react';
 import { X, Upload, FileText, AlertCircle, CheckCircle } from 'lucide-react';
 import api from '../utils/axios';
+import { waitForIngestion } from '../utils/ingestion';
 
 function DocumentUpload({ onClose, onUploadSuccess }) {
   const [selectedFile, setSelectedFile] = useState(null);
@@ -73,13 +74,29 @@ function DocumentUpload({ onClose, onUploadSuccess }) {
       const formData = new FormData();
       formData.append('file', selectedFile);
 
-      await api.post('/documents/upload', formData, {
+      const response = await api.post('/documents/upload', formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
         },
         timeout: 60000, // 60 second timeout for large files
       });
 
+      // Extraction and embedding continue in the background
+      await waitForIngestion(response.data.job_id, {
+        onProgress: (job) => {
+          if (job.status !== 'done' && job.status !== 'failed') {
+            // Large documents are chunked while they are read, so the total may not be known yet
+            let progress = '';
+            if (job.chunks_total) {
+              progress = ` (${job.chunks_done}/${job.chunks_total} chunks)`;
+            } else if (job.chunks_done) {
+              progress = ` (${job.chunks_done} chunks)`;
+            }
+            setUploadStatus({ type: 'info', message: `Processing document: ${job.status}${progress}` });
+          }
+        },
+      });
+
       setUploadStatus({
         type: 'success',
         message: 'Document uploaded successfully!'
@@ -182,6 +199,8 @@ function DocumentUpload({ onClose, onUploadSuccess }) {
             <div className={`mt-4 p-3 rounded-lg flex items-center ${
               uploadStatus.type === 'success' 
                 ? 'bg-green-50 text-green-800' 
+                : uploadStatus.type === 'info'
+                ? 'bg-blue-50 text-blue-800'
                 : 'bg-red-50 text-red-800'
             }`}>
               {uploadStatus.type === 'success' ? (
@@ -0,0 +1,27 @@
+import api from './axios';
+
+// Poll a background ingestion job until it finishes. Resolves with the
+// finished job and rejects with an axios-shaped error when it fails, so
+// callers can reuse their usual error message handling.
+export async function waitForIngestion(jobId, { interval = 1000, onProgress } = {}) {
+  while (true) {
+    const response = await api.get(`/documents/jobs/${jobId}`);
+    const job = response.data;
+
+    if (onProgress) {
+      onProgress(job);
+    }
+
+    if (job.status === 'done') {
+      return job;
+    }
+
+    if (job.status === 'failed') {
+      const error = new Error(job.error || 'Document processing failed');
+      error.response = { data: { detail: job.error || 'Document processing failed. Please try again.' } };
+      throw error;
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, interval));
+  }
+}
@@ -50,8 +50,6 @@ pip install -r requirements-alternative.txt
 
 if [ $? -eq 0 ]; then
     echo "✅ Successfully installed with pdfplumber"
-    # Copy the alternative document processor
-    cp document_processor_alternative.py document_processor.py
 else
     echo "⚠️  pdfplumber installation failed, trying PyMuPDF-binary..."
     pip install -r requirements-macos.txt